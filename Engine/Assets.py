@@ -0,0 +1,264 @@
+"""
+Central asset manager. Every image is loaded, scaled and converted to the display format once per process, and
+shared by all the sprites using it. Scaled images and decoded explosion frames are also kept in a versioned on-disk
+cache, so the source files are only decoded the first time the game runs on a machine.
+
+Decoding can start in the background with preload(), and LazyAssets hands out fonts and sounds that load in the
+background or on first use. Only the conversion to the display format has to happen on the main thread.
+"""
+import collections.abc
+import concurrent.futures
+import hashlib
+import os
+import struct
+import threading
+
+import pygame
+
+CACHE_DIR = ".cache"  # on-disk cache, relative to the working directory like the assets
+CACHE_VERSION = 1  # bump when the cached data changes, so stale cache files are ignored
+
+EXPLOSION_GIF = "images/explosion.gif"
+EXPLOSION_SIZES = (71, 36)  # fighter explosions, and bullets hitting the obstacle
+IMAGES = {
+    # image file to the size it is used at, preloaded by prewarm()
+    "images/jetfighter.png": (80, 80),
+    "images/propfighter.png": (80, 80),
+    "images/up_arrow.png": (70, 70),
+    "images/left_turn.png": (70, 70),
+    "images/right_turn.png": (70, 70),
+    "images/snow_flake.png": None,
+}
+
+images = {}  # map from (file, size, converted) to the loaded image
+gif_frames = {}  # map from (file, size, converted) to the list of frames
+pending = {}  # map from (kind, file, size) to the Future of an image or frames decoding in the background
+executor = None  # background loading threads, started on first use
+
+FRAMES_HEADER = struct.Struct("<4sI")  # magic, number of frames
+FRAME_HEADER = struct.Struct("<II")  # width, height, followed by the RGBA pixels
+
+
+def can_convert():
+    # Surfaces can only be converted to the display format once the display mode is set
+    return pygame.display.get_surface() is not None
+
+
+def convert(surface, alpha=True):
+    """Convert a surface to the display format for fast blitting, when there is a display."""
+    if not can_convert():
+        return surface
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+def load_in_background(function, *args):
+    """Run function(*args) on a background thread, and return its concurrent.futures.Future."""
+    global executor
+    if executor is None:
+        # pygame releases the GIL while decoding images and sounds, so two threads overlap on multi-core machines
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="assets")
+    return executor.submit(function, *args)
+
+
+def shutdown():
+    """Wait for the background loads in progress and cancel the others, before pygame.quit() tears SDL down."""
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+        executor = None
+    pending.clear()
+
+
+def read_image(path, size):
+    # Decoding and scaling only, which is safe outside the main thread
+    if size is None:
+        return pygame.image.load(path)
+    cache_path = get_cache_path(path, size)
+    try:
+        return read_frames(cache_path)[0]
+    except (OSError, ValueError, IndexError, struct.error):
+        image = pygame.transform.scale(pygame.image.load(path), size)
+        try:
+            write_frames(cache_path, [image])
+        except OSError:
+            pass  # The cache is only an optimization
+        return image
+
+
+def load_image(path, size=None, alpha=True):
+    """
+    Return an image, loaded, scaled and converted on the first call. The image is shared, so do not draw on it.
+    :param size: (width, height) to scale the image to, or None to keep its size
+    :param alpha: keep the transparency of the image
+    """
+    key = (path, size, alpha and can_convert())
+    image = images.get(key)
+    if image is None:
+        future = pending.pop(("image", path, size), None)
+        image = future.result() if future is not None else read_image(path, size)
+        image = convert(image, alpha)
+        images[key] = image
+    return image
+
+
+def get_cache_path(path, size):
+    # The source file's size and modification time are part of the name, so an edited GIF is decoded again
+    stat = os.stat(path)
+    size = "x".join(map(str, size)) if isinstance(size, tuple) else size
+    key = f"{CACHE_VERSION}:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{size}:{pygame.version.ver}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{os.path.splitext(os.path.basename(path))[0]}-{size}-{digest}.frames")
+
+
+def decode_gif_frames(path, size):
+    # PIL is only needed when the frames are not cached yet
+    from PIL import Image
+
+    frames = []
+    with Image.open(path) as gif:
+        for frame in range(gif.n_frames):
+            gif.seek(frame)
+            # Convert PIL image to a format pygame can use
+            frame_surface = pygame.image.fromstring(gif.tobytes(), gif.size, gif.mode)
+            frame_surface = pygame.transform.scale(frame_surface,
+                                                   (size, frame_surface.get_height() * size // frame_surface.get_width()))
+            frames.append(frame_surface)
+    return frames
+
+
+def read_frames(cache_path):
+    with open(cache_path, "rb") as file:
+        data = file.read()
+    magic, count = FRAMES_HEADER.unpack_from(data, 0)
+    if magic != b"FRMS":
+        raise ValueError(f"{cache_path} is not a frame cache")
+    offset = FRAMES_HEADER.size
+    frames = []
+    for _ in range(count):
+        width, height = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        length = width * height * 4
+        if offset + length > len(data):
+            raise ValueError(f"{cache_path} is truncated")
+        frames.append(pygame.image.frombytes(data[offset:offset + length], (width, height), "RGBA"))
+        offset += length
+    return frames
+
+
+def write_frames(cache_path, frames):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Write to a temporary file first, so a concurrent reader never sees half a file
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(FRAMES_HEADER.pack(b"FRMS", len(frames)))
+        for frame in frames:
+            file.write(FRAME_HEADER.pack(*frame.get_size()))
+            file.write(pygame.image.tobytes(frame, "RGBA"))
+    os.replace(temp_path, cache_path)
+
+
+def read_gif_frames(path, size):
+    # Like read_image(), safe outside the main thread
+    cache_path = get_cache_path(path, size)
+    try:
+        return read_frames(cache_path)
+    except (OSError, ValueError, struct.error):
+        frames = decode_gif_frames(path, size)
+        try:
+            write_frames(cache_path, frames)
+        except OSError:
+            pass  # The cache is only an optimization
+        return frames
+
+
+def load_gif_frames(path, size):
+    """
+    Return the frames of an animated GIF scaled to a width of size pixels, from memory, the on-disk cache, or by
+    decoding the GIF, in that order.
+    """
+    key = (path, size, can_convert())
+    frames = gif_frames.get(key)
+    if frames is not None:
+        return frames
+
+    future = pending.pop(("frames", path, size), None)
+    frames = future.result() if future is not None else read_gif_frames(path, size)
+    frames = [convert(frame) for frame in frames]
+    gif_frames[key] = frames
+    return frames
+
+
+def get_explosion_frames(size):
+    return load_gif_frames(EXPLOSION_GIF, size)
+
+
+def preload():
+    """
+    Start decoding every image and explosion size in the background. load_image() and get_explosion_frames() then only
+    wait for what is not decoded yet, and convert it.
+    """
+    for path, size in IMAGES.items():
+        if ("image", path, size) not in pending:
+            pending[("image", path, size)] = load_in_background(read_image, path, size)
+    for size in EXPLOSION_SIZES:
+        if ("frames", EXPLOSION_GIF, size) not in pending:
+            pending[("frames", EXPLOSION_GIF, size)] = load_in_background(read_gif_frames, EXPLOSION_GIF, size)
+
+
+def prewarm():
+    """Load every image and explosion size up front, so nothing is loaded or decoded in the middle of a match."""
+    for path, size in IMAGES.items():
+        load_image(path, size)
+    for size in EXPLOSION_SIZES:
+        get_explosion_frames(size)
+
+
+class LazyAssets(collections.abc.Mapping):
+    """
+    Map from names to assets loaded in the background or on first use. Looking an asset up blocks until it is loaded,
+    so only the code that needs an asset before it is ready waits for it.
+    """
+
+    def __init__(self):
+        self.assets = {}
+        self.loaders = {}  # map from name to the (function, args) loading the asset on first use
+        self.futures = {}  # map from name to the Future of an asset loading in the background
+        self.lock = threading.Lock()
+
+    def add(self, name, function, *args, background=False):
+        """
+        Register an asset, loaded by function(*args).
+        :param background: start loading it right away on a background thread, instead of on first use
+        """
+        if background:
+            self.futures[name] = load_in_background(function, *args)
+        else:
+            self.loaders[name] = (function, args)
+
+    def is_ready(self, name):
+        """Return True if looking the asset up would not block."""
+        future = self.futures.get(name)
+        return name in self.assets or (future is not None and future.done())
+
+    def __getitem__(self, name):
+        asset = self.assets.get(name)
+        if asset is not None:
+            return asset
+        with self.lock:
+            if name in self.assets:
+                return self.assets[name]
+            if name in self.futures:
+                asset = self.futures[name].result()
+            elif name in self.loaders:
+                function, args = self.loaders[name]
+                asset = function(*args)
+            else:
+                raise KeyError(name)
+            self.assets[name] = asset
+            return asset
+
+    def __iter__(self):
+        return iter(self.loaders.keys() | self.futures.keys() | self.assets.keys())
+
+    def __len__(self):
+        return len(self.loaders.keys() | self.futures.keys() | self.assets.keys())
@@ -0,0 +1,448 @@
+import numpy as np
+import pygame
+
+import Engine.Assets as Assets
+from Engine.Bullet import Bullet
+from Engine.Fighter import Fighter, JetFighter, PropFighter
+from Engine.Strategy import Strategy
+
+
+def wrap_around(x, y, screen_width, screen_height):
+    """Vectorized Utils.wrap_around(). Returns the wrapped (x, y) arrays."""
+    x = np.where(x < 0, screen_width, np.where(x > screen_width, 0, x))
+    y = np.where(y < 0, screen_height, np.where(y > screen_height, 0, y))
+    return x, y
+
+
+def advance_fighters(x, y, heading, speed, turning, turn_speed, tick, screen_width, screen_height):
+    """
+    Vectorized Fighter.update() kinematics for one tick. The arithmetic is done in the same order as the engine,
+    so the results match it exactly.
+    :return: the new (x, y, heading) arrays
+    """
+    x = x + speed * np.sin(np.radians(heading)) * (tick / 1000.0)
+    y = y - speed * np.cos(np.radians(heading)) * (tick / 1000.0)
+    turn = turn_speed * (tick / 1000.0)
+    heading = np.where(turning == 1, heading + turn, np.where(turning == -1, heading - turn, heading))
+    heading = np.mod(heading, 360)
+    x, y = wrap_around(x, y, screen_width, screen_height)
+    return x, y, heading
+
+
+def advance_bullets(x, y, heading, distance_traveled, speed, tick, screen_width, screen_height):
+    """
+    Vectorized Bullet.update() kinematics for one tick.
+    :return: the new (x, y, distance_traveled) arrays
+    """
+    radians = np.radians(heading)
+    x = x + speed * tick * np.sin(radians) / 1000.0
+    y = y + -speed * tick * np.cos(radians) / 1000.0
+    x, y = wrap_around(x, y, screen_width, screen_height)
+    distance_traveled = distance_traveled + speed * tick / 1000.0
+    return x, y, distance_traveled
+
+
+def apply_commands(cmds, turning, speed, specs):
+    """
+    Vectorized Engine.handle_player_cmd() for the commands that steer a fighter. Firing is left to the caller.
+    :return: the new (turning, speed) arrays
+    """
+    turning = np.where(cmds == Strategy.TURN_LEFT, -1,
+                       np.where(cmds == Strategy.TURN_RIGHT, 1,
+                                np.where(cmds == Strategy.GO_STRAIGHT, 0, turning)))
+    speed = np.where(cmds == Strategy.ACCELERATE, np.minimum(speed + specs["acceleration"], specs["top_speed"]), speed)
+    speed = np.where(cmds == Strategy.DECELERATE, np.maximum(speed - specs["acceleration"], specs["min_speed"]), speed)
+    return turning, speed
+
+
+def round_center(v):
+    # pygame rounds float rect coordinates half away from zero
+    return np.trunc(v + np.copysign(0.5, v)).astype(np.int64)
+
+
+class RotatedShapes:
+    """
+    Collision masks of one sprite image rotated to quantized headings, plus a summed-area table per heading, so the
+    number of mask pixels inside any axis-aligned rectangle can be looked up for many sprites at once.
+    """
+    cache = {}  # map from (key, resolution) to RotatedShapes
+
+    def __init__(self, image, resolution):
+        self.resolution = resolution
+        self.count = int(round(360.0 / resolution))
+        self.masks = []
+        sizes = []
+        for q in range(self.count):
+            rotated = pygame.transform.rotate(image, -q * resolution)
+            self.masks.append(pygame.mask.from_surface(rotated))
+            sizes.append(rotated.get_size())
+        self.width = np.array([w for w, h in sizes], dtype=np.int64)
+        self.height = np.array([h for w, h in sizes], dtype=np.int64)
+        self.size = int(max(self.width.max(), self.height.max()))
+
+        # Pixel counts never exceed 2**16 for sprite-sized masks. uint16 arithmetic wraps around, which still gives the
+        # right answer for the inclusion-exclusion sum in count_in_rect().
+        self.sat = np.zeros((self.count, self.size + 1, self.size + 1), dtype=np.uint16)
+        for q, mask in enumerate(self.masks):
+            surface = mask.to_surface(setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 0))
+            bits = (pygame.surfarray.array_alpha(surface).T > 0).astype(np.uint16)
+            self.sat[q, 1:bits.shape[0] + 1, 1:bits.shape[1] + 1] = bits.cumsum(axis=0).cumsum(axis=1)
+            # Rows and columns past the mask repeat the last ones
+            self.sat[q, bits.shape[0] + 1:, :] = self.sat[q, bits.shape[0], :]
+            self.sat[q, :, bits.shape[1] + 1:] = self.sat[q, :, bits.shape[1]][:, None]
+
+    @staticmethod
+    def get(key, image_factory, resolution):
+        if (key, resolution) not in RotatedShapes.cache:
+            RotatedShapes.cache[(key, resolution)] = RotatedShapes(image_factory(), resolution)
+        return RotatedShapes.cache[(key, resolution)]
+
+    def quantize(self, heading):
+        return np.rint(np.asarray(heading) / self.resolution).astype(np.int64) % self.count
+
+    def count_in_rect(self, q, left, top, rect):
+        """
+        Count mask pixels inside rect, for sprites with heading indices q placed at (left, top).
+        :param rect: (x, y, width, height) of an axis-aligned rectangle in screen coordinates
+        """
+        x0 = np.clip(rect[0] - left, 0, self.size)
+        x1 = np.clip(rect[0] + rect[2] - left, 0, self.size)
+        y0 = np.clip(rect[1] - top, 0, self.size)
+        y1 = np.clip(rect[1] + rect[3] - top, 0, self.size)
+        x1 = np.maximum(x0, x1)
+        y1 = np.maximum(y0, y1)
+        sat = self.sat
+        return sat[q, y1, x1] - sat[q, y0, x1] - sat[q, y1, x0] + sat[q, y0, x0]
+
+    def collide_rect(self, q, left, top, rect):
+        """Return which sprites have mask pixels inside rect, the vectorized equivalent of collide_mask() with a solid
+        rectangular sprite such as the Obstacle."""
+        # Broadphase on the rects, so the summed-area tables are only read for the few sprites near the rectangle
+        candidates = np.flatnonzero((left < rect[0] + rect[2]) & (left + self.width[q] > rect[0]) &
+                                    (top < rect[1] + rect[3]) & (top + self.height[q] > rect[1]))
+        collided = np.zeros(len(q), dtype=bool)
+        if len(candidates):
+            collided[candidates] = self.count_in_rect(q[candidates], left[candidates], top[candidates], rect) > 0
+        return collided
+
+
+def load_fighter_image(image_file):
+    return Assets.load_image(image_file, Fighter.SIZE)
+
+
+def create_bullet_image():
+    image = pygame.Surface(Bullet.SIZE, pygame.SRCALPHA)
+    image.fill((0, 0, 0))
+    return image
+
+
+class BatchSimulator:
+    """
+    Struct-of-arrays simulator that advances N independent headless matches at once with NumPy.
+
+    Each step follows Engine.run_headless(): the commands are applied, fighters and bullets move with the same
+    arithmetic as Fighter.update() and Bullet.update(), then the check_victory() conditions are evaluated in the same
+    order as the engine. Collision masks are taken at headings quantized to heading_resolution degrees. Rectangle
+    tests against the obstacle are fully vectorized; the pixel-exact fighter-vs-fighter and bullet-vs-propfighter
+    tests only run for the few matches whose rectangles overlap.
+    """
+    # Causes of the end of a match, indexed by the values in self.cause
+    CAUSES = ("", "bullet_hit", "jet_obstacle", "prop_obstacle", "collision", "timeout")
+    # The fighters turn 1.125 and 0.75 degrees per tick, so from their starting headings every heading they can reach
+    # is a multiple of 0.375 degrees, and the masks are then exactly the ones the engine uses.
+    DEFAULT_HEADING_RESOLUTION = 0.375
+
+    def __init__(self, n, heading_resolution=DEFAULT_HEADING_RESOLUTION, screen_width=1600, screen_height=1200, tick=25, time_limit=60,
+                 obstacle_rect=(500, 400, 600, 400), max_bullets=None):
+        self.n = n
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.tick = tick  # msecs per frame
+        self.time_limit = time_limit  # secs the propfighter needs to survive to win
+        self.obstacle_rect = obstacle_rect  # (x, y, width, height)
+
+        self.jet = FighterArrays(n, JetFighter.SPECS, heading_resolution)
+        self.prop = FighterArrays(n, PropFighter.SPECS, heading_resolution)
+        self.bullet_shapes = RotatedShapes.get("bullet", create_bullet_image, heading_resolution)
+
+        # A bullet lives for max_distance / speed secs, and the jetfighter can fire at most once per fire delay
+        if max_bullets is None:
+            lifetime = Bullet.MAX_DISTANCE / Bullet.SPEED
+            max_bullets = int(JetFighter.SPECS["max_ammo"] + lifetime // JetFighter.SPECS["ammo_fire_delay"] + 1)
+        self.max_bullets = max_bullets
+        self.bullet_x = np.zeros((n, max_bullets))
+        self.bullet_y = np.zeros((n, max_bullets))
+        self.bullet_heading = np.zeros((n, max_bullets))
+        self.bullet_distance = np.zeros((n, max_bullets))
+        self.bullet_q = np.zeros((n, max_bullets), dtype=np.int64)  # quantized heading index of the bullet masks
+        self.bullet_alive = np.zeros((n, max_bullets), dtype=bool)
+
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.shots_fired = np.zeros(n, dtype=np.int64)
+        self.result = np.zeros(n, dtype=np.int8)  # 0 while running, 1 for jetfighter victory, -1 for propfighter victory
+        self.cause = np.zeros(n, dtype=np.int8)  # index into CAUSES
+        self.reset()
+
+    def reset(self, indices=None, seed=None):
+        """
+        Put matches back to their starting state.
+        :param indices: matches to reset, all of them by default
+        :param seed: if given, fighters start at random positions and headings away from the obstacle instead of at
+                     the engine's starting positions
+        """
+        if indices is None:
+            indices = np.arange(self.n)
+        indices = np.asarray(indices)
+        rng = np.random.default_rng(seed) if seed is not None else None
+        for fighter in (self.jet, self.prop):
+            fighter.reset(indices, self.random_positions(len(indices), rng) if rng is not None else None)
+            fighter.prev_regen_ts[indices] = 0.0
+        self.bullet_alive[indices] = False
+        self.ticks[indices] = 0
+        self.shots_fired[indices] = 0
+        self.result[indices] = 0
+        self.cause[indices] = 0
+
+    def random_positions(self, count, rng, margin=100):
+        x = rng.uniform(0, self.screen_width, count)
+        y = rng.uniform(0, self.screen_height, count)
+        ox, oy, ow, oh = self.obstacle_rect
+        inside = (x > ox - margin) & (x < ox + ow + margin) & (y > oy - margin) & (y < oy + oh + margin)
+        while inside.any():
+            x[inside] = rng.uniform(0, self.screen_width, inside.sum())
+            y[inside] = rng.uniform(0, self.screen_height, inside.sum())
+            inside = (x > ox - margin) & (x < ox + ow + margin) & (y > oy - margin) & (y < oy + oh + margin)
+        return x, y, rng.uniform(0, 360, count)
+
+    def get_game_time(self):
+        return self.ticks * self.tick / 1000.0
+
+    def step(self, jet_cmds, prop_cmds=None):
+        """
+        Advance every running match by one tick.
+        :param jet_cmds: array of N Strategy command constants for the jetfighters
+        :param prop_cmds: optional array of N Strategy command constants for the propfighters
+        :return: the result array (0 while running, 1 for jetfighter victory, -1 for propfighter victory)
+        """
+        active = self.result == 0
+        jet_cmds = np.asarray(jet_cmds)
+
+        # Commands
+        self.jet.apply_commands(jet_cmds, active)
+        if prop_cmds is not None:
+            self.prop.apply_commands(np.asarray(prop_cmds), active)
+        self.fire_ammo(active & (jet_cmds == Strategy.FIRE_AMMO))
+
+        # Battlefield update
+        self.ticks += active
+        now = self.get_game_time()
+        for fighter in (self.jet, self.prop):
+            fighter.update(active, now, self.tick, self.screen_width, self.screen_height)
+        self.update_bullets(active)
+
+        self.check_victory(active)
+        return self.result
+
+    def fire_ammo(self, firing):
+        jet = self.jet
+        now = self.get_game_time()
+        firing = firing & (jet.ammo > 0) & (now >= jet.prev_fire_ts + jet.specs["ammo_fire_delay"])
+        firing &= ~self.bullet_alive.all(axis=1)
+        rows = np.nonzero(firing)[0]
+        if len(rows) == 0:
+            return
+        slots = np.argmin(self.bullet_alive[rows], axis=1)
+        jet.prev_fire_ts[rows] = now[rows]
+        jet.ammo[rows] -= 1
+        self.shots_fired[rows] += 1
+
+        # Same as Fighter.get_tip_coord()
+        heading_radians = np.radians(jet.heading[rows])
+        self.bullet_x[rows, slots] = jet.x[rows] + (Fighter.SIZE[1] / 2 + 10.0) * np.sin(heading_radians)
+        self.bullet_y[rows, slots] = jet.y[rows] - (Fighter.SIZE[1] / 2 + 10.0) * np.cos(heading_radians)
+        self.bullet_heading[rows, slots] = jet.heading[rows]
+        self.bullet_q[rows, slots] = self.bullet_shapes.quantize(jet.heading[rows])
+        self.bullet_distance[rows, slots] = 0
+        self.bullet_alive[rows, slots] = True
+
+    def bullet_rects(self, live):
+        """Return the heading index and rect of the bullets at the given flat indices."""
+        # Bullet.update() centers the rect on the truncated position
+        q = self.bullet_q.reshape(-1)[live]
+        width = self.bullet_shapes.width[q]
+        height = self.bullet_shapes.height[q]
+        left = np.trunc(self.bullet_x.reshape(-1)[live]).astype(np.int64) - width // 2
+        top = np.trunc(self.bullet_y.reshape(-1)[live]).astype(np.int64) - height // 2
+        return q, left, top, width, height
+
+    def update_bullets(self, active):
+        # Bullet arrays are updated in place through flat views, only at the indices of the live bullets
+        moving = np.flatnonzero(self.bullet_alive & active[:, None])
+        if len(moving) == 0:
+            return
+        bullet_x = self.bullet_x.reshape(-1)
+        bullet_y = self.bullet_y.reshape(-1)
+        bullet_distance = self.bullet_distance.reshape(-1)
+        bullet_x[moving], bullet_y[moving], bullet_distance[moving] = advance_bullets(
+            bullet_x[moving], bullet_y[moving], self.bullet_heading.reshape(-1)[moving], bullet_distance[moving],
+            Bullet.SPEED, self.tick, self.screen_width, self.screen_height)
+
+        q, left, top, _, _ = self.bullet_rects(moving)
+        hit_obstacle = self.bullet_shapes.collide_rect(q, left, top, self.obstacle_rect)
+        expired = bullet_distance[moving] >= Bullet.MAX_DISTANCE
+        self.bullet_alive.reshape(-1)[moving[hit_obstacle | expired]] = False
+
+    def end_matches(self, ending, result, cause):
+        ending = ending & (self.result == 0)
+        self.result[ending] = result
+        self.cause[ending] = self.CAUSES.index(cause)
+
+    def check_victory(self, active):
+        jet_q, jet_left, jet_top = self.jet.rects()
+        prop_q, prop_left, prop_top = self.prop.rects()
+        jet_shapes = self.jet.shapes
+        prop_shapes = self.prop.shapes
+
+        # Check if a bullet hits propfighter
+        live = np.flatnonzero(self.bullet_alive & active[:, None])
+        rows = live // self.max_bullets
+        bullet_q, bullet_left, bullet_top, bullet_width, bullet_height = self.bullet_rects(live)
+        prop_width = prop_shapes.width[prop_q[rows]]
+        prop_height = prop_shapes.height[prop_q[rows]]
+        candidates = np.flatnonzero((bullet_left < prop_left[rows] + prop_width) &
+                                    (bullet_left + bullet_width > prop_left[rows]) &
+                                    (bullet_top < prop_top[rows] + prop_height) &
+                                    (bullet_top + bullet_height > prop_top[rows]))
+        hit = np.zeros(self.n, dtype=bool)
+        for i in candidates:
+            row = rows[i]
+            if hit[row]:
+                continue
+            offset = (int(bullet_left[i] - prop_left[row]), int(bullet_top[i] - prop_top[row]))
+            if prop_shapes.masks[prop_q[row]].overlap(self.bullet_shapes.masks[bullet_q[i]], offset):
+                hit[row] = True
+                self.bullet_alive.reshape(-1)[live[i]] = False
+        self.end_matches(hit, 1, "bullet_hit")
+
+        # Check if jetfighter collides with obstacle
+        self.end_matches(active & jet_shapes.collide_rect(jet_q, jet_left, jet_top, self.obstacle_rect),
+                         -1, "jet_obstacle")
+
+        # Check if propfighter collides with obstacle
+        self.end_matches(active & prop_shapes.collide_rect(prop_q, prop_left, prop_top, self.obstacle_rect),
+                         1, "prop_obstacle")
+
+        # Check if propfighter collides with jetfighter
+        self.end_matches(active & self.check_fighter_collision(jet_q, jet_left, jet_top, prop_q, prop_left, prop_top),
+                         -1, "collision")
+
+        # Check if propfighter has survived long enough
+        self.end_matches(active & (self.get_game_time() > self.time_limit), -1, "timeout")
+
+    def wrap_offsets(self, shapes, q, left, top):
+        # Fighter.create_wrapped_mask() adds one copy of the mask shifted by a screen width and/or height
+        # whenever the rect crosses a screen edge.
+        right = left + shapes.width[q]
+        bottom = top + shapes.height[q]
+        dx = np.where((left < 0) | (right > self.screen_width), self.screen_width, 0)
+        dy = np.where((top < 0) | (bottom > self.screen_height), self.screen_height, 0)
+        return dx, dy
+
+    def check_fighter_collision(self, jet_q, jet_left, jet_top, prop_q, prop_left, prop_top):
+        jet_shapes = self.jet.shapes
+        prop_shapes = self.prop.shapes
+
+        # Broadphase on the toroidal distance between the centers, which covers the wrapped copies of the masks
+        reach = (jet_shapes.size + prop_shapes.size) / 2 + 2
+        dx = np.abs(self.jet.x - self.prop.x) % self.screen_width
+        dy = np.abs(self.jet.y - self.prop.y) % self.screen_height
+        near = ((np.minimum(dx, self.screen_width - dx) < reach) & (np.minimum(dy, self.screen_height - dy) < reach) &
+                (self.result == 0))
+
+        # Pixel-perfect narrowphase on every pair of mask copies
+        collided = np.zeros(self.n, dtype=bool)
+        rows = np.flatnonzero(near)
+        if len(rows) == 0:
+            return collided
+        jet_dx, jet_dy = self.wrap_offsets(jet_shapes, jet_q[rows], jet_left[rows], jet_top[rows])
+        prop_dx, prop_dy = self.wrap_offsets(prop_shapes, prop_q[rows], prop_left[rows], prop_top[rows])
+        for i, row in enumerate(rows):
+            jet_mask = jet_shapes.masks[jet_q[row]]
+            prop_mask = prop_shapes.masks[prop_q[row]]
+            for jdx, jdy in ((0, 0), (jet_dx[i], jet_dy[i])):
+                for pdx, pdy in ((0, 0), (prop_dx[i], prop_dy[i])):
+                    offset = (int(prop_left[row] + pdx - jet_left[row] - jdx),
+                              int(prop_top[row] + pdy - jet_top[row] - jdy))
+                    if jet_mask.overlap(prop_mask, offset):
+                        collided[row] = True
+        return collided
+
+    def run(self, jet_policy, prop_policy=None, max_ticks=None):
+        """
+        Step all matches until every one of them has ended.
+        :param jet_policy: callable taking this simulator and returning an array of N jetfighter commands
+        :param prop_policy: optional callable taking this simulator and returning an array of N propfighter commands
+        :param max_ticks: optional cap on the number of steps, on top of the game's time limit
+        :return: the result array
+        """
+        steps = 0
+        while (self.result == 0).any() and (max_ticks is None or steps < max_ticks):
+            prop_cmds = prop_policy(self) if prop_policy is not None else None
+            self.step(jet_policy(self), prop_cmds)
+            steps += 1
+        return self.result
+
+
+class FighterArrays:
+    """State of one of the two fighters across all N matches."""
+
+    def __init__(self, n, specs, heading_resolution):
+        self.specs = specs
+        self.shapes = RotatedShapes.get(specs["image_file"], lambda: load_fighter_image(specs["image_file"]),
+                                        heading_resolution)
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.heading = np.zeros(n)
+        self.speed = np.zeros(n)
+        self.turning = np.zeros(n, dtype=np.int8)  # 0: not turning, 1: clockwise, -1: counterclockwise
+        self.ammo = np.zeros(n, dtype=np.int64)
+        self.prev_fire_ts = np.zeros(n)
+        self.prev_regen_ts = np.zeros(n)
+
+    def reset(self, indices, positions=None):
+        if positions is None:
+            self.x[indices] = self.specs["x"]
+            self.y[indices] = self.specs["y"]
+            self.heading[indices] = self.specs["heading"]
+        else:
+            self.x[indices], self.y[indices], self.heading[indices] = positions
+        self.speed[indices] = self.specs["curr_speed"]
+        self.turning[indices] = self.specs["turning"]
+        self.ammo[indices] = self.specs["curr_ammo"]
+        self.prev_fire_ts[indices] = -self.specs["ammo_fire_delay"]
+
+    def apply_commands(self, cmds, active):
+        # Same as Engine.handle_player_cmd(), except for firing
+        turning, speed = apply_commands(cmds, self.turning, self.speed, self.specs)
+        self.turning = np.where(active, turning, self.turning).astype(np.int8)
+        self.speed = np.where(active, speed, self.speed)
+
+    def update(self, active, now, tick, screen_width, screen_height):
+        x, y, heading = advance_fighters(self.x, self.y, self.heading, self.speed, self.turning,
+                                         self.specs["turn_speed"], tick, screen_width, screen_height)
+        self.x = np.where(active, x, self.x)
+        self.y = np.where(active, y, self.y)
+        self.heading = np.where(active, heading, self.heading)
+
+        # Update ammo regen
+        below_max = self.ammo < self.specs["max_ammo"]
+        regen = active & below_max & (now - self.prev_regen_ts > self.specs["ammo_regen_time"])
+        self.ammo += regen
+        self.prev_regen_ts = np.where(active & (regen | ~below_max), now, self.prev_regen_ts)
+
+    def rects(self):
+        """Return the quantized heading index and rect top-left corner of the rotated fighter in every match."""
+        q = self.shapes.quantize(self.heading)
+        left = round_center(self.x) - self.shapes.width[q] // 2
+        top = round_center(self.y) - self.shapes.height[q] // 2
+        return q, left, top
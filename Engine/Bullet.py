@@ -5,22 +5,26 @@ import Engine.Utils as Utils
 
 
 class Bullet(pygame.sprite.Sprite):
+    SPEED = 300  # pixels per sec
+    MAX_DISTANCE = 1200  # pixels traveled before the bullet disappears
+    SIZE = (3, 20)  # width and height of the bullet before rotation
+
     def __init__(self, engine, x, y, heading):
         super().__init__()
         self.engine = engine
         self.x = float(x)
         self.y = float(y)
-        self.speed = 300
+        self.speed = Bullet.SPEED
         self.heading = heading
-        self.max_distance = 1200
+        self.max_distance = Bullet.MAX_DISTANCE
         self.distance_traveled = 0
 
         # Get screen dimensions
-        self.screen_width = self.engine.screen.get_width()
-        self.screen_height = self.engine.screen.get_height()
+        self.screen_width = self.engine.screen_width
+        self.screen_height = self.engine.screen_height
 
         # Create a rectangle for the bullet
-        self.original_image = pygame.Surface((3, 20), pygame.SRCALPHA)  # Width: 20, Height: 3
+        self.original_image = pygame.Surface(Bullet.SIZE, pygame.SRCALPHA)  # Width: 20, Height: 3
         self.original_image.fill((0, 0, 0))  # Fill color: black
         self.image = pygame.transform.rotate(self.original_image, -self.heading)  # Rotate clockwise
         self.mask = pygame.mask.from_surface(self.image)
@@ -43,27 +47,36 @@ class Bullet(pygame.sprite.Sprite):
 
         # Update the rectangle's position based on the current position
         self.rect.center = (int(self.x), int(self.y))  # Update rect to new image location
+        self.engine.bullet_hash.update(self)
 
-        # Check for collision with obstacles
-        obstacle = Utils.check_collision_with_group(self, self.engine.obstacles)
-        if obstacle:
-            self.engine.create_explosion(obstacle, self, 36, "explosion2")
-            self.kill()  # Remove the bullet from all groups if it hits an obstacle
+        # Check for collision with the obstacles nearby
+        obstacles = self.engine.get_obstacles_near(self.rect)
+        if obstacles:
+            obstacle, contact = self.engine.find_collision(self, obstacles)
+            if obstacle:
+                self.engine.create_explosion(obstacle, self, 36, "explosion2", contact)
+                self.kill()  # Remove the bullet from all groups if it hits an obstacle
 
         # Check if the bullet has traveled its maximum distance
         if self.distance_traveled >= self.max_distance:
             self.kill()  # Remove the bullet from all groups
 
+    def kill(self):
+        self.engine.bullet_hash.remove(self)
+        super().kill()
+
     def draw(self):
-        self.engine.screen.blit(self.image, self.rect)  # Original position
+        # Return the rects drawn, including the copies on the opposite edges
+        rects = [self.engine.screen.blit(self.image, self.rect)]  # Original position
 
         # Check for Bullet cutoff and draw on the opposite side
         if self.rect.left < 0:  # Left cutoff
-            self.engine.screen.blit(self.image, self.rect.move(self.screen_width, 0))
+            rects.append(self.engine.screen.blit(self.image, self.rect.move(self.screen_width, 0)))
         elif self.rect.right > self.screen_width:  # Right cutoff
-            self.engine.screen.blit(self.image, self.rect.move(-self.screen_width, 0))
+            rects.append(self.engine.screen.blit(self.image, self.rect.move(-self.screen_width, 0)))
 
         if self.rect.top < 0:  # Top cutoff
-            self.engine.screen.blit(self.image, self.rect.move(0, self.screen_height))
+            rects.append(self.engine.screen.blit(self.image, self.rect.move(0, self.screen_height)))
         elif self.rect.bottom > self.screen_height:  # Bottom cutoff
-            self.engine.screen.blit(self.image, self.rect.move(0, -self.screen_height))
+            rects.append(self.engine.screen.blit(self.image, self.rect.move(0, -self.screen_height)))
+        return rects
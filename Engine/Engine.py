@@ -1,3 +1,4 @@
+import math
 import traceback
 
 import pygame
@@ -10,40 +11,104 @@ from Engine.Bullet import Bullet
 from Engine.Explosion import Explosion
 from Engine.SnowFlake import SnowFlake
 from Engine.StatsBoard import StatsBoard
+from Engine.SpatialHash import SpatialHash
+from Engine.Snapshot import GameSnapshot
+from Engine.Recorder import MatchRecorder
+from Engine.Profiler import Profiler
+from Engine.Scheduler import DecisionScheduler
 from Engine.Strategy import Strategy
+import Engine.Assets as Assets
 import Engine.Utils as Utils
+import Engine.Geometry as Geometry
 
 class Engine:
-    def __init__(self):
-        pygame.init()
-
-        self.fonts = {}
-        self.load_fonts()
-        self.sounds = {}
-        self.load_sounds()
+    FEW_OBSTACLES = 4  # up to this many obstacles, their rects are tested directly instead of querying the grid
+
+    def __init__(self, headless=False, rotation_resolution=0.375, rotation_cache_size=None, collision="mask",
+                 dirty_rendering=False):
+        # In headless mode there is no window, no sound and no frame pacing. The simulation
+        # is stepped as fast as the CPU allows by run_headless().
+        self.headless = headless
+        self.start_time = time.perf_counter()
+        self.first_frame_secs = None  # time from the engine's creation to the first frame on screen
+        # Fighter images and masks are rotated to headings quantized to this many degrees, and cached. The default
+        # is exact for the stock fighters, which turn 1.125 and 0.75 degrees per tick. 0 rotates every tick.
+        self.rotation_resolution = rotation_resolution
+        # Max number of cached headings per fighter image. None keeps all of them, 960 at the default resolution.
+        self.rotation_cache_size = rotation_cache_size
+        # Collision backend: "mask" for pixel-perfect masks, "geometry" for polygon hitboxes with analytic wrap-around
+        self.collision = collision
+        # With dirty rendering, each frame only restores and redraws the regions that changed from a cached background,
+        # and pushes them with pygame.display.update(), instead of filling and flipping the whole screen
+        self.dirty_rendering = dirty_rendering
+        self.background = None  # bgcolor, obstacles and the static part of the stats board, for dirty rendering
+        self.dirty_rects = []  # regions drawn on the previous frame, to restore from the background
+
+        # Fonts load on first use, and images and sounds in the background, so the banner shows up without waiting
+        # for assets it does not need. Looking up one that is not loaded yet waits for it.
+        self.fonts = Assets.LazyAssets()
+        self.sounds = Assets.LazyAssets()
+        if not self.headless:
+            pygame.init()
+            Assets.preload()  # queued first, the engine needs the fighter images right away
+            self.load_sounds()
+            self.load_fonts()
 
         self.screen_width = 1600
         self.screen_height = 1200
-        self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+        self.screen = None
+        if not self.headless:
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         self.mode = 1  # 1 for single player, and 2 for two players
+        # All timing-dependent game rules read the engine-owned tick clock (see get_game_time()) rather than the
+        # wall clock, so a game plays out the same way at any simulation speed.
+        self.tick = 25  # msecs per frame
+        self.ticks = 0  # number of simulation ticks since the game started
         self.jetfighter = JetFighter(self)
         self.propfighter = PropFighter(self)
-        self.stats_board = StatsBoard(self)
+        self.stats_board = None
+        if not self.headless:
+            self.stats_board = StatsBoard(self)
         self.obstacle = Obstacle(self, 600, 400)
         self.obstacles = pygame.sprite.Group()
         self.obstacles.add(self.obstacle)
         self.explosions = pygame.sprite.Group()
         self.bullets = pygame.sprite.Group()
+        # Broadphase grids, so collision checks only look at the obstacles and bullets near a sprite
+        self.obstacle_hash = SpatialHash(self.screen_width, self.screen_height)
+        for obstacle in self.obstacles:
+            self.obstacle_hash.update(obstacle)
+        self.bullet_hash = SpatialHash(self.screen_width, self.screen_height)
+        # With a few obstacles away from the screen edges, their rects are tested directly, which is cheaper than
+        # querying the grid. No wrapped-around copy of a fighter or a bullet can reach them then.
+        margin = math.ceil(math.hypot(*JetFighter.SIZE))
+        inner_rect = pygame.Rect(0, 0, self.screen_width, self.screen_height).inflate(-2 * margin, -2 * margin)
+        self.obstacle_rects = None
+        if len(self.obstacles) <= Engine.FEW_OBSTACLES and all(inner_rect.contains(obstacle.rect)
+                                                              for obstacle in self.obstacles):
+            self.obstacle_rects = [(obstacle, obstacle.rect) for obstacle in self.obstacles]
         self.bgcolor = (222, 222, 222)
         self.running = False
         self.updating = False
-        self.tick = 25  # msecs per frame
-        self.start_ts = time.time()
-        self.end_ts = 0
+        self.time_limit = 60  # secs the propfighter needs to survive to win
+        self.end_ts = 0  # wall-clock time the game ended, only used to pace the ending screen
         self.ending_text = ""
+        self.ending_cause = ""  # which check_victory() condition ended the game
+        self.shots_fired = 0
+        self.verbose = True  # print game events to the console
         self.game_over_sound_played = False
         self.strategy_obj = None  # Placeholder for user-defined function
+        self.opponent_obj = None  # Optional Strategy flying the propfighter, see Engine.Opponents
+        self.snapshot = None  # GameSnapshot of the latest tick, read by the strategies
+        self.recorder = None  # MatchRecorder writing every tick to a recording, see start_recording()
         self.decision_thread = None  # Thread for decision function
+        self.profiler = Profiler(self.tick)  # per-phase timings of the main loop
+        # Ticks to the decision thread and commands back to the main loop, see run_decision_function()
+        self.scheduler = DecisionScheduler(self.profiler, log=self.log)
+        self.late_commands = 0  # commands applied late since tick late_since, see report_late_commands()
+        self.late_since = 0
+        self.show_profiler = False  # draw the profiler overlay, toggled with F3
+        self.profile_path = None  # optional .json or .csv file the timings are written to when the game ends
 
     def load_fonts(self):
         fonts = {
@@ -82,20 +147,14 @@ class Engine:
         }
 
         for key in fonts.keys():
-            font = pygame.font.Font(fonts[key]["name"], fonts[key]["size"])
-            self.fonts[key] = font
+            self.fonts.add(key, pygame.font.Font, fonts[key]["name"], fonts[key]["size"])
 
     def load_sounds(self):
         pygame.mixer.init()
 
-        self.sounds = {
-            "banner": pygame.mixer.Sound("sounds/banner.mp3"),
-            "game_start": pygame.mixer.Sound("sounds/game_start.mp3"),
-            "game_over": pygame.mixer.Sound("sounds/game_over.mp3"),
-            "shooting": pygame.mixer.Sound("sounds/shooting.mp3"),
-            "explosion": pygame.mixer.Sound("sounds/explosion.mp3"),
-            "explosion2": pygame.mixer.Sound("sounds/explosion2.mp3"),
-        }
+        # Decoded in the background, the banner music first
+        for name in ("banner", "game_start", "game_over", "shooting", "explosion", "explosion2"):
+            self.sounds.add(name, pygame.mixer.Sound, f"sounds/{name}.mp3", background=True)
 
     def start_decision_thread(self):
         """Start a separate thread for the user-defined decision function."""
@@ -105,109 +164,108 @@ class Engine:
             self.decision_thread.daemon = True  # Daemon thread will exit when the main program exits
             self.decision_thread.start()
 
-    def run_decision_function(self):
-        """Run the user-defined function at regular intervals."""
-        count = 0
-        time.sleep(self.tick / 1000.0)  # Sleep for one tick at the start
+    def publish_snapshot(self):
+        """
+        Capture the game state of the current tick for the strategies, and the recorder if any. Called once per tick by
+        the main loop.
+        """
+        self.snapshot = GameSnapshot.capture(self, self.snapshot.obstacle if self.snapshot is not None else None)
+        if self.recorder is not None:
+            self.recorder.record_tick(self)
+
+    def start_recording(self, path, seed=0):
+        """Record the match to a file, which can be read back with Engine.Recorder.MatchReader. Call before running."""
+        self.recorder = MatchRecorder(path, self, seed)
+
+    def stop_recording(self, result=0):
+        """Finish the recording, if any. result is the return value of check_victory(), 0 if the game did not end."""
+        if self.recorder is not None:
+            self.recorder.close(result, self.ending_cause)
+            self.recorder = None
+
+    def make_decision(self, strategy_obj=None, snapshot=None):
+        """Call the user-defined decision function on a snapshot, the latest one by default, and return its command."""
+        if strategy_obj is None:
+            strategy_obj = self.strategy_obj
+        if snapshot is None:
+            snapshot = self.snapshot
+        try:
+            cmd = strategy_obj.decide(snapshot)  # Call the user-defined function
+        except Exception:
+            print(f"Player strategy function had a brain fart: {traceback.format_exc()}")
+            cmd = Strategy.NOOP
+        return cmd
 
+    def run_decision_function(self):
+        """
+        Call the user-defined function once per tick, on the snapshot of the tick the main loop just published. Its
+        command is applied by the main loop before the next update, see Engine.Scheduler.
+        """
+        last_tick = -1
+        running_late = False  # whether the previous decision ran over, so a slow stretch is only reported once
         while self.running:
-            start_time = time.perf_counter()  # Record the start time
-            # Gather bullet info into a list
-            bullet_info = []
-            for bullet in self.bullets:
-                bullet_info.append({
-                    "x": bullet.x,
-                    "y": bullet.y,
-                    "heading": bullet.heading,
-                    "speed": bullet.speed,
-                    "distance_traveled": bullet.distance_traveled,
-                    "max_distance": bullet.max_distance,
-                })
-            # Jetfighter info
-            jetfighter_info = {
-                "x": self.jetfighter.x,
-                "y": self.jetfighter.y,
-                "heading": self.jetfighter.heading,
-                "turning": self.jetfighter.turning,
-                "turn_speed": self.jetfighter.turn_speed,
-                "curr_speed": self.jetfighter.curr_speed,
-                "top_speed": self.jetfighter.top_speed,
-                "min_speed": self.jetfighter.min_speed,
-                "curr_ammo": self.jetfighter.curr_ammo,
-                "max_ammo": self.jetfighter.max_ammo,
-                "ammo_regen_time": self.jetfighter.ammo_regen_time,
-                "ammo_fire_delay": self.jetfighter.ammo_fire_delay,
-            }
-            # Propfighter info
-            propfighter_info = {
-                "x": self.propfighter.x,
-                "y": self.propfighter.y,
-                "heading": self.propfighter.heading,
-                "turning": self.propfighter.turning,
-                "turn_speed": self.propfighter.turn_speed,
-                "curr_speed": self.propfighter.curr_speed,
-                "min_speed": self.propfighter.min_speed,
-                "top_speed": self.propfighter.top_speed,
-            }
-            # Obstacle info
-            obstacle_info = {
-                "x": self.obstacle.rect.x,
-                "y": self.obstacle.rect.y,
-                "width": self.obstacle.rect.width,
-                "height": self.obstacle.rect.height,
-            }
-            try:
-                cmd = self.strategy_obj.decision(
-                    seq=count,
-                    jetfighter_info=jetfighter_info,
-                    propfighter_info=propfighter_info,
-                    obstacle_info=obstacle_info,
-                    bullet_info=bullet_info,
-                )  # Call the user-defined function
-            except Exception:
-                print(f"Player strategy function had a brain fart: {traceback.format_exc()}")
-                cmd = Strategy.NOOP
-
-            self.handle_player_cmd(cmd)
-            ts = time.perf_counter()
-
-            # Calculate remaining time to delay
-            elapsed_time = (ts - start_time) * 1000  # Convert to milliseconds
-            #print(f"[{ts} Decision function returned command: {cmd}. elapsed time={elapsed_time} msecs] ")
-            remaining_time = self.tick - elapsed_time
-            count += int(elapsed_time // self.tick) + 1
-            if remaining_time < 0:
-                print(f"Decision function took too long to run (took {elapsed_time} msecs). Skipping frame(s).")
-                remaining_time = remaining_time % self.tick
-            time.sleep(remaining_time / 1000.0)  # Sleep for the remaining time
+            snapshot, boundary_ts = self.scheduler.wait_for_tick(last_tick)
+            if snapshot is None:
+                continue
+            if last_tick >= 0:
+                self.profiler.skipped_ticks += snapshot.tick - last_tick - 1
+            start_time = time.perf_counter()
+            self.profiler.record("decision_wake", (start_time - boundary_ts) * 1000)
+            cmd = self.make_decision(snapshot=snapshot)
+            self.scheduler.submit(snapshot.tick, cmd, boundary_ts)
+
+            elapsed_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
+            self.profiler.record("decision", elapsed_time)
+            if elapsed_time > self.scheduler.deadline and not running_late:
+                self.log(f"Decision function took {elapsed_time:.1f} msecs, over the {self.scheduler.deadline} msecs "
+                         f"deadline. Its commands will be applied late until it catches up.")
+            running_late = elapsed_time > self.scheduler.deadline
+            last_tick = snapshot.tick
         print("Decision thread ended.")
 
     def set_strategy_obj(self, strategy_obj:Strategy):
         """Set the user-defined function to be called in the thread."""
         self.strategy_obj = strategy_obj
-
-    def handle_player_cmd(self, cmd):
+        strategy_obj.realtime = not self.headless
+
+    def set_opponent_obj(self, opponent_obj:Strategy):
+        """
+        Set a Strategy, usually an Engine.Opponents.PropStrategy, whose commands fly the propfighter instead of the
+        arrow keys. It is called on every tick before the battlefield is updated, on the main thread, so it has to be
+        fast. FIRE_AMMO is ignored for it.
+        """
+        self.opponent_obj = opponent_obj
+        opponent_obj.realtime = not self.headless
+
+    def handle_player_cmd(self, cmd, fighter=None):
+        # Changes the fighters and the bullets, so only called from the thread updating the battlefield
+        if fighter is None:
+            fighter = self.jetfighter
+        if self.recorder is not None:
+            self.recorder.record_command(fighter is self.jetfighter, cmd)
         if cmd == Strategy.TURN_LEFT:
-            self.jetfighter.turning = -1
+            fighter.turning = -1
         elif cmd == Strategy.TURN_RIGHT:
-            self.jetfighter.turning = 1
+            fighter.turning = 1
         elif cmd == Strategy.GO_STRAIGHT:
-            self.jetfighter.turning = 0
+            fighter.turning = 0
         elif cmd == Strategy.ACCELERATE:
-            self.jetfighter.curr_speed += self.jetfighter.acceleration
-            self.jetfighter.curr_speed = min(self.jetfighter.curr_speed, self.jetfighter.top_speed)
+            fighter.curr_speed += fighter.acceleration
+            fighter.curr_speed = min(fighter.curr_speed, fighter.top_speed)
         elif cmd == Strategy.DECELERATE:
-            self.jetfighter.curr_speed -= self.jetfighter.acceleration
-            self.jetfighter.curr_speed = max(self.jetfighter.curr_speed, self.jetfighter.min_speed)
-        elif cmd == Strategy.FIRE_AMMO:
+            fighter.curr_speed -= fighter.acceleration
+            fighter.curr_speed = max(fighter.curr_speed, fighter.min_speed)
+        elif cmd == Strategy.FIRE_AMMO and fighter is self.jetfighter:
             self.handle_fire_ammo()
 
     def handle_fire_ammo(self):
         # Check whether the jetfighter can fire a bullet
-        if self.jetfighter.curr_ammo > 0 and time.time() >= self.jetfighter.prev_ammo_fire_ts + self.jetfighter.ammo_fire_delay:
+        now = self.get_game_time()
+        if self.jetfighter.curr_ammo > 0 and now >= self.jetfighter.prev_ammo_fire_ts + self.jetfighter.ammo_fire_delay:
             # OK to fire
-            self.jetfighter.prev_ammo_fire_ts = time.time()
+            self.jetfighter.prev_ammo_fire_ts = now
             self.jetfighter.curr_ammo -= 1
+            self.shots_fired += 1
 
             tip_x, tip_y = self.jetfighter.get_tip_coord()
 
@@ -219,45 +277,62 @@ class Engine:
                 heading=self.jetfighter.heading,  # Use the jetfighter's heading
             )
             self.bullets.add(bullet)  # Add the bullet to the sprite group
-            self.sounds["shooting"].play()
+            self.bullet_hash.update(bullet)
+            self.play_sound("shooting")
+
+    def quit(self):
+        """Release the strategies and exit the program."""
+        self.running = False
+        self.scheduler.close()
+        self.stop_recording()
+        self.dump_profile()
+        for strategy_obj in (self.strategy_obj, self.opponent_obj):
+            if strategy_obj is not None:
+                strategy_obj.close()
+        Assets.shutdown()
+        pygame.quit()
+        exit()
 
     def check_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                exit()
+                self.quit()
 
             if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    self.show_profiler = not self.show_profiler
+                    continue
+
                 # If game has already ended, press any key to exit the program
                 if self.end_ts > 0 and time.time() - self.end_ts > 1.5 and not self.updating:
-                    pygame.quit()
-                    exit()
+                    self.quit()
 
                 # Check for key presses
                 keys = pygame.key.get_pressed()
 
-                # Propfighter controls
-                if keys[pygame.K_LEFT]:
-                    if self.propfighter.turning == 0:
-                        self.propfighter.turning = -1
-                    elif self.propfighter.turning == 1:
-                        self.propfighter.turning = 0
-
-                if keys[pygame.K_RIGHT]:
-                    if self.propfighter.turning == 0:
-                        self.propfighter.turning = 1
-                    elif self.propfighter.turning == -1:
-                        self.propfighter.turning = 0
-
-                if keys[pygame.K_UP]:
-                    self.propfighter.curr_speed += self.propfighter.acceleration
-                    if self.propfighter.curr_speed > self.propfighter.top_speed:
-                        self.propfighter.curr_speed = self.propfighter.top_speed
-
-                if keys[pygame.K_DOWN]:
-                    self.propfighter.curr_speed -= self.propfighter.acceleration
-                    if self.propfighter.curr_speed < self.propfighter.min_speed:
-                        self.propfighter.curr_speed = self.propfighter.min_speed
+                # Propfighter controls, unless a controller flies it
+                if self.opponent_obj is None:
+                    if keys[pygame.K_LEFT]:
+                        if self.propfighter.turning == 0:
+                            self.propfighter.turning = -1
+                        elif self.propfighter.turning == 1:
+                            self.propfighter.turning = 0
+
+                    if keys[pygame.K_RIGHT]:
+                        if self.propfighter.turning == 0:
+                            self.propfighter.turning = 1
+                        elif self.propfighter.turning == -1:
+                            self.propfighter.turning = 0
+
+                    if keys[pygame.K_UP]:
+                        self.propfighter.curr_speed += self.propfighter.acceleration
+                        if self.propfighter.curr_speed > self.propfighter.top_speed:
+                            self.propfighter.curr_speed = self.propfighter.top_speed
+
+                    if keys[pygame.K_DOWN]:
+                        self.propfighter.curr_speed -= self.propfighter.acceleration
+                        if self.propfighter.curr_speed < self.propfighter.min_speed:
+                            self.propfighter.curr_speed = self.propfighter.min_speed
 
                 # Jetfighter controls
                 if keys[pygame.K_a] and self.mode == 2:
@@ -286,7 +361,21 @@ class Engine:
                 if event.key == pygame.K_SPACE and self.mode == 2:
                     self.handle_fire_ammo()
 
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def play_sound(self, sound):
+        # There is no mixer in headless mode
+        if not self.headless:
+            self.sounds[sound].play()
+
+    def get_game_time(self):
+        """Return the game clock in seconds, i.e. the number of simulated ticks times the tick length."""
+        return self.ticks * self.tick / 1000.0
+
     def update_battlefield(self):
+        self.ticks += 1
         self.obstacle.update()
 
         # Display both fighters
@@ -300,6 +389,10 @@ class Engine:
         self.explosions.update()
 
     def draw_battlefield(self):
+        if self.dirty_rendering:
+            self.draw_battlefield_dirty()
+            return
+
         self.screen.fill(self.bgcolor)
 
         # Draw the obstacle
@@ -310,7 +403,9 @@ class Engine:
         self.propfighter.draw()
 
         # Stats board
+        ts = time.perf_counter()
         self.stats_board.draw()
+        self.profiler.lap("stats_board", ts)
 
         # Display bullets
         for bullet in self.bullets:
@@ -327,72 +422,185 @@ class Engine:
         if self.end_ts > 0 and time.time() - self.end_ts > 1.5:
             self.display_game_ending()
 
+        if self.show_profiler:
+            self.profiler.draw_overlay(self.screen, self.fonts["chakra-16-regular"])
+
+        ts = time.perf_counter()
         pygame.display.flip()
+        self.profiler.lap("display_flip", ts)
+
+    def render_background(self):
+        background = pygame.Surface(self.screen.get_size()).convert()
+        background.fill(self.bgcolor)
+        for obstacle in self.obstacles:
+            background.blit(obstacle.image, obstacle.rect)
+        self.stats_board.draw_static(surface=background)
+        return background
+
+    def draw_battlefield_dirty(self):
+        if self.background is None:
+            # First frame: show the whole background
+            self.background = self.render_background()
+            self.screen.blit(self.background, (0, 0))
+            self.dirty_rects = [self.screen.get_rect()]
+
+        # Erase what was drawn on the previous frame
+        for rect in self.dirty_rects:
+            self.screen.blit(self.background, rect, rect)
+
+        # Same drawing order as draw_battlefield()
+        rects = self.jetfighter.draw() + self.propfighter.draw()
+        # The static part of the stats board is on the background, so put it back over any fighter crossing it
+        board_rect = self.stats_board.get_rect()
+        for rect in rects:
+            if rect.colliderect(board_rect):
+                self.stats_board.draw_static(rect)
+
+        ts = time.perf_counter()
+        rects += self.stats_board.draw(static=False)
+        self.profiler.lap("stats_board", ts)
+
+        for bullet in self.bullets:
+            rects += bullet.draw()
+
+        for explosion in self.explosions:
+            if not self.updating:
+                # explosions still need updating to finish animation
+                explosion.update()
+            rect = explosion.draw()
+            if rect is not None:
+                rects.append(rect)
+
+        if self.end_ts > 0 and time.time() - self.end_ts > 1.5:
+            rects += self.display_game_ending()
+
+        if self.show_profiler:
+            rects.append(self.profiler.draw_overlay(self.screen, self.fonts["chakra-16-regular"]))
+
+        ts = time.perf_counter()
+        pygame.display.update(self.dirty_rects + rects)
+        self.profiler.lap("display_flip", ts)
+        self.dirty_rects = rects
+
+    def dump_profile(self):
+        """Write the profiler timings to profile_path, if set."""
+        if self.profile_path is not None:
+            self.profiler.dump(self.profile_path)
+            self.log(f"Frame timings written to {self.profile_path}")
+
+    def find_collision(self, sprite, group):
+        """
+        Check a sprite against a group with the selected collision backend.
+        :return: (colliding sprite, contact point), or (None, None). The contact point is None with the mask backend.
+        """
+        if self.collision == "geometry":
+            return Geometry.collide_with_group(sprite, group, self.screen_width, self.screen_height)
+        return Utils.check_collision_with_group(sprite, group), None
+
+    def get_obstacles_near(self, rect):
+        """Return the obstacles a fighter or a bullet with this rect may collide with, for find_collision()."""
+        if self.obstacle_rects is not None:
+            return [obstacle for obstacle, obstacle_rect in self.obstacle_rects if obstacle_rect.colliderect(rect)]
+        return self.obstacle_hash.query(rect)
+
+    def find_pair_collision(self, sprite1, sprite2):
+        """
+        Check two sprites against each other with the selected collision backend.
+        :return: (whether they collide, contact point). The contact point is None with the mask backend.
+        """
+        if self.collision == "geometry":
+            contact = Geometry.collide(sprite1, sprite2, self.screen_width, self.screen_height)
+            return contact is not None, contact
+        return bool(Utils.check_collision(sprite1, sprite2)), None
 
     def check_victory(self):
         # Return 0 for no one wins, 1 for jetfighter victory, -1 for propfighter victory
         # Check if a bullet hits propfighter
-        bullet = Utils.check_collision_with_group(self.propfighter, self.bullets)
+        bullet, contact = self.find_collision(self.propfighter, self.bullet_hash.query(self.propfighter.rect))
         if bullet:
-            print(f"Propfighter hit by a bullet! Jetfighter won!!")
-            self.create_explosion(bullet, self.propfighter, 71, "explosion")
-            self.bullets.remove(bullet)
+            self.log(f"Propfighter hit by a bullet! Jetfighter won!!")
+            self.ending_cause = "bullet_hit"
+            self.create_explosion(bullet, self.propfighter, 71, "explosion", contact)
+            bullet.kill()
             self.propfighter.kill()
-            self.ending_text = f"Jet-fighter won!! Prop-fighter survived {int(time.time() - self.start_ts)} seconds."
+            self.ending_text = f"Jet-fighter won!! Prop-fighter survived {int(self.get_game_time())} seconds."
             return 1
         # Check if jetfighter collides with obstacle
-        obstacle = Utils.check_collision_with_group(self.jetfighter, self.obstacles)
+        obstacle, contact = self.find_collision(self.jetfighter, self.get_obstacles_near(self.jetfighter.rect))
         if obstacle:
-            print(f"Jetfighter hit by an obstacle! Propfighter won!!")
-            self.create_explosion(obstacle, self.jetfighter, 71, "explosion")
+            self.log(f"Jetfighter hit by an obstacle! Propfighter won!!")
+            self.ending_cause = "jet_obstacle"
+            self.create_explosion(obstacle, self.jetfighter, 71, "explosion", contact)
             self.jetfighter.kill()
             self.ending_text = f"Jet-fighter committed suicide!! Prop-fighter won!!"
             return -1
         # Check if propfighter collides with obstacle
-        obstacle = Utils.check_collision_with_group(self.propfighter, self.obstacles)
+        obstacle, contact = self.find_collision(self.propfighter, self.get_obstacles_near(self.propfighter.rect))
         if obstacle:
-            print(f"Propfighter hit by an obstacle! Jetfighter won!!")
-            self.create_explosion(obstacle, self.propfighter, 71, "explosion")
+            self.log(f"Propfighter hit by an obstacle! Jetfighter won!!")
+            self.ending_cause = "prop_obstacle"
+            self.create_explosion(obstacle, self.propfighter, 71, "explosion", contact)
             self.propfighter.kill()
-            self.ending_text = f"Jet-fighter won!! Prop-fighter survived {int(time.time() - self.start_ts)} seconds."
+            self.ending_text = f"Jet-fighter won!! Prop-fighter survived {int(self.get_game_time())} seconds."
             return 1
         # Check if propfighter collides with jetfighter. In this case, propfighter wins.
-        if Utils.check_collision(self.propfighter, self.jetfighter):
-            print(f"Jetfighter crashed with propfighter! Propfighter won!!")
-            self.create_explosion(self.jetfighter, self.propfighter, 71, "explosion")
+        collided, contact = self.find_pair_collision(self.propfighter, self.jetfighter)
+        if collided:
+            self.log(f"Jetfighter crashed with propfighter! Propfighter won!!")
+            self.ending_cause = "collision"
+            self.create_explosion(self.jetfighter, self.propfighter, 71, "explosion", contact)
             self.jetfighter.kill()
             self.propfighter.kill()
             self.ending_text = f"Jet-fighter crashed into Prop-fighter!! Prop-fighter won!!"
             return -1
+        # Check if propfighter has survived long enough. In this case, propfighter wins.
+        if self.get_game_time() > self.time_limit:
+            self.log(f"Propfighter survived for {self.time_limit} seconds! Propfighter won!!")
+            self.ending_cause = "timeout"
+            self.ending_text = f"Prop-fighter survived {self.time_limit} seconds!! Prop-fighter won!!"
+            return -1
         return 0
 
-    def create_explosion(self, sprite1, sprite2, size, sound):
-        offset = (sprite2.rect.left - sprite1.rect.left, sprite2.rect.top - sprite1.rect.top)
-        collision_coord = sprite1.mask.overlap(sprite2.mask, offset)
-        if collision_coord is None:
-            offset = (sprite2.rect.x - sprite1.rect.x, sprite2.rect.y - sprite1.rect.y)
-            closest_point = Utils.find_closest_collision_point(sprite1.mask, sprite2.mask, offset)
-            if closest_point is not None:
-                collision_x, collision_y = collision_coord
-            else:
-                # Failed to find closest point. Create explosion at sprite2
-                collision_x, collision_y = sprite2.rect.x, sprite2.rect.y
+    def create_explosion(self, sprite1, sprite2, size, sound, contact=None):
+        """Create an explosion where the sprites collide. contact is the collision point, if the backend found it."""
+        if self.headless and self.recorder is None:
+            # Explosions are purely visual
+            return
+        if contact is not None:
+            x, y = contact
         else:
-            collision_x, collision_y = collision_coord
-        explosion = Explosion(self, collision_x + sprite1.rect.x, collision_y + sprite1.rect.y, size)
-        self.explosions.add(explosion)
-        self.sounds[sound].play()
+            offset = (sprite2.rect.left - sprite1.rect.left, sprite2.rect.top - sprite1.rect.top)
+            collision_coord = sprite1.mask.overlap(sprite2.mask, offset)
+            if collision_coord is None:
+                offset = (sprite2.rect.x - sprite1.rect.x, sprite2.rect.y - sprite1.rect.y)
+                closest_point = Utils.find_closest_collision_point(sprite1.mask, sprite2.mask, offset)
+                if closest_point is not None:
+                    collision_x, collision_y = closest_point
+                else:
+                    # Failed to find closest point. Create explosion at sprite2
+                    collision_x, collision_y = sprite2.rect.x, sprite2.rect.y
+            else:
+                collision_x, collision_y = collision_coord
+            x, y = collision_x + sprite1.rect.x, collision_y + sprite1.rect.y
+        if self.recorder is not None:
+            self.recorder.record_explosion(self.ticks, x, y, size)
+        if self.headless:
+            return
+        self.explosions.add(Explosion(self, x, y, size))
+        self.play_sound(sound)
 
     def display_game_ending(self):
+        # Return the rects drawn
         game_over = self.fonts["chakra-80-bold"].render("GAME OVER", True, (255, 165, 0))
-        self.screen.blit(game_over, ((self.screen.get_width() - game_over.get_width()) // 2, 150))
+        rects = [self.screen.blit(game_over, ((self.screen.get_width() - game_over.get_width()) // 2, 150))]
         press_key = self.fonts["chakra-28-regular"].render("Press any key to exit...", True, (66, 66, 66))
-        self.screen.blit(press_key, ((self.screen.get_width() - press_key.get_width()) // 2, 1060))
+        rects.append(self.screen.blit(press_key, ((self.screen.get_width() - press_key.get_width()) // 2, 1060)))
         ending_text = self.fonts["chakra-32-bold"].render(self.ending_text, True, (66, 66, 66))
-        self.screen.blit(ending_text, ((self.screen.get_width() - ending_text.get_width()) // 2, 290))
+        rects.append(self.screen.blit(ending_text, ((self.screen.get_width() - ending_text.get_width()) // 2, 290)))
         if not self.game_over_sound_played:
-            self.sounds["game_over"].play()
+            self.play_sound("game_over")
             self.game_over_sound_played = True
+        return rects
 
     def display_banner(self):
         pygame.display.set_caption("Game Selection")
@@ -413,14 +621,20 @@ class Engine:
             snowflake = SnowFlake(self)
             snowflakes.add(snowflake)
 
-        self.sounds["banner"].play()
+        banner_playing = False
 
         while True:
+            # The banner music starts as soon as it is decoded, rather than holding up the first frame
+            if not banner_playing and self.sounds.is_ready("banner"):
+                self.play_sound("banner")
+                banner_playing = True
+
             self.screen.fill((0, 0, 0))
 
             # Handle events
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    Assets.shutdown()
                     pygame.quit()
                     return
                 elif event.type == pygame.MOUSEBUTTONDOWN:
@@ -428,7 +642,8 @@ class Engine:
                         self.mode = 1
                     elif rect_2.collidepoint(pygame.mouse.get_pos()):
                         self.mode = 2
-                    self.sounds["banner"].stop()
+                    if banner_playing:
+                        self.sounds["banner"].stop()
                     return
 
             # Hover detection
@@ -458,38 +673,115 @@ class Engine:
             self.screen.blit(label_2, rect_2)
 
             pygame.display.flip()
+            if self.first_frame_secs is None:
+                self.first_frame_secs = time.perf_counter() - self.start_time
+                if self.verbose:
+                    print(f"First frame after {self.first_frame_secs * 1000:.0f} msecs")
 
     def run(self):
         pygame.display.set_caption("Battle!")
 
         self.running = True
         self.updating = True
-        self.start_ts = time.time()
+        self.ticks = 0
+        # The images and explosion frames are decoded by now, converting them here keeps them out of the first ticks
+        Assets.prewarm()
+        self.publish_snapshot()
         self.start_decision_thread()  # Start the thread when the function is set
+        self.scheduler.publish(self.snapshot)
 
-        self.sounds["game_start"].play()
+        self.play_sound("game_start")
 
+        # Frames start on absolute tick boundaries, so sleep inaccuracies do not add up
+        next_frame_ts = time.perf_counter()
         while self.running:
-            start_time = pygame.time.get_ticks()  # Start timing
+            tick_start = ts = time.perf_counter()
 
             # Handle events
             self.check_events()
+            ts = self.profiler.lap("check_events", ts)
             if self.updating:
+                # The commands decided up to the previous tick's snapshot, applied on this thread
+                if self.decision_thread is not None:
+                    commands = self.scheduler.drain(self.ticks)
+                    for _, cmd in commands:
+                        self.handle_player_cmd(cmd)
+                    self.report_late_commands(commands)
+                if self.opponent_obj is not None:
+                    self.handle_player_cmd(self.make_decision(self.opponent_obj), self.propfighter)
                 self.update_battlefield()
+                self.publish_snapshot()
+                self.scheduler.publish(self.snapshot)
+                ts = self.profiler.lap("update_battlefield", ts)
             self.draw_battlefield()
+            ts = self.profiler.lap("draw_battlefield", ts)
             if self.updating:
-                if self.check_victory() != 0:
+                result = self.check_victory()
+                self.profiler.lap("check_victory", ts)
+                if result != 0:
                     self.end_ts = time.time()
                     self.updating = False
-                    print(f"Game ended! Prop-fighter survived for {int(self.end_ts - self.start_ts)} seconds!")
-
-            # Calculate elapsed time
-            elapsed_time = pygame.time.get_ticks() - start_time
-
-            # Calculate remaining time to delay
-            remaining_time = self.tick - elapsed_time
+                    self.stop_recording(result)
+                    self.dump_profile()
+                    print(f"Game ended! Prop-fighter survived for {int(self.get_game_time())} seconds!")
+            self.profiler.lap("tick", tick_start)
+
+            # Wait for the next tick boundary. A frame that ran over is caught up by the next ones, unless it is more
+            # than a tick late.
+            next_frame_ts += self.tick / 1000.0
+            remaining_time = next_frame_ts - time.perf_counter()
             if remaining_time > 0:
-                pygame.time.delay(remaining_time)  # Delay only if there's time left
+                time.sleep(remaining_time)
+            elif remaining_time < -self.tick / 1000.0:
+                next_frame_ts = time.perf_counter()
 
         self.running = False
+        self.report_late_commands(None)
+        self.scheduler.close()
         pygame.quit()
+
+    def report_late_commands(self, commands):
+        """
+        Count the commands of the decision thread applied late, and log them once per stretch of late ticks, when the
+        command of a tick is on time again. They are counted in the profiler too, see Engine.Scheduler.
+        :param commands: the (tick, command) pairs drained before updating the battlefield past self.ticks, or None to
+                         report the current stretch
+        """
+        if commands is not None:
+            late = sum(1 for decided_tick, _ in commands if decided_tick < self.ticks)
+            if late and not self.late_commands:
+                self.late_since = self.ticks + 1
+            self.late_commands += late
+            # Ticks without any command carry on the stretch
+            if late or not commands:
+                return
+        if self.late_commands:
+            self.log(f"{self.late_commands} commands applied late, on ticks {self.late_since} to {self.ticks}")
+            self.late_commands = 0
+
+    def run_headless(self, max_ticks=None):
+        """
+        Run the match without a window, sound or frame pacing, stepping the simulation as fast as the CPU allows.
+        The strategy is called synchronously once per tick, before the battlefield is updated.
+        :param max_ticks: optional cap on the number of ticks to simulate, on top of the game's time limit
+        :return: 1 for jetfighter victory, -1 for propfighter victory, 0 if max_ticks was reached first
+        """
+        self.running = True
+        self.updating = True
+        self.ticks = 0
+        self.publish_snapshot()
+
+        result = 0
+        while result == 0 and (max_ticks is None or self.ticks < max_ticks):
+            if self.mode == 1 and self.strategy_obj is not None:
+                self.handle_player_cmd(self.make_decision())
+            if self.opponent_obj is not None:
+                self.handle_player_cmd(self.make_decision(self.opponent_obj), self.propfighter)
+            self.update_battlefield()
+            self.publish_snapshot()
+            result = self.check_victory()
+
+        self.stop_recording(result)
+        self.updating = False
+        self.running = False
+        return result
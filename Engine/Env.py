@@ -0,0 +1,251 @@
+"""
+Reinforcement-learning environments for training jetfighter controllers, with the usual reset() and step() API:
+
+    from Engine.Env import Env, VectorEnv
+
+    env = Env(opponent=Opponents.PredictiveDodge)
+    obs = env.reset(seed=0)
+    obs, reward, done, info = env.step(Strategy.TURN_LEFT)
+
+    envs = VectorEnv(256)
+    obs = envs.reset(seed=0)  # (256, OBSERVATION_SIZE) float32 array
+    obs, rewards, dones, info = envs.step(actions)  # actions: array of 256 Strategy commands
+
+Actions are the Strategy command constants. Env steps a headless Engine, so it plays exactly like a tournament match
+and can use the propfighter controllers of Engine.Opponents. VectorEnv steps many matches per call on the
+BatchSimulator, and starts a new match in place of every one that ended. Neither creates a pygame display.
+
+Both return observations with the layout of OBSERVATION_FIELDS: positions are divided by the screen size, headings
+are given as their sine and cosine, speeds are divided by the top speed, and the bullets in flight come oldest first,
+padded with zeros. The reward is 1 when the jetfighter wins, -1 when the propfighter wins, and 0 otherwise.
+"""
+import random
+from collections import namedtuple
+
+import numpy as np
+
+import Engine.Prediction as Prediction
+from Engine.BatchSimulator import BatchSimulator
+from Engine.Bullet import Bullet
+from Engine.Engine import Engine
+from Engine.Fighter import JetFighter, PropFighter
+
+# The jetfighter can have at most this many bullets in flight, as in BatchSimulator
+MAX_BULLETS = int(JetFighter.SPECS["max_ammo"] +
+                  (Bullet.MAX_DISTANCE / Bullet.SPEED) // JetFighter.SPECS["ammo_fire_delay"] + 1)
+BULLET_FIELDS = ("x", "y", "heading_sin", "heading_cos", "range_left", "alive")
+OBSERVATION_FIELDS = (
+    ("jet_x", "jet_y", "jet_heading_sin", "jet_heading_cos", "jet_speed", "jet_turning", "jet_ammo", "jet_fire_ready",
+     "prop_x", "prop_y", "prop_heading_sin", "prop_heading_cos", "prop_speed", "prop_turning",
+     "prop_dx", "prop_dy",  # shortest offset from the jetfighter to the propfighter on the wrapped screen
+     "time")  # game time over the time limit
+    + tuple(f"bullet{i}_{field}" for i in range(MAX_BULLETS) for field in BULLET_FIELDS))
+OBSERVATION_SIZE = len(OBSERVATION_FIELDS)
+ACTION_COUNT = 7  # Strategy.NOOP to Strategy.FIRE_AMMO
+
+# Fighter state arrays read by observe(), with the attribute names of BatchSimulator's FighterArrays
+FighterView = namedtuple("FighterView", ["x", "y", "heading", "speed", "turning", "ammo", "prev_fire_ts"])
+
+
+def observe(jet, prop, bullet_x, bullet_y, bullet_heading, bullet_distance, bullet_alive, game_time, time_limit,
+            screen_width=Prediction.SCREEN_WIDTH, screen_height=Prediction.SCREEN_HEIGHT):
+    """
+    Encode the state of N matches as observations.
+    :param jet, prop: fighter states with arrays of N values, FighterArrays or FighterView
+    :param bullet_x, bullet_y, bullet_heading, bullet_distance, bullet_alive: (N, MAX_BULLETS) arrays
+    :param game_time: array of N game times in secs
+    :return: (N, OBSERVATION_SIZE) float32 array
+    """
+    n = len(jet.x)
+    obs = np.zeros((n, OBSERVATION_SIZE), dtype=np.float32)
+    jet_radians = np.radians(jet.heading)
+    prop_radians = np.radians(prop.heading)
+    fire_delay = JetFighter.SPECS["ammo_fire_delay"]
+    dx = np.mod(prop.x - jet.x + screen_width / 2, screen_width) - screen_width / 2
+    dy = np.mod(prop.y - jet.y + screen_height / 2, screen_height) - screen_height / 2
+    obs[:, :17] = np.stack([
+        jet.x / screen_width, jet.y / screen_height, np.sin(jet_radians), np.cos(jet_radians),
+        jet.speed / JetFighter.SPECS["top_speed"], jet.turning, jet.ammo / JetFighter.SPECS["max_ammo"],
+        np.minimum((game_time - jet.prev_fire_ts) / fire_delay, 1.0),
+        prop.x / screen_width, prop.y / screen_height, np.sin(prop_radians), np.cos(prop_radians),
+        prop.speed / PropFighter.SPECS["top_speed"], prop.turning,
+        dx / screen_width, dy / screen_height, game_time / time_limit,
+    ], axis=1)
+
+    # Bullets oldest first, the ones not in flight last
+    order = np.argsort(np.where(bullet_alive, -bullet_distance, np.inf), axis=1, kind="stable")
+    alive = np.take_along_axis(bullet_alive, order, axis=1)
+    radians = np.radians(np.take_along_axis(bullet_heading, order, axis=1))
+    bullets = np.stack([
+        np.take_along_axis(bullet_x, order, axis=1) / screen_width,
+        np.take_along_axis(bullet_y, order, axis=1) / screen_height,
+        np.sin(radians), np.cos(radians),
+        1.0 - np.take_along_axis(bullet_distance, order, axis=1) / Bullet.MAX_DISTANCE,
+        np.ones(alive.shape),
+    ], axis=2)
+    obs[:, 17:] = np.where(alive[:, :, None], bullets, 0.0).reshape(n, -1)
+    return obs
+
+
+class Env:
+    """One headless match, stepped one tick per call."""
+
+    def __init__(self, opponent=None, max_ticks=None, **engine_args):
+        """
+        :param opponent: optional callable creating the Strategy flying the propfighter, usually one of the classes of
+                         Engine.Opponents. A new one is created for every match.
+        :param max_ticks: optional cap on the number of ticks of a match, on top of the game's time limit. A match cut
+                          short ends with a reward of 0 and info["truncated"] set.
+        :param engine_args: arguments of the headless Engine, such as collision
+        """
+        self.opponent = opponent
+        self.max_ticks = max_ticks
+        self.engine_args = engine_args
+        self.engine = None
+        self.opponent_obj = None
+        self.done = True
+
+    def reset(self, seed=None):
+        """
+        Start a new match and return its first observation.
+        :param seed: seed for the random module, as in Tournament.run_match(), so randomized opponents replay the same
+        """
+        if seed is not None:
+            random.seed(seed)
+        self.close()
+        self.engine = Engine(headless=True, **self.engine_args)
+        self.engine.verbose = False
+        if self.opponent is not None:
+            self.opponent_obj = self.opponent()
+            self.engine.set_opponent_obj(self.opponent_obj)
+        self.engine.running = True
+        self.engine.updating = True
+        self.engine.publish_snapshot()
+        self.done = False
+        return self.observe()[0]
+
+    def step(self, action):
+        """
+        Play one tick with the jetfighter command action, in the order of Engine.run_headless().
+        :return: (observation, reward, done, info), info having the result, the cause of the end of the match, the
+                 ticks played, the shots fired and whether the match was truncated by max_ticks
+        """
+        if self.done:
+            raise RuntimeError("The match is over, call reset() to start a new one")
+        engine = self.engine
+        engine.handle_player_cmd(int(action))
+        if self.opponent_obj is not None:
+            engine.handle_player_cmd(engine.make_decision(self.opponent_obj), engine.propfighter)
+        engine.update_battlefield()
+        engine.publish_snapshot()
+        result = engine.check_victory()
+        truncated = result == 0 and self.max_ticks is not None and engine.ticks >= self.max_ticks
+        self.done = result != 0 or truncated
+        info = {
+            "result": result,
+            "cause": engine.ending_cause,
+            "ticks": engine.ticks,
+            "shots_fired": engine.shots_fired,
+            "truncated": truncated,
+        }
+        return self.observe()[0], float(result), self.done, info
+
+    def observe(self):
+        engine = self.engine
+        jet = engine.jetfighter
+        prop = engine.propfighter
+        bullet_x, bullet_y, bullet_heading, bullet_distance, bullet_alive = (
+            np.zeros((1, MAX_BULLETS)) for _ in range(5))
+        for i, bullet in enumerate(list(engine.bullets)[:MAX_BULLETS]):
+            bullet_x[0, i], bullet_y[0, i] = bullet.x, bullet.y
+            bullet_heading[0, i], bullet_distance[0, i] = bullet.heading, bullet.distance_traveled
+            bullet_alive[0, i] = 1
+        return observe(
+            FighterView(np.array([jet.x]), np.array([jet.y]), np.array([jet.heading]), np.array([jet.curr_speed]),
+                        np.array([jet.turning]), np.array([jet.curr_ammo]), np.array([jet.prev_ammo_fire_ts])),
+            FighterView(np.array([prop.x]), np.array([prop.y]), np.array([prop.heading]), np.array([prop.curr_speed]),
+                        np.array([prop.turning]), np.array([prop.curr_ammo]), np.array([prop.prev_ammo_fire_ts])),
+            bullet_x, bullet_y, bullet_heading, bullet_distance, bullet_alive.astype(bool),
+            np.array([engine.get_game_time()]), engine.time_limit, engine.screen_width, engine.screen_height)
+
+    def close(self):
+        if self.opponent_obj is not None:
+            self.opponent_obj.close()
+            self.opponent_obj = None
+
+
+class VectorEnv:
+    """
+    n matches on a BatchSimulator, all stepped by one call. A match that ends is started again right away, and the
+    observation returned for it is the first one of the new match, the last one of the old match being in
+    info["final_observation"].
+    """
+
+    def __init__(self, n, prop_policy=None, random_starts=False, max_ticks=None,
+                 heading_resolution=BatchSimulator.DEFAULT_HEADING_RESOLUTION):
+        """
+        :param n: number of matches
+        :param prop_policy: optional callable taking the BatchSimulator and returning an array of n propfighter
+                            commands, as in BatchSimulator.run(). The propfighters fly straight without it.
+        :param random_starts: start every match with the fighters at random positions and headings, instead of the
+                              engine's starting positions
+        :param max_ticks: optional cap on the number of ticks of a match, on top of the game's time limit
+        """
+        self.n = n
+        self.prop_policy = prop_policy
+        self.random_starts = random_starts
+        self.max_ticks = max_ticks
+        self.simulator = BatchSimulator(n, heading_resolution, Prediction.SCREEN_WIDTH, Prediction.SCREEN_HEIGHT,
+                                        Prediction.TICK, max_bullets=MAX_BULLETS)
+        self.rng = np.random.default_rng()
+
+    def reset(self, seed=None):
+        """
+        Start all the matches over and return their first observations.
+        :param seed: seed of the random starting positions, so a run with random_starts can be repeated
+        """
+        self.rng = np.random.default_rng(seed)
+        self.reset_matches(np.arange(self.n))
+        return self.observe()
+
+    def reset_matches(self, indices):
+        seed = int(self.rng.integers(2 ** 63)) if self.random_starts else None
+        self.simulator.reset(indices, seed)
+
+    def step(self, actions):
+        """
+        Play one tick of every match.
+        :param actions: array of n Strategy commands for the jetfighters
+        :return: (observations, rewards, dones, info): an (n, OBSERVATION_SIZE) float32 array, and arrays of n rewards
+                 and done flags. info holds arrays of n values: result, cause (index into BatchSimulator.CAUSES),
+                 ticks, shots_fired and truncated, and final_observation, whose rows are only set for the matches
+                 that ended.
+        """
+        simulator = self.simulator
+        prop_cmds = self.prop_policy(simulator) if self.prop_policy is not None else None
+        result = simulator.step(np.asarray(actions), prop_cmds).copy()
+        truncated = np.zeros(self.n, dtype=bool)
+        if self.max_ticks is not None:
+            truncated = (result == 0) & (simulator.ticks >= self.max_ticks)
+        dones = (result != 0) | truncated
+        info = {
+            "result": result,
+            "cause": simulator.cause.copy(),
+            "ticks": simulator.ticks.copy(),
+            "shots_fired": simulator.shots_fired.copy(),
+            "truncated": truncated,
+        }
+        obs = self.observe()
+        info["final_observation"] = obs.copy()
+        ended = np.flatnonzero(dones)
+        if len(ended):
+            self.reset_matches(ended)
+            obs[ended] = self.observe()[ended]
+        return obs, result.astype(np.float32), dones, info
+
+    def observe(self):
+        simulator = self.simulator
+        return observe(simulator.jet, simulator.prop, simulator.bullet_x, simulator.bullet_y,
+                       simulator.bullet_heading, simulator.bullet_distance, simulator.bullet_alive,
+                       simulator.get_game_time(), simulator.time_limit, simulator.screen_width,
+                       simulator.screen_height)
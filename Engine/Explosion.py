@@ -1,9 +1,8 @@
 import pygame
-from PIL import Image
 
-class Explosion(pygame.sprite.Sprite):
-    frames_cache = {}  # map from size to list of frame images
+import Engine.Assets as Assets
 
+class Explosion(pygame.sprite.Sprite):
     def __init__(self, engine, x, y, size):
         """
         :param x: center x of the explosion animation
@@ -13,9 +12,7 @@ class Explosion(pygame.sprite.Sprite):
         super().__init__()
         self.engine = engine
         self.frame_index = 1
-        if size not in Explosion.frames_cache:
-            Explosion.frames_cache[size] = Explosion.load_gif_frames("images/explosion.gif", size)
-        self.frames = Explosion.frames_cache[size]
+        self.frames = Assets.get_explosion_frames(size)  # decoded once, see Assets.prewarm()
         self.x = x
         self.y = y
         self.size = size
@@ -23,22 +20,6 @@ class Explosion(pygame.sprite.Sprite):
         self.image = self.frames[self.frame_index]
         self.rect = self.image.get_rect(center=(self.x, self.y))
 
-    # Function to load GIF frames as pygame surfaces
-    @staticmethod
-    def load_gif_frames(gif_path, size):
-        frames = []
-        with Image.open(gif_path) as gif:
-            for frame in range(gif.n_frames):
-                gif.seek(frame)
-                # Convert PIL image to a format pygame can use
-                frame_surface = pygame.image.fromstring(
-                    gif.tobytes(), gif.size, gif.mode
-                )
-                frame_surface = pygame.transform.scale(frame_surface,
-                                                       (size, frame_surface.get_height() * size // frame_surface.get_width()))
-                frames.append(frame_surface)
-        return frames
-
     def update(self):
         current_tick = pygame.time.get_ticks()
         if current_tick - self.starting_tick > 100:
@@ -50,6 +31,8 @@ class Explosion(pygame.sprite.Sprite):
                 self.kill()
 
     def draw(self):
+        # Return the rect drawn, or None
         if self.frame_index > 0:
-            self.engine.screen.blit(self.image, self.rect)
+            return self.engine.screen.blit(self.image, self.rect)
+        return None
 
@@ -1,19 +1,23 @@
 import pygame
 import math
-import time
 
+import Engine.Assets as Assets
 import Engine.Utils as Utils
+from Engine.SpriteCache import RotationCache
 
 
 class Fighter(pygame.sprite.Sprite):
+    SIZE = (80, 80)  # on-screen size of the fighter image before rotation
+
     def __init__(self, engine, image_file: str, top_speed: float, min_speed: float, curr_speed: float, acceleration: float,
                  turn_speed: float, max_ammo: int, curr_ammo: int, ammo_regen_time: int, 
                  ammo_fire_delay: float, x: float, y: float, turning: int, heading: float):
         super().__init__()
         self.engine = engine
         self.image_file = image_file  # String pointing to the image file path
-        self.image = pygame.image.load(self.image_file)  # Load the image file
-        self.image = pygame.transform.scale(self.image, (80, 80))  # Scale the loaded image
+        self.image = Assets.load_image(self.image_file, Fighter.SIZE)  # Scaled image, shared by all engines
+        self.rotation_cache = RotationCache.get_cache(self.image_file, self.image, engine.rotation_resolution,
+                                                      engine.rotation_cache_size)
         self.rect = self.image.get_rect()
         self.mask = pygame.mask.from_surface(self.image)
         self.top_speed = top_speed  # Maximum speed of the fighter plane
@@ -25,18 +29,20 @@ class Fighter(pygame.sprite.Sprite):
         self.curr_ammo = curr_ammo  # Current ammo available
         self.ammo_regen_time = ammo_regen_time  # Time in seconds to regenerate one ammo
         self.ammo_fire_delay = ammo_fire_delay  # Delay in seconds between firing two ammo
-        self.prev_ammo_fire_ts = 0  # The timestamp of when ammo was last fired
-        self.prev_ammo_regen_ts = time.time()  # The timestamp of when ammo was last regenerated
+        self.prev_ammo_fire_ts = -ammo_fire_delay  # The game time of when ammo was last fired, so it can fire right away
+        self.prev_ammo_regen_ts = engine.get_game_time()  # The game time of when ammo was last regenerated
         self.x = x  # Current x-coordinate on screen
         self.y = y  # Current y-coordinate on screen
         self.turning = turning  # 0: not turning, 1: clockwise, -1: counterclockwise
         self.heading = heading  # Current heading (angle in degrees with the y-axis)
 
         # Get screen dimensions
-        self.screen_width = self.engine.screen.get_width()
-        self.screen_height = self.engine.screen.get_height()
+        self.screen_width = self.engine.screen_width
+        self.screen_height = self.engine.screen_height
 
         self.killed = False
+        self.image_rotated = self.image
+        self.update_image()
 
     def update(self):
         # Calculate movement based on heading and speed
@@ -58,12 +64,15 @@ class Fighter(pygame.sprite.Sprite):
         Utils.wrap_around(self, self.screen_width, self.screen_height)
 
         # Update ammo regen
+        now = self.engine.get_game_time()
         if self.curr_ammo < self.max_ammo:
-            if time.time() - self.prev_ammo_regen_ts > self.ammo_regen_time:
+            if now - self.prev_ammo_regen_ts > self.ammo_regen_time:
                 self.curr_ammo += 1
-                self.prev_ammo_regen_ts = time.time()
+                self.prev_ammo_regen_ts = now
         else:
-            self.prev_ammo_regen_ts = time.time()
+            self.prev_ammo_regen_ts = now
+
+        self.update_image()
 
     def wrap_around(self,):
         # Wrap fighter around the screen edges
@@ -77,7 +86,7 @@ class Fighter(pygame.sprite.Sprite):
         elif self.y > self.screen_height:
             self.y = 0
 
-    def create_wrapped_mask(self, image_rotated):
+    def create_wrapped_mask(self, mask):
         # Assuming at least one of self.rect.left|right|top|bottom is out of range.
         left1 = self.rect.left
         right1 = self.rect.right
@@ -100,40 +109,41 @@ class Fighter(pygame.sprite.Sprite):
         elif self.rect.bottom > self.screen_height:
             top1 -= self.screen_height
             bottom1 -= self.screen_height
-        mask = pygame.mask.from_surface(image_rotated)
         merged_mask = pygame.Mask((right2 - left1, bottom2 - top1))
         merged_mask.draw(mask, (0, 0))
         merged_mask.draw(mask, (left2 - left1, top2 - top1))
         return merged_mask
 
+    def update_image(self):
+        # Look up the image rotated to the current heading, and refresh the rect and mask used for collision detection.
+        # This does not depend on drawing, so collisions work the same way in headless mode.
+        self.image_rotated, self.mask = self.rotation_cache.get(self.heading)
+        self.rect = self.image_rotated.get_rect(center=(self.x, self.y))
+
+        # The geometry collision backend handles wrap-around analytically, without a merged mask
+        if self.engine.collision == "mask" and (self.rect.left < 0 or self.rect.right > self.screen_width or
+                                                self.rect.top < 0 or self.rect.bottom > self.screen_height):
+            self.mask = self.create_wrapped_mask(self.mask)
+
     def draw(self):
+        # Return the rects drawn, including the copies on the opposite edges
         if self.killed:
-            return
+            return []
 
         # Display Fighter
-        image_rotated = pygame.transform.rotate(self.image, -self.heading)
-        self.mask = pygame.mask.from_surface(image_rotated)
-        self.rect = image_rotated.get_rect(center=(self.x, self.y))
-        self.engine.screen.blit(image_rotated, self.rect)
+        rects = [self.engine.screen.blit(self.image_rotated, self.rect)]
 
         # Check for JetFighter cutoff and draw on the opposite side
-        wrapped = False
         if self.rect.left < 0:  # Left cutoff
-            self.engine.screen.blit(image_rotated, self.rect.move(self.screen_width, 0))
-            wrapped = True
+            rects.append(self.engine.screen.blit(self.image_rotated, self.rect.move(self.screen_width, 0)))
         elif self.rect.right > self.screen_width:  # Right cutoff
-            self.engine.screen.blit(image_rotated, self.rect.move(-self.screen_width, 0))
-            wrapped = True
+            rects.append(self.engine.screen.blit(self.image_rotated, self.rect.move(-self.screen_width, 0)))
 
         if self.rect.top < 0:  # Top cutoff
-            self.engine.screen.blit(image_rotated, self.rect.move(0, self.screen_height))
-            wrapped = True
+            rects.append(self.engine.screen.blit(self.image_rotated, self.rect.move(0, self.screen_height)))
         elif self.rect.bottom > self.screen_height:  # Bottom cutoff
-            self.engine.screen.blit(image_rotated, self.rect.move(0, -self.screen_height))
-            wrapped = True
-
-        if wrapped:
-            self.mask = self.create_wrapped_mask(image_rotated)
+            rects.append(self.engine.screen.blit(self.image_rotated, self.rect.move(0, -self.screen_height)))
+        return rects
 
     def kill(self):
         self.killed = True
@@ -147,41 +157,43 @@ class Fighter(pygame.sprite.Sprite):
         return tip_x, tip_y
 
 class JetFighter(Fighter):
+    SPECS = {
+        "image_file": "images/jetfighter.png",
+        "top_speed": 200.0,
+        "min_speed": 60.0,
+        "curr_speed": 120.0,
+        "acceleration": 5,
+        "turn_speed": 45.0,
+        "max_ammo": 5,
+        "curr_ammo": 5,
+        "ammo_regen_time": 3,
+        "ammo_fire_delay": 1.0,
+        "x": 100.0,
+        "y": 100.0,
+        "turning": 0,
+        "heading": 90.0,
+    }
+
     def __init__(self, engine):
-        super().__init__(
-            engine,
-            image_file="images/jetfighter.png",
-            top_speed=200.0,
-            min_speed=60.0,
-            curr_speed=120.0,
-            acceleration=5,
-            turn_speed=45.0,
-            max_ammo=5,
-            curr_ammo=5,
-            ammo_regen_time=3,
-            ammo_fire_delay=1.0,
-            x=100.0,
-            y=100.0,
-            turning=0,
-            heading=90.0
-        )
+        super().__init__(engine, **JetFighter.SPECS)
 
 class PropFighter(Fighter):
+    SPECS = {
+        "image_file": "images/propfighter.png",
+        "top_speed": 150.0,
+        "min_speed": 50.0,
+        "curr_speed": 100.0,
+        "acceleration": 5,
+        "turn_speed": 30.0,
+        "max_ammo": 0,
+        "curr_ammo": 0,
+        "ammo_regen_time": 9999,
+        "ammo_fire_delay": 1.0,
+        "x": 1500.0,
+        "y": 1100.0,
+        "turning": 0,
+        "heading": 270.0,
+    }
+
     def __init__(self, engine):
-        super().__init__(
-            engine,
-            image_file="images/propfighter.png",
-            top_speed=150.0,
-            min_speed=50.0,
-            curr_speed=100.0,
-            acceleration=5,
-            turn_speed=30.0,
-            max_ammo=0,
-            curr_ammo=0,
-            ammo_regen_time=9999,
-            ammo_fire_delay=1.0,
-            x=1500.0,
-            y=1100.0,
-            turning=0,
-            heading=270.0
-        )
+        super().__init__(engine, **PropFighter.SPECS)
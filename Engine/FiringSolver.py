@@ -0,0 +1,155 @@
+"""
+Lead-pursuit firing solutions for strategies. For firing now and at each of the next few ticks, solve() predicts the
+bullet's flight from the jetfighter's tip and the propfighter's motion, and returns the chance of a hit and the ticks
+until impact:
+
+    from Engine.FiringSolver import solve
+
+    solution = solve(snapshot, delays=20)
+    if solution.probability[0] > 0.5:
+        return Strategy.FIRE_AMMO
+
+The bullet is checked against every wrap-around image of the target, since the distance between the two is taken on
+the torus, then pixel-exactly against the target's mask like the engine does. Bullets stop at the obstacle and at
+their maximum range. The target's future is unknown, so it is modeled as a few hypotheses of it holding a turn, and the
+probability is the weighted share of them that get hit.
+Whether the jetfighter has the ammo and is past its fire delay is left to the caller.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+import Engine.Prediction as Prediction
+from Engine.BatchSimulator import BatchSimulator, RotatedShapes, create_bullet_image, load_fighter_image, round_center
+from Engine.Bullet import Bullet
+from Engine.Fighter import JetFighter, PropFighter
+from Engine.Strategy import Strategy
+
+# Arrays indexed by the delay d in ticks before firing, 0 for firing on the next tick. ticks_to_impact counts from the
+# snapshot's tick under the hypothesis that the target keeps its current turning, and is -1 for a miss.
+FiringSolution = namedtuple("FiringSolution", ["probability", "ticks_to_impact"])
+
+# Distance between the centers of a bullet and the propfighter under which their masks are compared. The rotated
+# propfighter fits in a 94 pixels square, and the bullet is 20 pixels long.
+REACH = 60.0
+# Target hypotheses: the propfighter holding a left turn, flying straight, and holding a right turn
+TURNINGS = (-1, 0, 1)
+
+
+def predict_constant_turn(x, y, heading, speed, turning, turn_speed, ticks, tick=Prediction.TICK,
+                          screen_width=Prediction.SCREEN_WIDTH, screen_height=Prediction.SCREEN_HEIGHT):
+    """
+    Positions of fighters holding their speed and turning for ticks ticks, computed for all the ticks at once.
+    Wrap-around is taken modulo the screen size, which is within a tick's travel of the engine's wrap_around().
+    :param x, y, heading, speed, turning: arrays of H fighter states
+    :return: (x, y, heading) arrays of shape (H, ticks), the states after 1 to ticks ticks
+    """
+    secs = tick / 1000.0
+    # Fighter.update() moves along the heading before turning
+    headings = (np.asarray(heading, dtype=float)[:, None] +
+                np.asarray(turning)[:, None] * (turn_speed * secs) * np.arange(ticks + 1))
+    radians = np.radians(headings[:, :-1])
+    speed = np.asarray(speed, dtype=float)[:, None]
+    xs = np.mod(np.asarray(x, dtype=float)[:, None] + np.cumsum(speed * np.sin(radians) * secs, axis=1), screen_width)
+    ys = np.mod(np.asarray(y, dtype=float)[:, None] - np.cumsum(speed * np.cos(radians) * secs, axis=1), screen_height)
+    return xs, ys, np.mod(headings[:, 1:], 360)
+
+
+def get_shapes():
+    """
+    Return the rotated masks of the bullet and the propfighter. They are built on the first call, which takes a
+    moment, so strategies call this up front rather than on their first decision.
+    """
+    bullet_shapes = RotatedShapes.get("bullet", create_bullet_image, BatchSimulator.DEFAULT_HEADING_RESOLUTION)
+    prop_shapes = RotatedShapes.get(PropFighter.SPECS["image_file"],
+                                    lambda: load_fighter_image(PropFighter.SPECS["image_file"]),
+                                    BatchSimulator.DEFAULT_HEADING_RESOLUTION)
+    return bullet_shapes, prop_shapes
+
+
+def solve(snapshot, delays=20, jet_commands=None, weights=None, tick=Prediction.TICK,
+          screen_width=Prediction.SCREEN_WIDTH, screen_height=Prediction.SCREEN_HEIGHT):
+    """
+    Firing solutions for firing on each of the next delays + 1 ticks.
+    :param snapshot: GameSnapshot to solve from
+    :param delays: number of ticks of delay to solve for, on top of firing on the next tick
+    :param jet_commands: delays commands the jetfighter follows before firing, NOOP (keep flying as it does) by default
+    :param weights: probability of each of the TURNINGS hypotheses, by default the target keeps its current turning
+                    with probability 1/2, and the other two share the rest
+    :return: FiringSolution of arrays of delays + 1 values
+    """
+    jet = snapshot.jetfighter
+    prop = snapshot.propfighter
+    obstacle = snapshot.obstacle
+    if weights is None:
+        weights = [0.5 if turning == prop.turning else 0.25 for turning in TURNINGS]
+    weights = np.asarray(weights, dtype=float)
+
+    # Where the jetfighter is when FIRE_AMMO is handled, at the start of each tick
+    jet_x, jet_y, jet_heading = np.array([jet.x]), np.array([jet.y]), np.array([jet.heading])
+    if delays > 0:
+        if jet_commands is None:
+            jet_commands = [Strategy.NOOP] * delays
+        trajectory = Prediction.predict_fighters(jet.x, jet.y, jet.heading, jet.curr_speed, jet.turning,
+                                                 jet_commands, JetFighter.SPECS, tick, screen_width, screen_height)
+        jet_x = np.concatenate([jet_x, trajectory.x[:delays]])
+        jet_y = np.concatenate([jet_y, trajectory.y[:delays]])
+        jet_heading = np.concatenate([jet_heading, trajectory.heading[:delays]])
+
+    # Bullet positions after 1 to lifetime ticks of flight, the bullet moving on the tick it is fired. It is removed on
+    # the tick its distance reaches Bullet.MAX_DISTANCE, before the hit check.
+    step = Bullet.SPEED * tick / 1000.0
+    lifetime = int(np.ceil(Bullet.MAX_DISTANCE / step)) - 1
+    start_x, start_y = Prediction.fire_position(jet_x, jet_y, jet_heading)
+    radians = np.radians(jet_heading)
+    flight = np.arange(1, lifetime + 1)
+    bullet_x = np.mod(start_x[:, None] + (step * np.sin(radians))[:, None] * flight, screen_width)
+    bullet_y = np.mod(start_y[:, None] - (step * np.cos(radians))[:, None] * flight, screen_height)
+
+    # A bullet stays stopped from the tick it hits the obstacle on
+    bullet_shapes, prop_shapes = get_shapes()
+    bullet_q = bullet_shapes.quantize(jet_heading)
+    q = np.repeat(bullet_q, lifetime)
+    bullet_left = (np.trunc(bullet_x).astype(np.int64) - (bullet_shapes.width[bullet_q] // 2)[:, None])
+    bullet_top = (np.trunc(bullet_y).astype(np.int64) - (bullet_shapes.height[bullet_q] // 2)[:, None])
+    blocked = bullet_shapes.collide_rect(q, bullet_left.reshape(-1), bullet_top.reshape(-1),
+                                         (obstacle.x, obstacle.y, obstacle.width, obstacle.height))
+    alive = ~np.logical_or.accumulate(blocked.reshape(bullet_x.shape), axis=1)
+
+    # Target states at the same ticks, under each hypothesis. Bullet d, j is in flight on tick d + j.
+    count = len(TURNINGS)
+    target_x, target_y, target_heading = predict_constant_turn(
+        np.full(count, prop.x), np.full(count, prop.y), np.full(count, prop.heading), np.full(count, prop.curr_speed),
+        np.array(TURNINGS), PropFighter.SPECS["turn_speed"], delays + lifetime, tick, screen_width, screen_height)
+    index = np.arange(delays + 1)[:, None] + flight - 1
+    # Signed shortest offsets over the wrap-around images
+    dx = np.mod(target_x[:, index] - bullet_x + screen_width / 2, screen_width) - screen_width / 2
+    dy = np.mod(target_y[:, index] - bullet_y + screen_height / 2, screen_height) - screen_height / 2
+    near = (dx * dx + dy * dy < REACH * REACH) & alive
+
+    # Pixel-exact check of the near ones, in order of flight time, up to the first hit of each bullet
+    impact = np.full((count, delays + 1), -1, dtype=np.int64)  # flight ticks until the first hit
+    for h, d, j in zip(*np.nonzero(near)):
+        if impact[h, d] >= 0:
+            continue
+        prop_q = int(prop_shapes.quantize(target_heading[h, index[d, j]]))
+        # The target image nearest to the bullet, placed the way Fighter.update_image() centers its rect
+        prop_x = bullet_x[d, j] + dx[h, d, j]
+        prop_y = bullet_y[d, j] + dy[h, d, j]
+        prop_left = int(round_center(prop_x)) - prop_shapes.width[prop_q] // 2
+        prop_top = int(round_center(prop_y)) - prop_shapes.height[prop_q] // 2
+        offset = (int(bullet_left[d, j] - prop_left), int(bullet_top[d, j] - prop_top))
+        if prop_shapes.masks[prop_q].overlap(bullet_shapes.masks[bullet_q[d]], offset):
+            impact[h, d] = flight[j]
+
+    hit = impact >= 0
+    probability = weights @ hit
+    current = TURNINGS.index(prop.turning) if prop.turning in TURNINGS else TURNINGS.index(0)
+    ticks_to_impact = np.where(hit[current], np.arange(delays + 1) + impact[current], -1)
+    return FiringSolution(probability, ticks_to_impact)
+
+
+def best_delay(solution, threshold=0.5):
+    """Return the smallest delay whose hit probability reaches threshold, or None."""
+    candidates = np.flatnonzero(solution.probability >= threshold)
+    return int(candidates[0]) if len(candidates) else None
@@ -0,0 +1,207 @@
+"""
+Geometric collision backend. Hitboxes are polygons derived once from the fighter masks, and rotated analytically to the
+fighter heading, so no mask has to be rasterized per tick. Wrap-around is handled by testing the copies of a hitbox
+shifted by the screen size, and collisions return their contact point directly.
+"""
+import math
+
+import pygame
+
+from Engine.Bullet import Bullet
+from Engine.Fighter import Fighter
+
+hitbox_cache = {}  # map from image file to (polygons of the unrotated fighter image, radius of their bounding circle)
+
+
+def simplify(points, tolerance):
+    """Douglas-Peucker simplification of an open polyline."""
+    if len(points) < 3:
+        return list(points)
+    (x1, y1), (x2, y2) = points[0], points[-1]
+    dx, dy = x2 - x1, y2 - y1
+    length = math.hypot(dx, dy)
+    max_distance, index = -1.0, 0
+    for i in range(1, len(points) - 1):
+        px, py = points[i]
+        if length > 0:
+            distance = abs(dy * (px - x1) - dx * (py - y1)) / length
+        else:
+            distance = math.hypot(px - x1, py - y1)
+        if distance > max_distance:
+            max_distance, index = distance, i
+    if max_distance <= tolerance:
+        return [points[0], points[-1]]
+    return simplify(points[:index + 1], tolerance)[:-1] + simplify(points[index:], tolerance)
+
+
+def mask_polygons(mask, tolerance=1.0):
+    """
+    Trace the outline of every connected component of the mask into a simplified polygon.
+    Coordinates are relative to the center of the mask, in pixels.
+    """
+    width, height = mask.get_size()
+    polygons = []
+    for component in mask.connected_components():
+        outline = component.outline()
+        if len(outline) < 3:
+            # Tiny components are represented by their bounding box
+            rect = component.get_bounding_rects()[0]
+            outline = [rect.topleft, (rect.right - 1, rect.top), (rect.right - 1, rect.bottom - 1),
+                       (rect.left, rect.bottom - 1)]
+        # Split the closed outline at its farthest point from the start, and simplify both halves
+        x0, y0 = outline[0]
+        far = max(range(len(outline)), key=lambda i: (outline[i][0] - x0) ** 2 + (outline[i][1] - y0) ** 2)
+        points = simplify(outline[:far + 1], tolerance)[:-1] + simplify(outline[far:] + [outline[0]], tolerance)[:-1]
+        polygons.append([(px + 0.5 - width / 2, py + 0.5 - height / 2) for px, py in points])
+    return polygons
+
+
+def get_fighter_hitbox(fighter):
+    if fighter.image_file not in hitbox_cache:
+        polygons = mask_polygons(pygame.mask.from_surface(fighter.image))
+        radius = max(math.hypot(u, v) for polygon in polygons for u, v in polygon)
+        hitbox_cache[fighter.image_file] = (polygons, radius)
+    return hitbox_cache[fighter.image_file]
+
+
+def rotate_polygons(polygons, x, y, heading):
+    # Rotate clockwise by heading degrees (screen y points down), then translate to (x, y)
+    radians = math.radians(heading)
+    cos, sin = math.cos(radians), math.sin(radians)
+    return [[(x + u * cos - v * sin, y + u * sin + v * cos) for u, v in polygon] for polygon in polygons]
+
+
+def get_polygons(sprite):
+    """Return the hitbox of a sprite as a list of polygons in screen coordinates."""
+    if isinstance(sprite, Fighter):
+        return rotate_polygons(get_fighter_hitbox(sprite)[0], sprite.x, sprite.y, sprite.heading)
+    if isinstance(sprite, Bullet):
+        half_width, half_height = Bullet.SIZE[0] / 2, Bullet.SIZE[1] / 2
+        corners = [(-half_width, -half_height), (half_width, -half_height), (half_width, half_height),
+                   (-half_width, half_height)]
+        return rotate_polygons([corners], sprite.x, sprite.y, sprite.heading)
+    # Anything else, like the Obstacle, is a solid rectangle
+    rect = sprite.rect
+    return [[rect.topleft, rect.topright, rect.bottomright, rect.bottomleft]]
+
+
+def get_bounds(sprite):
+    """Return a bounding box (left, top, right, bottom) of the hitbox of a sprite, without building the polygons."""
+    if isinstance(sprite, Fighter):
+        radius = get_fighter_hitbox(sprite)[1]
+    elif isinstance(sprite, Bullet):
+        radius = math.hypot(Bullet.SIZE[0], Bullet.SIZE[1]) / 2
+    else:
+        return sprite.rect.left, sprite.rect.top, sprite.rect.right, sprite.rect.bottom
+    return sprite.x - radius, sprite.y - radius, sprite.x + radius, sprite.y + radius
+
+
+def bounds_overlap(bounds1, bounds2, screen_width, screen_height):
+    """Return the screen shifts of the second box that make it overlap the first one on the wrapped-around screen."""
+    left1, top1, right1, bottom1 = bounds1
+    left2, top2, right2, bottom2 = bounds2
+    shifts = []
+    for shift_x in (0, -screen_width, screen_width):
+        if left2 + shift_x > right1 or right2 + shift_x < left1:
+            continue
+        for shift_y in (0, -screen_height, screen_height):
+            if top2 + shift_y > bottom1 or bottom2 + shift_y < top1:
+                continue
+            shifts.append((shift_x, shift_y))
+    return shifts
+
+
+def bounding_box(polygons):
+    xs = [px for polygon in polygons for px, py in polygon]
+    ys = [py for polygon in polygons for px, py in polygon]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def segment_intersection(p1, p2, q1, q2):
+    """Return the intersection point of segments p1-p2 and q1-q2, or None."""
+    rx, ry = p2[0] - p1[0], p2[1] - p1[1]
+    sx, sy = q2[0] - q1[0], q2[1] - q1[1]
+    denominator = rx * sy - ry * sx
+    if denominator == 0:
+        return None
+    qpx, qpy = q1[0] - p1[0], q1[1] - p1[1]
+    t = (qpx * sy - qpy * sx) / denominator
+    u = (qpx * ry - qpy * rx) / denominator
+    if 0 <= t <= 1 and 0 <= u <= 1:
+        return p1[0] + t * rx, p1[1] + t * ry
+    return None
+
+
+def point_in_polygon(point, polygon):
+    # Even-odd ray casting
+    x, y = point
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        xi, yi = polygon[i]
+        xj, yj = polygon[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def polygons_contact(polygons1, polygons2):
+    """Return the contact point of two sets of polygons, or None if they do not overlap."""
+    points = []
+    for polygon1 in polygons1:
+        for polygon2 in polygons2:
+            for i in range(len(polygon1)):
+                p1, p2 = polygon1[i - 1], polygon1[i]
+                for j in range(len(polygon2)):
+                    point = segment_intersection(p1, p2, polygon2[j - 1], polygon2[j])
+                    if point is not None:
+                        points.append(point)
+    if points:
+        # The contact point is the crossing nearest to the middle of all of them. The middle itself can lie outside
+        # both hitboxes, such as between the wings of a fighter.
+        mean_x = sum(px for px, py in points) / len(points)
+        mean_y = sum(py for px, py in points) / len(points)
+        return min(points, key=lambda point: (point[0] - mean_x) ** 2 + (point[1] - mean_y) ** 2)
+
+    # No crossing outlines, so either one hitbox contains the other or they do not touch at all
+    for polygon1 in polygons1:
+        for polygon2 in polygons2:
+            if point_in_polygon(polygon1[0], polygon2):
+                return polygon1[0]
+            if point_in_polygon(polygon2[0], polygon1):
+                return polygon2[0]
+    return None
+
+
+def collide(sprite1, sprite2, screen_width, screen_height):
+    """
+    Check whether two sprites overlap anywhere on the wrapped-around screen.
+    :return: the contact point in screen coordinates, or None
+    """
+    # Cheap test on the bounding circles first, as most pairs are far apart
+    if not bounds_overlap(get_bounds(sprite1), get_bounds(sprite2), screen_width, screen_height):
+        return None
+
+    polygons1 = get_polygons(sprite1)
+    polygons2 = get_polygons(sprite2)
+    for shift_x, shift_y in bounds_overlap(bounding_box(polygons1), bounding_box(polygons2), screen_width,
+                                           screen_height):
+        shifted = polygons2
+        if shift_x or shift_y:
+            shifted = [[(px + shift_x, py + shift_y) for px, py in polygon] for polygon in polygons2]
+        contact = polygons_contact(polygons1, shifted)
+        if contact is not None:
+            return contact[0] % screen_width, contact[1] % screen_height
+    return None
+
+
+def collide_with_group(sprite, group, screen_width, screen_height):
+    """Return (first sprite of the group overlapping sprite, contact point), or (None, None)."""
+    for other in group:
+        if other is sprite:
+            continue
+        contact = collide(sprite, other, screen_width, screen_height)
+        if contact is not None:
+            return other, contact
+    return None, None
@@ -1,5 +1,7 @@
 import pygame
 
+import Engine.Assets as Assets
+
 class Obstacle(pygame.sprite.Sprite):
     def __init__(self, engine, width, height):
         super().__init__()  # Initialize the parent Sprite class
@@ -10,6 +12,7 @@ class Obstacle(pygame.sprite.Sprite):
         # Create a surface for the obstacle
         self.image = pygame.Surface((self.width, self.height))
         self.image.fill((50, 50, 50))  # Dark gray color
+        self.image = Assets.convert(self.image, alpha=False)
         self.mask = pygame.mask.from_surface(self.image)
 
         # Get the rectangle for positioning
@@ -21,4 +24,4 @@ class Obstacle(pygame.sprite.Sprite):
 
     def draw(self):
         # Draw the obstacle on the screen
-        self.engine.screen.blit(self.image, self.rect)
\ No newline at end of file
+        return self.engine.screen.blit(self.image, self.rect)
\ No newline at end of file
@@ -0,0 +1,254 @@
+"""
+Controllers for the propfighter, so matches can be played without a human at the arrow keys. A controller is a
+PropStrategy, with the same decide() and decision() entry points as the jetfighter's Strategy, and is set with
+Engine.set_opponent_obj(). It is called on every tick, before the battlefield is updated, from the main loop in the
+interactive game and from run_headless() in headless matches. FIRE_AMMO does nothing for the propfighter.
+
+The built-in bots read the snapshot directly, and the dodging one predicts the threats for its three possible turns
+in a few NumPy operations, so they cost a small fraction of a headless tick.
+"""
+import math
+import random
+
+import numpy as np
+
+import Engine.FiringSolver as FiringSolver
+import Engine.Prediction as Prediction
+from Engine.Strategy import Strategy
+
+
+class PropStrategy(Strategy):
+    """
+    Base class of the propfighter controllers. decision() gets the same arguments as Strategy.decision(), and returns
+    one of the Strategy commands for the propfighter. By default it does nothing, so the propfighter flies straight.
+    """
+    OBSTACLE_MARGIN = 60.0  # pixels kept between the propfighter's center and the obstacle
+    LOOKAHEAD_TICKS = 80  # ticks of the course checked for the obstacle, long enough to turn away at top speed
+    TURN_COMMANDS = {-1: Strategy.TURN_LEFT, 0: Strategy.GO_STRAIGHT, 1: Strategy.TURN_RIGHT}
+
+    def steer_towards(self, fighter, bearing, tolerance=3.0):
+        """Return the command turning the fighter towards a bearing in degrees, or flying straight when it is within
+        tolerance degrees of it."""
+        error = (bearing - fighter.heading + 180.0) % 360.0 - 180.0
+        if error > tolerance:
+            cmd = Strategy.TURN_RIGHT
+        elif error < -tolerance:
+            cmd = Strategy.TURN_LEFT
+        else:
+            cmd = Strategy.GO_STRAIGHT
+        return cmd
+
+    def avoid_obstacle(self, fighter, obstacle):
+        """Return the turn that stays clear of the obstacle the longest if the fighter's course runs into it, or None."""
+        clear_ticks = {turning: self.ticks_clear(fighter, obstacle, turning) for turning in self.TURN_COMMANDS}
+        if clear_ticks.get(fighter.turning, 0) > self.LOOKAHEAD_TICKS:
+            return None
+        return self.TURN_COMMANDS[max(clear_ticks, key=clear_ticks.get)]
+
+    def ticks_clear(self, fighter, obstacle, turning, step=2):
+        """Ticks the fighter flies holding a turning before it comes within OBSTACLE_MARGIN of the obstacle, or
+        LOOKAHEAD_TICKS + 1 if it stays clear."""
+        left = obstacle.x - self.OBSTACLE_MARGIN
+        right = obstacle.x + obstacle.width + self.OBSTACLE_MARGIN
+        top = obstacle.y - self.OBSTACLE_MARGIN
+        bottom = obstacle.y + obstacle.height + self.OBSTACLE_MARGIN
+        secs = Prediction.TICK / 1000.0 * step
+        distance = fighter.curr_speed * secs
+        turn = turning * fighter.turn_speed * secs
+        x, y, heading = fighter.x, fighter.y, fighter.heading
+        for ticks in range(step, self.LOOKAHEAD_TICKS + 1, step):
+            radians = math.radians(heading)
+            x += distance * math.sin(radians)
+            y -= distance * math.cos(radians)
+            heading += turn
+            if left < x < right and top < y < bottom:
+                return ticks
+        return self.LOOKAHEAD_TICKS + 1
+
+    @staticmethod
+    def distance(fighter, other):
+        """Distance between the fighter and another object with x and y, the shortest way around the wrapped screen."""
+        dx = abs(other.x - fighter.x) % Prediction.SCREEN_WIDTH
+        dy = abs(other.y - fighter.y) % Prediction.SCREEN_HEIGHT
+        return math.hypot(min(dx, Prediction.SCREEN_WIDTH - dx), min(dy, Prediction.SCREEN_HEIGHT - dy))
+
+    @staticmethod
+    def bearing(fighter, x, y):
+        """Bearing in degrees from the fighter to a point, clockwise from the y-axis like the headings, taking the
+        shortest way around the wrapped screen."""
+        dx = (x - fighter.x + Prediction.SCREEN_WIDTH / 2) % Prediction.SCREEN_WIDTH - Prediction.SCREEN_WIDTH / 2
+        dy = (y - fighter.y + Prediction.SCREEN_HEIGHT / 2) % Prediction.SCREEN_HEIGHT - Prediction.SCREEN_HEIGHT / 2
+        return math.degrees(math.atan2(dx, -dy)) % 360.0
+
+
+class RandomWalk(PropStrategy):
+    """Holds a random maneuver for a random number of ticks, and turns away from the obstacle."""
+    MANEUVERS = (Strategy.TURN_LEFT, Strategy.TURN_RIGHT, Strategy.GO_STRAIGHT, Strategy.GO_STRAIGHT,
+                 Strategy.ACCELERATE, Strategy.DECELERATE)
+
+    def __init__(self, min_ticks=20, max_ticks=80, seed=None):
+        """
+        :param min_ticks, max_ticks: range of the number of ticks a maneuver is held for
+        :param seed: seed of the bot's own random generator, drawn from the random module by default, so matches
+                     seeded by the tournament are reproducible
+        """
+        super().__init__()
+        self.min_ticks = min_ticks
+        self.max_ticks = max_ticks
+        self.rng = random.Random(seed if seed is not None else random.getrandbits(64))
+        self.maneuver = Strategy.GO_STRAIGHT
+        self.remaining_ticks = 0
+
+    def decide(self, snapshot):
+        prop = snapshot.propfighter
+        cmd = self.avoid_obstacle(prop, snapshot.obstacle)
+        if cmd is not None:
+            self.remaining_ticks = 0  # pick a new maneuver once clear
+            return cmd
+
+        if self.remaining_ticks <= 0:
+            self.maneuver = self.rng.choice(self.MANEUVERS)
+            self.remaining_ticks = self.rng.randint(self.min_ticks, self.max_ticks)
+        self.remaining_ticks -= 1
+        # Turning commands hold by themselves, speed changes are repeated while the maneuver lasts
+        return self.maneuver
+
+
+class ObstacleHugger(PropStrategy):
+    """
+    Circles the obstacle at a fixed distance from its edges, keeping it between the propfighter and the jetfighter as
+    much as possible and making the jetfighter fly close to it to get a shot.
+    """
+
+    def __init__(self, distance=110.0, clockwise=True):
+        """
+        :param distance: pixels between the propfighter's center and the obstacle's edges
+        :param clockwise: direction of the orbit
+        """
+        super().__init__()
+        self.distance = distance
+        self.clockwise = clockwise
+
+    def decide(self, snapshot):
+        prop = snapshot.propfighter
+        obstacle = snapshot.obstacle
+        # Offset from the nearest point of the obstacle, and the distance to it
+        nearest_x = min(max(prop.x, obstacle.x), obstacle.x + obstacle.width)
+        nearest_y = min(max(prop.y, obstacle.y), obstacle.y + obstacle.height)
+        dx, dy = prop.x - nearest_x, prop.y - nearest_y
+        distance = math.hypot(dx, dy)
+        if distance == 0:
+            return self.avoid_obstacle(prop, obstacle) or Strategy.GO_STRAIGHT
+        away = math.degrees(math.atan2(dx, -dy))  # bearing pointing away from the obstacle
+
+        # Fly along the edge, turning in when too far and out when too close
+        correction = max(-60.0, min(60.0, (distance - self.distance) * 0.6))
+        tangent = away + 90.0 if self.clockwise else away - 90.0
+        bearing = tangent + correction if self.clockwise else tangent - correction
+
+        cmd = self.avoid_obstacle(prop, obstacle) if distance < self.distance * 0.6 else None
+        if cmd is None:
+            cmd = self.steer_towards(prop, bearing % 360.0)
+        if cmd == Strategy.GO_STRAIGHT and prop.turning == 0 and prop.curr_speed < prop.top_speed:
+            cmd = Strategy.ACCELERATE  # speed up on the straights
+        return cmd
+
+
+class PredictiveDodge(PropStrategy):
+    """
+    Predicts the bullets in flight along their headings, and the jetfighter holding its turn, and picks the turn that
+    keeps the propfighter farthest from them over the next ticks. With nothing close, it stays out of the jetfighter's
+    line of fire.
+    """
+    TURNINGS = (-1, 0, 1)
+    BULLET_DISTANCE = 90.0  # closest approach of a bullet above which it is ignored
+    COLLISION_DISTANCE = 150.0  # same for the jetfighter, whose image is much larger than a bullet
+    LINE_OF_FIRE = 20.0  # degrees between the jetfighter's heading and the propfighter under which it dodges
+
+    def __init__(self, horizon=40):
+        """:param horizon: ticks the bullets and the fighters are predicted ahead"""
+        super().__init__()
+        self.horizon = horizon
+
+    def decide(self, snapshot):
+        prop = snapshot.propfighter
+        jet = snapshot.jetfighter
+        cmd = self.avoid_obstacle(prop, snapshot.obstacle)
+        if cmd is None:
+            cmd = self.dodge(snapshot)
+        if cmd is not None:
+            return cmd
+
+        # Out of the line of fire: turn across the jetfighter's heading when it points at the propfighter
+        bearing = self.bearing(jet, prop.x, prop.y)
+        error = (bearing - jet.heading + 180.0) % 360.0 - 180.0
+        if abs(error) < self.LINE_OF_FIRE:
+            return self.steer_towards(prop, (jet.heading + (90.0 if error >= 0 else -90.0)) % 360.0)
+        if prop.turning == 0 and prop.curr_speed < prop.top_speed:
+            return Strategy.ACCELERATE
+        return Strategy.GO_STRAIGHT
+
+    def dodge(self, snapshot):
+        """Return the turn keeping the propfighter farthest from the threats, or None if none of them comes close."""
+        prop = snapshot.propfighter
+        jet = snapshot.jetfighter
+        obstacle = snapshot.obstacle
+        # Only the threats that can get within their safe distance over the horizon are predicted
+        secs = self.horizon * Prediction.TICK / 1000.0
+        near_jet = self.distance(prop, jet) < (jet.curr_speed + prop.curr_speed) * secs + self.COLLISION_DISTANCE
+        bullets = [bullet for bullet in snapshot.bullets
+                   if self.distance(prop, bullet) < (bullet.speed + prop.curr_speed) * secs + self.BULLET_DISTANCE]
+        if not near_jet and not bullets:
+            return None
+
+        count = len(self.TURNINGS)
+        prop_x, prop_y, _ = FiringSolver.predict_constant_turn(
+            np.full(count, prop.x), np.full(count, prop.y), np.full(count, prop.heading),
+            np.full(count, prop.curr_speed), np.array(self.TURNINGS), prop.turn_speed, self.horizon)
+
+        # Threats as (x, y) arrays of shape (M, horizon), with the distance each has to be kept at
+        threat_x, threat_y, alive, safe_distance = [], [], [], []
+        if near_jet:
+            jet_x, jet_y, _ = FiringSolver.predict_constant_turn(
+                np.array([jet.x]), np.array([jet.y]), np.array([jet.heading]), np.array([jet.curr_speed]),
+                np.array([jet.turning]), jet.turn_speed, self.horizon)
+            threat_x.append(jet_x)
+            threat_y.append(jet_y)
+            alive.append(np.ones(jet_x.shape, dtype=bool))
+            safe_distance.append([self.COLLISION_DISTANCE])
+        if bullets:
+            bullets = np.array([(bullet.x, bullet.y, bullet.heading, bullet.speed,
+                                 bullet.max_distance - bullet.distance_traveled) for bullet in bullets])
+            step = bullets[:, 3] * Prediction.TICK / 1000.0
+            ticks = np.arange(1, self.horizon + 1)
+            radians = np.radians(bullets[:, 2])
+            threat_x.append(bullets[:, 0, None] + (step * np.sin(radians))[:, None] * ticks)
+            threat_y.append(bullets[:, 1, None] - (step * np.cos(radians))[:, None] * ticks)
+            alive.append(step[:, None] * ticks < bullets[:, 4, None])
+            safe_distance.append(np.full(len(bullets), self.BULLET_DISTANCE))
+        threat_x, threat_y = np.concatenate(threat_x), np.concatenate(threat_y)
+        alive, safe_distance = np.concatenate(alive), np.concatenate(safe_distance)
+
+        # Closest approach relative to the safe distance, over the wrap-around images, for every turning and threat
+        width, height = Prediction.SCREEN_WIDTH, Prediction.SCREEN_HEIGHT
+        dx = np.mod(prop_x[:, None, :] - threat_x + width / 2, width) - width / 2
+        dy = np.mod(prop_y[:, None, :] - threat_y + height / 2, height) - height / 2
+        distance = np.where(alive, np.hypot(dx, dy), np.inf).min(axis=2)
+        margin = (distance / safe_distance).min(axis=1)
+
+        current = self.TURNINGS.index(prop.turning) if prop.turning in self.TURNINGS else 1
+        if margin[current] >= 1.0:
+            return None
+        # A turn that flies into the obstacle is no escape
+        clear = [self.ticks_clear(prop, obstacle, turning) > self.horizon for turning in self.TURNINGS]
+        margin = np.where(clear, margin, -1.0)
+        return self.TURN_COMMANDS[self.TURNINGS[int(np.argmax(margin))]]
+
+
+# Built-in controllers by name, for tournament.py --opponent
+OPPONENTS = {
+    "straight": PropStrategy,
+    "random-walk": RandomWalk,
+    "obstacle-hugger": ObstacleHugger,
+    "dodge": PredictiveDodge,
+}
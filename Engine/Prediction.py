@@ -0,0 +1,134 @@
+"""
+Trajectory prediction for strategies. The functions advance one or many hypothetical fighter and bullet states K ticks
+ahead at once with NumPy, with the same arithmetic as Fighter.update(), Bullet.update() and Engine.handle_player_cmd(),
+so a prediction from a snapshot matches what the engine does to the last bit.
+
+    from Engine.Prediction import predict_jetfighter, predict_snapshot_bullets
+
+    # 3 candidate maneuvers over the next 40 ticks: keep turning left, keep turning right, go straight
+    commands = np.repeat([[Strategy.TURN_LEFT], [Strategy.TURN_RIGHT], [Strategy.GO_STRAIGHT]], 40, axis=1)
+    jet = predict_jetfighter(snapshot, commands)  # jet.x[i, k] is x of maneuver i after k + 1 ticks
+    bullets = predict_snapshot_bullets(snapshot, 40)
+
+Index k of a trajectory is the state after k + 1 ticks, i.e. at tick snapshot.tick + k + 1, with commands[..., k]
+applied at the start of that tick. Firing is not simulated: the ammo and the fire delay are left to the caller, and
+fire_position() gives where a new bullet starts.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from Engine.BatchSimulator import (BatchSimulator, RotatedShapes, advance_bullets, advance_fighters, apply_commands,
+                                   create_bullet_image)
+from Engine.Bullet import Bullet
+from Engine.Fighter import Fighter, JetFighter, PropFighter
+
+# Arrays of shape (N, K), or (K,) when a single state is predicted
+FighterTrajectory = namedtuple("FighterTrajectory", ["x", "y", "heading", "speed", "turning"])
+# Arrays of shape (M, K). alive is False from the tick a bullet expires or hits the obstacle on.
+BulletTrajectory = namedtuple("BulletTrajectory", ["x", "y", "distance_traveled", "alive"])
+
+TICK = 25  # msecs per tick of the engine
+SCREEN_WIDTH = 1600
+SCREEN_HEIGHT = 1200
+
+
+def predict_fighters(x, y, heading, speed, turning, commands, specs, tick=TICK, screen_width=SCREEN_WIDTH,
+                     screen_height=SCREEN_HEIGHT):
+    """
+    Advance fighter states under sequences of commands.
+    :param x, y, heading, speed, turning: the starting states, as scalars or arrays of N states
+    :param commands: K Strategy commands applied to every state, or an (N, K) array of one sequence per state
+    :param specs: JetFighter.SPECS or PropFighter.SPECS, for the acceleration, speed limits and turn speed
+    :return: FighterTrajectory of (N, K) arrays, or of (K,) arrays for a single state and command sequence
+    """
+    commands = np.asarray(commands)
+    single = commands.ndim == 1 and all(np.ndim(value) == 0 for value in (x, y, heading, speed, turning))
+    commands = np.atleast_2d(commands)
+    n = np.broadcast_shapes(np.shape(x), np.shape(y), np.shape(heading), np.shape(speed), np.shape(turning),
+                            commands.shape[:1])
+    n = n[0] if n else 1
+    commands = np.broadcast_to(commands, (n, commands.shape[1]))
+    x, y, heading, speed = (np.broadcast_to(np.asarray(value, dtype=float), (n,)) for value in (x, y, heading, speed))
+    turning = np.broadcast_to(np.asarray(turning), (n,))
+
+    ticks = commands.shape[1]
+    trajectory = FighterTrajectory(np.empty((n, ticks)), np.empty((n, ticks)), np.empty((n, ticks)),
+                                   np.empty((n, ticks)), np.empty((n, ticks), dtype=np.int8))
+    for k in range(ticks):
+        turning, speed = apply_commands(commands[:, k], turning, speed, specs)
+        x, y, heading = advance_fighters(x, y, heading, speed, turning, specs["turn_speed"], tick, screen_width,
+                                         screen_height)
+        trajectory.x[:, k] = x
+        trajectory.y[:, k] = y
+        trajectory.heading[:, k] = heading
+        trajectory.speed[:, k] = speed
+        trajectory.turning[:, k] = turning
+    if single:
+        return FighterTrajectory(*(values[0] for values in trajectory))
+    return trajectory
+
+
+def predict_bullets(x, y, heading, distance_traveled, ticks, speed=Bullet.SPEED, max_distance=Bullet.MAX_DISTANCE,
+                    obstacle_rect=None, tick=TICK, screen_width=SCREEN_WIDTH, screen_height=SCREEN_HEIGHT,
+                    heading_resolution=BatchSimulator.DEFAULT_HEADING_RESOLUTION):
+    """
+    Advance M bullets ticks ahead.
+    :param x, y, heading, distance_traveled: arrays of M bullets
+    :param obstacle_rect: (x, y, width, height) of the obstacle, to stop the bullets that hit it. The bullet masks are
+                          taken at headings quantized to heading_resolution degrees, which is exact for bullets fired
+                          by the stock jetfighter.
+    :return: BulletTrajectory of (M, ticks) arrays
+    """
+    x, y, heading, distance_traveled = (np.asarray(value, dtype=float).reshape(-1)
+                                        for value in (x, y, heading, distance_traveled))
+    count = len(x)
+    trajectory = BulletTrajectory(np.empty((count, ticks)), np.empty((count, ticks)), np.empty((count, ticks)),
+                                  np.empty((count, ticks), dtype=bool))
+    alive = np.ones(count, dtype=bool)
+    if obstacle_rect is not None:
+        shapes = RotatedShapes.get("bullet", create_bullet_image, heading_resolution)
+        q = shapes.quantize(heading)
+    for k in range(ticks):
+        x, y, distance_traveled = advance_bullets(x, y, heading, distance_traveled, speed, tick, screen_width,
+                                                  screen_height)
+        if obstacle_rect is not None:
+            # Bullet.update() centers the rect on the truncated position
+            left = np.trunc(x).astype(np.int64) - shapes.width[q] // 2
+            top = np.trunc(y).astype(np.int64) - shapes.height[q] // 2
+            alive &= ~shapes.collide_rect(q, left, top, obstacle_rect)
+        alive &= distance_traveled < max_distance
+        trajectory.x[:, k] = x
+        trajectory.y[:, k] = y
+        trajectory.distance_traveled[:, k] = distance_traveled
+        trajectory.alive[:, k] = alive
+    return trajectory
+
+
+def fire_position(x, y, heading):
+    """Vectorized Fighter.get_tip_coord(): where a bullet fired by a fighter at (x, y, heading) starts."""
+    radians = np.radians(heading)
+    return x + (Fighter.SIZE[1] / 2 + 10.0) * np.sin(radians), y - (Fighter.SIZE[1] / 2 + 10.0) * np.cos(radians)
+
+
+def predict_jetfighter(snapshot, commands, **kwargs):
+    """predict_fighters() from the jetfighter of a GameSnapshot."""
+    jet = snapshot.jetfighter
+    return predict_fighters(jet.x, jet.y, jet.heading, jet.curr_speed, jet.turning, commands, JetFighter.SPECS,
+                            **kwargs)
+
+
+def predict_propfighter(snapshot, commands, **kwargs):
+    """predict_fighters() from the propfighter of a GameSnapshot."""
+    prop = snapshot.propfighter
+    return predict_fighters(prop.x, prop.y, prop.heading, prop.curr_speed, prop.turning, commands, PropFighter.SPECS,
+                            **kwargs)
+
+
+def predict_snapshot_bullets(snapshot, ticks, **kwargs):
+    """predict_bullets() for the bullets in flight in a GameSnapshot, stopped by its obstacle."""
+    bullets = snapshot.bullets
+    obstacle = snapshot.obstacle
+    return predict_bullets([bullet.x for bullet in bullets], [bullet.y for bullet in bullets],
+                           [bullet.heading for bullet in bullets], [bullet.distance_traveled for bullet in bullets],
+                           ticks, obstacle_rect=(obstacle.x, obstacle.y, obstacle.width, obstacle.height), **kwargs)
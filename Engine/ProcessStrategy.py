@@ -0,0 +1,171 @@
+import array
+import collections
+import multiprocessing
+import time
+import traceback
+from multiprocessing import shared_memory
+
+from Engine.Snapshot import BulletState, FighterState, GameSnapshot, ObstacleState
+from Engine.Strategy import Strategy
+
+# Shared memory layout: a header of int64 slots, followed by the game state as float64 values.
+VERSION = 0  # seqlock counter of the state, odd while the engine is writing it
+COMMAND = 1  # latest command of the strategy process, packed as (tick << 8) | command
+STOP = 2  # set to 1 by the engine to stop the strategy process
+READY = 3  # set to 1 by the strategy process once the strategy is created
+HEADER_SLOTS = 4
+HEADER_SIZE = HEADER_SLOTS * 8
+
+FIGHTER_FIELDS = len(FighterState._fields)
+BULLET_FIELDS = len(BulletState._fields)
+# tick, jetfighter, propfighter, obstacle, bullet count, then the bullets
+STATE_FIELDS = 1 + 2 * FIGHTER_FIELDS + len(ObstacleState._fields) + 1
+
+POLL_INTERVAL = 0.0002  # secs between two polls of the shared memory
+
+
+def encode_state(snapshot, max_bullets):
+    bullets = snapshot.bullets[:max_bullets]
+    values = [snapshot.tick, *snapshot.jetfighter, *snapshot.propfighter, *snapshot.obstacle, len(bullets)]
+    for bullet in bullets:
+        values.extend(bullet)
+    return values
+
+
+def decode_state(values):
+    def fighter(offset):
+        state = FighterState(*values[offset:offset + FIGHTER_FIELDS])
+        return state._replace(turning=int(state.turning), curr_ammo=int(state.curr_ammo),
+                              max_ammo=int(state.max_ammo), ammo_regen_time=int(state.ammo_regen_time))
+
+    offset = 1 + 2 * FIGHTER_FIELDS
+    obstacle = ObstacleState(*(int(v) for v in values[offset:offset + len(ObstacleState._fields)]))
+    offset += len(ObstacleState._fields)
+    count = int(values[offset])
+    offset += 1
+    bullets = tuple(BulletState(*values[offset + i * BULLET_FIELDS:offset + (i + 1) * BULLET_FIELDS])
+                    for i in range(count))
+    return GameSnapshot(int(values[0]), fighter(1), fighter(1 + FIGHTER_FIELDS), obstacle, bullets)
+
+
+def run_strategy_process(shm_name, strategy_factory, max_bullets):
+    """Main function of the strategy process: decide on every new state the engine publishes."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header = shm.buf[:HEADER_SIZE].cast("q")
+    data = shm.buf[HEADER_SIZE:].cast("d")
+    strategy = strategy_factory()
+    header[READY] = 1
+    last_version = 0
+    try:
+        while header[STOP] == 0:
+            version = header[VERSION]
+            if version == last_version or version % 2 == 1:
+                time.sleep(POLL_INTERVAL)
+                continue
+            count = int(data[STATE_FIELDS - 1])
+            values = data[:STATE_FIELDS + count * BULLET_FIELDS].tolist()
+            if header[VERSION] != version:
+                # The engine wrote a newer state while it was being copied
+                continue
+            last_version = version
+            snapshot = decode_state(values)
+            try:
+                cmd = strategy.decide(snapshot)
+            except Exception:
+                print(f"Player strategy function had a brain fart: {traceback.format_exc()}")
+                cmd = Strategy.NOOP
+            if not isinstance(cmd, int) or not 0 <= cmd < 256:
+                cmd = Strategy.NOOP
+            header[COMMAND] = (snapshot.tick << 8) | cmd
+    finally:
+        del header, data
+        shm.close()
+
+
+class ProcessStrategy(Strategy):
+    """
+    Runs a strategy in a separate process, so a CPU-heavy decision function does not compete with the render loop for
+    the GIL.
+
+    Every tick, the game state is written into a shared memory block under a seqlock, and the strategy process writes
+    its command back into a single slot tagged with the tick it decided on. Neither side takes a lock. decide() waits
+    for the command of the current tick for at most deadline msecs. When the strategy misses the deadline, or has hung
+    or crashed, the tick is recorded as an overrun and NOOP is returned, so the match goes on.
+    """
+
+    def __init__(self, strategy_factory, deadline=20, max_bullets=64, startup_timeout=10.0):
+        """
+        :param strategy_factory: picklable callable creating the strategy in the child process, usually its class
+        :param deadline: msecs to wait for the command of each tick
+        :param max_bullets: maximum number of bullets passed to the strategy
+        :param startup_timeout: secs to wait for the strategy process to be ready
+        """
+        super().__init__()
+        self.deadline = deadline
+        self.max_bullets = max_bullets
+        self.decisions = 0
+        self.overruns = 0
+        self.overrun_ticks = collections.deque(maxlen=1000)  # ticks of the most recent overruns
+
+        size = HEADER_SIZE + (STATE_FIELDS + max_bullets * BULLET_FIELDS) * 8
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.header = self.shm.buf[:HEADER_SIZE].cast("q")
+        self.data = self.shm.buf[HEADER_SIZE:].cast("d")
+        for slot in range(HEADER_SLOTS):
+            self.header[slot] = 0
+        self.header[COMMAND] = -1 << 8  # no command yet
+
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(target=run_strategy_process, args=(self.shm.name, strategy_factory, max_bullets),
+                                       daemon=True)
+        self.process.start()
+        timeout = time.perf_counter() + startup_timeout
+        while self.header[READY] == 0 and self.process.is_alive() and time.perf_counter() < timeout:
+            time.sleep(0.01)
+
+    def decide(self, snapshot):
+        # Publish the state under the seqlock
+        values = encode_state(snapshot, self.max_bullets)
+        version = self.header[VERSION]
+        self.header[VERSION] = version + 1
+        self.data[:len(values)] = array.array("d", values)
+        self.header[VERSION] = version + 2
+
+        # Wait for the command of this tick until the deadline
+        deadline = time.perf_counter() + self.deadline / 1000.0
+        while True:
+            slot = self.header[COMMAND]
+            if slot >> 8 == snapshot.tick:
+                self.decisions += 1
+                return slot & 0xff
+            if time.perf_counter() >= deadline:
+                break
+            time.sleep(POLL_INTERVAL)
+
+        self.overruns += 1
+        self.overrun_ticks.append(snapshot.tick)
+        return Strategy.NOOP
+
+    def get_stats(self):
+        return {
+            "decisions": self.decisions,
+            "overruns": self.overruns,
+            "alive": self.process.is_alive(),
+        }
+
+    def close(self):
+        """Stop the strategy process and release the shared memory."""
+        if self.shm is None:
+            return
+        self.header[STOP] = 1
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            # The strategy is stuck in its decision function
+            self.process.terminate()
+            self.process.join()
+        self.header.release()
+        self.data.release()
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
@@ -0,0 +1,121 @@
+import collections
+import csv
+import json
+import time
+
+import pygame
+
+# Phases of the main loop, in the order they run. draw_battlefield includes stats_board and display_flip. The last
+# ones are the timings of the decision scheduler, see Engine.Scheduler.
+PHASES = ("check_events", "update_battlefield", "draw_battlefield", "stats_board", "check_victory", "display_flip",
+          "tick", "decision", "decision_wake", "decision_ready", "tick_period")
+COUNTERS = ("over_budget_ticks", "skipped_ticks", "missed_decisions", "late_decisions", "dropped_commands")
+
+
+class Profiler:
+    """
+    Wall-clock timings of the phases of the main loop, in msecs, with rolling percentiles over the last window samples
+    of each phase. The decision thread records its latency and the ticks it skipped from its own thread.
+    """
+
+    def __init__(self, budget=25, window=2400):
+        """
+        :param budget: msecs per tick, frames taking longer are counted as over budget
+        :param window: number of most recent samples the percentiles are computed from
+        """
+        self.budget = budget
+        self.samples = {phase: collections.deque(maxlen=window) for phase in PHASES}
+        self.counts = dict.fromkeys(PHASES, 0)
+        self.maximums = dict.fromkeys(PHASES, 0.0)
+        self.over_budget_ticks = 0  # main loop iterations longer than the budget
+        self.skipped_ticks = 0  # ticks the decision thread missed because the decision function was too slow
+        self.missed_decisions = 0  # ticks updated without a command, as it was not ready by the deadline
+        self.late_decisions = 0  # commands applied after the tick following the one they were decided on
+        self.dropped_commands = 0  # commands dropped because the command queue was full
+
+        self.overlay_surface = None
+        self.overlay_frames = 0  # frames until the overlay text is rendered again
+
+    def record(self, phase, msecs):
+        self.samples[phase].append(msecs)
+        self.counts[phase] += 1
+        if msecs > self.maximums[phase]:
+            self.maximums[phase] = msecs
+        if phase == "tick" and msecs > self.budget:
+            self.over_budget_ticks += 1
+
+    def lap(self, phase, since):
+        """Record the time elapsed since a time.perf_counter() value, and return the current one for the next lap."""
+        now = time.perf_counter()
+        self.record(phase, (now - since) * 1000.0)
+        return now
+
+    def percentiles(self, phase, quantiles=(0.5, 0.95, 0.99)):
+        samples = sorted(self.samples[phase])
+        if not samples:
+            return tuple(0.0 for _ in quantiles)
+        # Nearest-rank percentiles
+        return tuple(samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles)
+
+    def summary(self):
+        phases = {}
+        for phase in PHASES:
+            samples = self.samples[phase]
+            p50, p95, p99 = self.percentiles(phase)
+            phases[phase] = {
+                "count": self.counts[phase],
+                "mean": sum(samples) / len(samples) if samples else 0.0,
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "max": self.maximums[phase],
+            }
+        summary = {"budget_msecs": self.budget}
+        summary.update((counter, getattr(self, counter)) for counter in COUNTERS)
+        summary["phases"] = phases
+        return summary
+
+    def dump(self, path):
+        """Write the summary to a .csv file, one row per phase, or to a .json file otherwise."""
+        summary = self.summary()
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["phase", "count", "mean", "p50", "p95", "p99", "max"])
+                for phase, stats in summary["phases"].items():
+                    writer.writerow([phase] + [stats[key] for key in ("count", "mean", "p50", "p95", "p99", "max")])
+                for counter in COUNTERS:
+                    writer.writerow([counter, summary[counter]])
+        else:
+            with open(path, "w") as file:
+                json.dump(summary, file, indent=2)
+
+    def draw_overlay(self, screen, font):
+        # Sorting the samples every frame would itself show up in the timings, so the text is refreshed twice a second
+        if self.overlay_frames <= 0:
+            self.overlay_surface = self.render_overlay(font)
+            self.overlay_frames = 20
+        self.overlay_frames -= 1
+        return screen.blit(self.overlay_surface, (screen.get_width() - self.overlay_surface.get_width() - 10, 10))
+
+    def render_overlay(self, font):
+        rows = [("msecs", "p50", "p95", "p99")]
+        for phase in PHASES:
+            rows.append((phase, *(f"{value:.2f}" for value in self.percentiles(phase))))
+        footer = (f"over budget: {self.over_budget_ticks}   skipped: {self.skipped_ticks}   "
+                  f"missed: {self.missed_decisions}   late: {self.late_decisions}   dropped: {self.dropped_commands}")
+
+        # The font is proportional, so the numbers are right-aligned in fixed columns
+        line_height = font.get_linesize()
+        label_width, column_width = 170, 70
+        width = label_width + 3 * column_width + 20
+        overlay = pygame.Surface((width, line_height * (len(rows) + 1) + 20), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 160))
+        for i, row in enumerate(rows):
+            y = 10 + i * line_height
+            overlay.blit(font.render(row[0], True, (255, 255, 255)), (10, y))
+            for j, text in enumerate(row[1:]):
+                surface = font.render(text, True, (255, 255, 255))
+                overlay.blit(surface, (10 + label_width + (j + 1) * column_width - surface.get_width(), y))
+        overlay.blit(font.render(footer, True, (255, 255, 255)), (10, 10 + len(rows) * line_height))
+        return overlay
@@ -0,0 +1,314 @@
+"""
+Compact binary match recordings.
+
+A recording is a header, followed by fixed-size records, followed by an index footer:
+
+- one TICK record per tick, with the state of both fighters and the commands applied since the previous tick,
+- a BULLET_SPAWN record the first tick a bullet is seen, and a BULLET_DESPAWN record after the last tick it is seen,
+- an EXPLOSION record for every explosion, so replays can show them,
+- an END record with the result of the match.
+
+The footer maps every tick to its TICK record, every bullet to its spawn record and last tick, and lists the EXPLOSION
+records, so MatchReader can seek to any tick of a memory-mapped recording in constant time. Bullet positions are not stored per tick: bullets fly
+straight, so their position at any tick is computed from their spawn record.
+"""
+import bisect
+import math
+import mmap
+import struct
+from collections import namedtuple
+
+from Engine.Snapshot import ObstacleState
+
+MAGIC = b"SUHREC"
+INDEX_MAGIC = b"SUHIDX"
+VERSION = 2
+
+# magic, version, record size, msecs per tick, screen width, screen height, obstacle x, y, width, height, seed
+HEADER = struct.Struct("<6sHHHHHhhHHq")
+# kind, 5 small fields, bullet id or count, tick, then a 32-byte payload whose layout depends on the kind
+RECORD_HEAD = struct.Struct("<BbbbbbHI")
+TICK_PAYLOAD = struct.Struct("<8f")  # jetfighter x, y, heading, speed, then propfighter x, y, heading, speed
+BULLET_PAYLOAD = struct.Struct("<4d")  # x, y, heading, speed
+EXPLOSION_PAYLOAD = struct.Struct("<2d16x")  # x, y
+RECORD_SIZE = RECORD_HEAD.size + TICK_PAYLOAD.size
+# footer offset, number of ticks, number of bullets, number of explosions. The index arrays come first in the footer.
+TRAILER = struct.Struct("<6sxxQIII")
+
+TICK = 1
+BULLET_SPAWN = 2
+BULLET_DESPAWN = 3
+END = 4
+EXPLOSION = 5
+
+NO_COMMAND = -1
+CAUSES = ("", "bullet_hit", "jet_obstacle", "prop_obstacle", "collision", "timeout")
+
+FighterFrame = namedtuple("FighterFrame", ["x", "y", "heading", "speed", "turning", "ammo"])
+TickFrame = namedtuple("TickFrame", ["tick", "jetfighter", "propfighter", "jet_cmd", "prop_cmd", "bullet_count"])
+BulletFrame = namedtuple("BulletFrame", ["id", "x", "y", "heading", "speed"])
+ExplosionFrame = namedtuple("ExplosionFrame", ["tick", "x", "y", "size"])
+
+EMPTY_PAYLOAD = bytes(TICK_PAYLOAD.size)
+
+
+class MatchRecorder:
+    """
+    Appends the state of an engine to a recording, one TICK record per call to record_tick().
+    Bullets are tracked by identity: new sprites in engine.bullets get a BULLET_SPAWN record, and sprites that are gone
+    get a BULLET_DESPAWN record.
+    """
+
+    def __init__(self, path, engine, seed=0):
+        self.path = path
+        self.file = open(path, "wb")
+        self.records = 0  # number of records written so far
+        self.tick_index = []  # record number of the TICK record of each tick
+        self.bullet_ids = {}  # map from live bullet sprite to its id
+        self.bullet_index = []  # [spawn record number, last tick] of each bullet id
+        self.explosion_index = []  # record numbers of the EXPLOSION records
+        self.first_tick = None
+        self.last_tick = None
+        # Latest command applied to each fighter since the previous tick. The decision thread may set them.
+        self.jet_cmd = NO_COMMAND
+        self.prop_cmd = NO_COMMAND
+
+        rect = engine.obstacle.rect
+        self.file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, engine.tick, engine.screen_width,
+                                    engine.screen_height, rect.x, rect.y, rect.width, rect.height, seed))
+
+    def write_record(self, kind, small_fields, number, tick, payload=EMPTY_PAYLOAD):
+        self.file.write(RECORD_HEAD.pack(kind, *small_fields, number, tick))
+        self.file.write(payload)
+        self.records += 1
+
+    def record_command(self, is_jetfighter, cmd):
+        if is_jetfighter:
+            self.jet_cmd = cmd
+        else:
+            self.prop_cmd = cmd
+
+    def record_explosion(self, tick, x, y, size):
+        self.explosion_index.append(self.records)
+        self.write_record(EXPLOSION, (0, 0, 0, 0, 0), size, tick, EXPLOSION_PAYLOAD.pack(x, y))
+
+    def record_tick(self, engine):
+        tick = engine.ticks
+        if self.first_tick is None:
+            self.first_tick = tick
+        elif tick != self.last_tick + 1:
+            raise ValueError(f"ticks must be recorded in order, got {tick} after {self.last_tick}")
+
+        jet, prop = engine.jetfighter, engine.propfighter
+        self.tick_index.append(self.records)
+        self.write_record(TICK, (jet.curr_ammo, jet.turning, prop.turning, self.jet_cmd, self.prop_cmd),
+                          len(engine.bullets), tick,
+                          TICK_PAYLOAD.pack(jet.x, jet.y, jet.heading, jet.curr_speed,
+                                            prop.x, prop.y, prop.heading, prop.curr_speed))
+        self.jet_cmd = self.prop_cmd = NO_COMMAND
+
+        # Bullets that are gone were last seen on the previous tick
+        live = set(engine.bullets)
+        for bullet in [bullet for bullet in self.bullet_ids if bullet not in live]:
+            self.despawn(bullet, tick - 1)
+        for bullet in engine.bullets:
+            if bullet not in self.bullet_ids:
+                bullet_id = len(self.bullet_index)
+                self.bullet_ids[bullet] = bullet_id
+                self.bullet_index.append([self.records, tick])
+                self.write_record(BULLET_SPAWN, (0, 0, 0, 0, 0), bullet_id, tick,
+                                  BULLET_PAYLOAD.pack(bullet.x, bullet.y, bullet.heading, bullet.speed))
+        for bullet_id in self.bullet_ids.values():
+            self.bullet_index[bullet_id][1] = tick
+        self.last_tick = tick
+
+    def despawn(self, bullet, last_tick):
+        bullet_id = self.bullet_ids.pop(bullet)
+        self.bullet_index[bullet_id][1] = last_tick
+        self.write_record(BULLET_DESPAWN, (0, 0, 0, 0, 0), bullet_id, last_tick)
+
+    def close(self, result=0, cause=""):
+        """
+        Write the END record and the index footer, and close the file.
+        :param result: 1 for jetfighter victory, -1 for propfighter victory, 0 if the match did not finish
+        :param cause: the ending cause of the engine
+        """
+        if self.file is None:
+            return
+        last_tick = self.last_tick if self.last_tick is not None else 0
+        for bullet in list(self.bullet_ids):
+            self.despawn(bullet, last_tick)
+        self.write_record(END, (result, CAUSES.index(cause) if cause in CAUSES else 0, 0, 0, 0), 0, last_tick)
+
+        footer_offset = self.file.tell()
+        self.file.write(struct.pack(f"<{len(self.tick_index)}I", *self.tick_index))
+        for spawn_record, bullet_last_tick in self.bullet_index:
+            self.file.write(struct.pack("<II", spawn_record, bullet_last_tick))
+        self.file.write(struct.pack(f"<{len(self.explosion_index)}I", *self.explosion_index))
+        self.file.write(TRAILER.pack(INDEX_MAGIC, footer_offset, len(self.tick_index), len(self.bullet_index),
+                                     len(self.explosion_index)))
+        self.file.close()
+        self.file = None
+
+
+class MatchReader:
+    """
+    Read-only view of a recording. The file is memory-mapped and records are decoded on demand, so opening a recording
+    and seeking to any tick costs the same whatever the length of the match. A recording whose writer did not finish
+    has no footer, and is indexed by scanning its records once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.read_index()
+        except Exception:
+            # Not a recording, or a truncated one
+            self.close()
+            raise
+
+    def read_index(self):
+        (magic, version, record_size, self.tick, self.screen_width, self.screen_height, obstacle_x, obstacle_y,
+         obstacle_width, obstacle_height, self.seed) = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            raise ValueError(f"{self.path} is not a version {VERSION} match recording")
+        self.obstacle = ObstacleState(obstacle_x, obstacle_y, obstacle_width, obstacle_height)
+
+        magic, footer_offset, tick_count, bullet_count, explosion_count = TRAILER.unpack_from(
+            self.mmap, len(self.mmap) - TRAILER.size)
+        if magic == INDEX_MAGIC:
+            self.record_count = (footer_offset - HEADER.size) // RECORD_SIZE
+            self.tick_index = struct.unpack_from(f"<{tick_count}I", self.mmap, footer_offset)
+            offset = footer_offset + tick_count * 4
+            self.bullet_index = struct.unpack_from(f"<{2 * bullet_count}I", self.mmap, offset)
+            offset += bullet_count * 8
+            explosion_index = struct.unpack_from(f"<{explosion_count}I", self.mmap, offset)
+        else:
+            self.record_count = (len(self.mmap) - HEADER.size) // RECORD_SIZE
+            self.tick_index, self.bullet_index, explosion_index = self.scan()
+        # Explosions are few, so they are decoded up front, in tick order
+        self.explosions = [ExplosionFrame(self.read_head(record)[7], *self.read_payload(record, EXPLOSION_PAYLOAD),
+                                          self.read_head(record)[6]) for record in explosion_index]
+        self.explosion_ticks = [explosion.tick for explosion in self.explosions]
+        # Bullet ids are given in spawn order, so the bullets alive at a tick are found by bisecting their spawn ticks,
+        # no further back than the longest life of a bullet
+        self.bullet_spawn_ticks = [self.read_head(self.bullet_index[2 * bullet_id])[7]
+                                   for bullet_id in range(len(self.bullet_index) // 2)]
+        self.max_bullet_ticks = max((self.bullet_index[2 * bullet_id + 1] - spawn_tick
+                                     for bullet_id, spawn_tick in enumerate(self.bullet_spawn_ticks)), default=0)
+
+        self.result = 0
+        self.cause = ""
+        self.first_tick = self.read_head(self.tick_index[0])[7] if len(self.tick_index) else 0
+        last_record = self.read_head(self.record_count - 1) if self.record_count else None
+        if last_record is not None and last_record[0] == END:
+            self.result = last_record[1]
+            self.cause = CAUSES[last_record[2]]
+
+    def __len__(self):
+        return len(self.tick_index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.mmap is None:
+            return
+        self.mmap.close()
+        self.mmap = None
+
+    def scan(self):
+        tick_index = []
+        bullet_index = []
+        explosion_index = []
+        last_tick = 0
+        for record in range(self.record_count):
+            kind, _, _, _, _, _, number, tick = self.read_head(record)
+            if kind == TICK:
+                tick_index.append(record)
+                last_tick = tick
+                # Bullets alive when the writer stopped are assumed to live until the last tick
+                for bullet_id in range(len(bullet_index) // 2):
+                    if bullet_index[2 * bullet_id + 1] == tick - 1:
+                        bullet_index[2 * bullet_id + 1] = tick
+            elif kind == BULLET_SPAWN:
+                bullet_index.extend((record, last_tick))
+            elif kind == BULLET_DESPAWN:
+                bullet_index[2 * number + 1] = tick
+            elif kind == EXPLOSION:
+                explosion_index.append(record)
+        return tick_index, bullet_index, explosion_index
+
+    def read_head(self, record):
+        return RECORD_HEAD.unpack_from(self.mmap, HEADER.size + record * RECORD_SIZE)
+
+    def read_payload(self, record, payload):
+        return payload.unpack_from(self.mmap, HEADER.size + record * RECORD_SIZE + RECORD_HEAD.size)
+
+    def get_tick(self, tick):
+        """Return the TickFrame of a tick, in constant time."""
+        record = self.tick_index[tick - self.first_tick]
+        _, jet_ammo, jet_turning, prop_turning, jet_cmd, prop_cmd, bullet_count, recorded_tick = self.read_head(record)
+        jet_x, jet_y, jet_heading, jet_speed, prop_x, prop_y, prop_heading, prop_speed = self.read_payload(
+            record, TICK_PAYLOAD)
+        return TickFrame(recorded_tick, FighterFrame(jet_x, jet_y, jet_heading, jet_speed, jet_turning, jet_ammo),
+                         FighterFrame(prop_x, prop_y, prop_heading, prop_speed, prop_turning, 0),
+                         jet_cmd, prop_cmd, bullet_count)
+
+    def get_bullets(self, tick):
+        """
+        Return the BulletFrames of the bullets alive at a tick, computed from their spawn records. Only the bullets
+        spawned within the longest life of a bullet before the tick are looked at, so it takes constant time too.
+        """
+        start = bisect.bisect_left(self.bullet_spawn_ticks, tick - self.max_bullet_ticks)
+        end = bisect.bisect_right(self.bullet_spawn_ticks, tick)
+        bullets = []
+        for bullet_id in range(start, end):
+            spawn_record, last_tick = self.bullet_index[2 * bullet_id], self.bullet_index[2 * bullet_id + 1]
+            if tick <= last_tick:
+                x, y, heading, speed = self.read_payload(spawn_record, BULLET_PAYLOAD)
+                x, y = advance_bullet(x, y, heading, speed, tick - self.bullet_spawn_ticks[bullet_id], self.tick,
+                                      self.screen_width, self.screen_height)
+                bullets.append(BulletFrame(bullet_id, x, y, heading, speed))
+        return bullets
+
+    def get_explosions(self, first_tick, last_tick):
+        """Return the ExplosionFrames of the explosions that started between two ticks, both included."""
+        start = bisect.bisect_left(self.explosion_ticks, first_tick)
+        end = bisect.bisect_right(self.explosion_ticks, last_tick)
+        return self.explosions[start:end]
+
+    def get_commands(self):
+        """Return the (jetfighter, propfighter) commands of every tick, NO_COMMAND where none was applied."""
+        return [self.read_head(record)[4:6] for record in self.tick_index]
+
+
+def advance_bullet(x, y, heading, speed, steps, tick, screen_width, screen_height):
+    """
+    Position of a bullet steps ticks after (x, y), in closed form. Bullet.update() moves it by a fixed step each tick,
+    and moves it to the opposite edge when it leaves the screen, so along each axis it goes from its start to the first
+    edge, and then from the opposite edge across the screen again and again.
+    """
+    radians = math.radians(heading)
+    return (advance_axis(x, speed * tick * math.sin(radians) / 1000.0, steps, screen_width),
+            advance_axis(y, -speed * tick * math.cos(radians) / 1000.0, steps, screen_height))
+
+
+def advance_axis(position, step, steps, size):
+    # The start is on the screen, between 0 and size, as bullets are wrapped around before they are recorded
+    if step == 0 or steps == 0:
+        return position
+    if step > 0:
+        edge, distance = 0.0, size - position  # wrapped to 0 once past size
+    else:
+        edge, distance = float(size), position  # wrapped to size once below 0
+    first = math.floor(distance / abs(step)) + 1  # ticks to the first wrap
+    if steps < first:
+        return position + steps * step
+    period = math.floor(size / abs(step)) + 1  # ticks between two wraps
+    return edge + ((steps - first) % period) * step
@@ -0,0 +1,201 @@
+import pygame
+
+import Engine.Assets as Assets
+from Engine.Bullet import Bullet
+from Engine.Explosion import Explosion
+from Engine.Recorder import MatchReader
+
+ENDING_TEXTS = {
+    "bullet_hit": "Prop-fighter hit by a bullet!! Jet-fighter won!!",
+    "jet_obstacle": "Jet-fighter committed suicide!! Prop-fighter won!!",
+    "prop_obstacle": "Prop-fighter hit the obstacle!! Jet-fighter won!!",
+    "collision": "Jet-fighter crashed into Prop-fighter!! Prop-fighter won!!",
+    "timeout": "Prop-fighter survived!! Prop-fighter won!!",
+}
+# Fighters destroyed at the end of the match, by ending cause
+KILLED = {
+    "bullet_hit": ("propfighter",),
+    "jet_obstacle": ("jetfighter",),
+    "prop_obstacle": ("propfighter",),
+    "collision": ("jetfighter", "propfighter"),
+}
+SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+SEEK_TICKS = 400  # ticks to jump with page up / page down
+EXPLOSION_TICKS = 40  # after a seek, show the explosions that started this many ticks before
+TIMELINE_MARGIN = 100
+
+
+class ReplayViewer:
+    """
+    Plays a match recording back with the engine's own sprites and stats board.
+
+    Every frame shows a single tick, read from the recording in constant time, so the rendering cost does not depend
+    on the playback speed: at high speed, the ticks in between are simply skipped.
+
+    Controls: space to pause or resume, left / right to step one tick, up / down to change the speed, page up / page
+    down to jump 10 seconds, home / end to go to the start or the end, click or drag on the timeline to seek, and
+    escape to quit.
+    """
+
+    def __init__(self, engine, path):
+        self.engine = engine
+        self.reader = MatchReader(path)
+        self.first_tick = self.reader.first_tick
+        self.last_tick = self.first_tick + len(self.reader) - 1
+        self.tick = self.first_tick  # tick on screen
+        self.playhead = float(self.first_tick)  # fractional tick, so speeds below 1x work
+        self.speed_index = SPEEDS.index(1)
+        self.paused = False
+        self.running = False
+        self.scrubbing = False
+        self.bullets = {}  # map from bullet id to the Bullet sprite showing it
+        self.font = engine.fonts["chakra-16-regular"]
+        self.timeline = pygame.Rect(TIMELINE_MARGIN, engine.screen_height - 40,
+                                    engine.screen_width - 2 * TIMELINE_MARGIN, 10)
+
+    def show(self, tick, seek=False):
+        """Load the state of a tick into the engine's sprites."""
+        tick = max(self.first_tick, min(self.last_tick, tick))
+        previous_tick = self.tick
+        self.tick = tick
+        if seek or tick < previous_tick:
+            self.engine.explosions.empty()
+            explosions = self.reader.get_explosions(tick - EXPLOSION_TICKS + 1, tick)
+        else:
+            explosions = self.reader.get_explosions(previous_tick + 1, tick)
+        for explosion in explosions:
+            self.engine.explosions.add(Explosion(self.engine, explosion.x, explosion.y, explosion.size))
+            if not seek:
+                # Same sounds as in the match: the big explosions are the fighters'
+                self.engine.play_sound("explosion" if explosion.size >= 71 else "explosion2")
+
+        frame = self.reader.get_tick(tick)
+        self.engine.ticks = tick
+        for fighter, state in ((self.engine.jetfighter, frame.jetfighter), (self.engine.propfighter, frame.propfighter)):
+            fighter.x, fighter.y, fighter.heading = state.x, state.y, state.heading
+            fighter.curr_speed = state.speed
+            fighter.turning = state.turning
+            fighter.curr_ammo = state.ammo
+            fighter.killed = False
+            fighter.update_image()
+        if tick == self.last_tick:
+            for name in KILLED.get(self.reader.cause, ()):
+                getattr(self.engine, name).killed = True
+
+        bullets = {}
+        for state in self.reader.get_bullets(tick):
+            bullet = self.bullets.get(state.id)
+            if bullet is None:
+                bullet = Bullet(self.engine, state.x, state.y, state.heading)
+            bullet.x, bullet.y = state.x, state.y
+            bullet.rect.center = (int(state.x), int(state.y))
+            bullets[state.id] = bullet
+        self.bullets = bullets
+
+    def seek(self, tick):
+        self.playhead = float(max(self.first_tick, min(self.last_tick, tick)))
+        self.show(int(self.playhead), seek=True)
+
+    def seek_to_mouse(self, x):
+        fraction = (x - self.timeline.left) / self.timeline.width
+        self.seek(self.first_tick + round(fraction * (self.last_tick - self.first_tick)))
+
+    def check_events(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key in (pygame.K_ESCAPE, pygame.K_q):
+                    self.running = False
+                elif event.key == pygame.K_SPACE:
+                    if self.tick == self.last_tick:
+                        self.seek(self.first_tick)
+                    self.paused = not self.paused
+                elif event.key == pygame.K_RIGHT:
+                    self.paused = True
+                    self.seek(self.tick + 1)
+                elif event.key == pygame.K_LEFT:
+                    self.paused = True
+                    self.seek(self.tick - 1)
+                elif event.key == pygame.K_UP:
+                    self.speed_index = min(self.speed_index + 1, len(SPEEDS) - 1)
+                elif event.key == pygame.K_DOWN:
+                    self.speed_index = max(self.speed_index - 1, 0)
+                elif event.key == pygame.K_PAGEUP:
+                    self.seek(self.tick - SEEK_TICKS)
+                elif event.key == pygame.K_PAGEDOWN:
+                    self.seek(self.tick + SEEK_TICKS)
+                elif event.key == pygame.K_HOME:
+                    self.seek(self.first_tick)
+                elif event.key == pygame.K_END:
+                    self.seek(self.last_tick)
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if self.timeline.inflate(0, 20).collidepoint(event.pos):
+                    self.scrubbing = True
+                    self.seek_to_mouse(event.pos[0])
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+                self.scrubbing = False
+            elif event.type == pygame.MOUSEMOTION and self.scrubbing:
+                self.seek_to_mouse(event.pos[0])
+
+    def draw(self):
+        engine = self.engine
+        engine.screen.fill(engine.bgcolor)
+        engine.obstacle.draw()
+        engine.jetfighter.draw()
+        engine.propfighter.draw()
+        engine.stats_board.draw()
+        for bullet in self.bullets.values():
+            bullet.draw()
+        for explosion in engine.explosions:
+            explosion.update()
+            explosion.draw()
+
+        if self.tick == self.last_tick and self.reader.cause:
+            ending_text = engine.fonts["chakra-32-bold"].render(ENDING_TEXTS[self.reader.cause], True, (66, 66, 66))
+            engine.screen.blit(ending_text, ((engine.screen_width - ending_text.get_width()) // 2, 290))
+        self.draw_timeline()
+        pygame.display.flip()
+
+    def draw_timeline(self):
+        screen = self.engine.screen
+        pygame.draw.rect(screen, (180, 180, 180), self.timeline)
+        span = max(1, self.last_tick - self.first_tick)
+        progress = self.timeline.copy()
+        progress.width = round(self.timeline.width * (self.tick - self.first_tick) / span)
+        pygame.draw.rect(screen, (66, 66, 66), progress)
+        for explosion in self.reader.explosions:
+            x = self.timeline.left + round(self.timeline.width * (explosion.tick - self.first_tick) / span)
+            pygame.draw.line(screen, (255, 165, 0), (x, self.timeline.top - 4), (x, self.timeline.bottom + 3), 2)
+
+        speed = SPEEDS[self.speed_index]
+        status = f"Tick {self.tick} / {self.last_tick}   Speed x{speed:g}" + ("   Paused" if self.paused else "")
+        text = self.font.render(status, True, (66, 66, 66))
+        screen.blit(text, (self.timeline.left, self.timeline.top - text.get_height() - 8))
+
+    def run(self):
+        pygame.display.set_caption(f"Replay of {self.reader.path}")
+        self.running = True
+        Assets.prewarm()
+        self.seek(self.first_tick)
+
+        while self.running:
+            start_time = pygame.time.get_ticks()
+
+            self.check_events()
+            if not self.paused:
+                self.playhead = min(self.playhead + SPEEDS[self.speed_index], self.last_tick)
+                if int(self.playhead) != self.tick:
+                    self.show(int(self.playhead))
+                if self.tick == self.last_tick:
+                    self.paused = True
+            self.draw()
+
+            # Play at the speed of the recorded match, one frame per tick at 1x
+            elapsed_time = pygame.time.get_ticks() - start_time
+            remaining_time = self.reader.tick - elapsed_time
+            if remaining_time > 0:
+                pygame.time.delay(remaining_time)
+
+        self.reader.close()
+        pygame.quit()
@@ -0,0 +1,109 @@
+import collections
+import threading
+import time
+
+
+class DecisionScheduler:
+    """
+    Hands the ticks of the main loop to the decision thread, and its commands back.
+
+    After updating the battlefield to tick N, the main loop publishes the snapshot of tick N with the time of the tick
+    boundary. The decision thread waits for it rather than sleeping for a tick, so it stays in phase with the main
+    loop however long the decisions and the frames take, and decides on exactly that snapshot. Before updating to
+    tick N + 1, the main loop drains the queue of commands, waiting for the one decided on tick N until deadline msecs
+    after the boundary of tick N at most, and applies them on its own thread, so they never race with the update or
+    the drawing of the battlefield.
+
+    The queue holds (tick, command) pairs in the order they were decided, and at most capacity of them: when it is
+    full, the oldest command is dropped. Commands decided on an earlier tick are applied late, and the ticks without a
+    command go on without one. These are counted in the profiler, with the time from the boundary to the start of the
+    decision (decision_wake), to its command being ready (decision_ready), and between two boundaries (tick_period).
+    """
+
+    def __init__(self, profiler, deadline=20, capacity=4, log=print):
+        """
+        :param profiler: Profiler the timings and counts are recorded to
+        :param deadline: msecs after the tick boundary the command of the tick has to be ready by to be applied on the
+                         next tick
+        :param capacity: maximum number of commands waiting to be applied
+        :param log: function printing the dropped commands, once per stretch of full queue
+        """
+        self.profiler = profiler
+        self.deadline = deadline
+        self.capacity = capacity
+        self.log = log
+        self.condition = threading.Condition()
+        self.snapshot = None  # latest published snapshot
+        self.boundary_ts = 0.0  # time.perf_counter() of its tick boundary
+        self.commands = collections.deque()  # (tick, command) of the decisions not applied yet, oldest first
+        self.deciding_tick = -1  # tick of the snapshot the decision thread took last
+        self.dropped = []  # ticks of the commands dropped since the queue was last not full, logged once it is not
+        self.closed = False
+
+    def publish(self, snapshot):
+        """Publish the snapshot of a new tick. Called by the main loop right after capturing it."""
+        now = time.perf_counter()
+        with self.condition:
+            if self.snapshot is not None and snapshot.tick == self.snapshot.tick + 1:
+                self.profiler.record("tick_period", (now - self.boundary_ts) * 1000.0)
+            self.snapshot = snapshot
+            self.boundary_ts = now
+            self.condition.notify_all()
+
+    def wait_for_tick(self, last_tick, timeout=0.1):
+        """
+        Wait for a tick after last_tick to be published. Called by the decision thread.
+        :return: (snapshot, boundary time) of the latest tick, or (None, None) on timeout or once closed
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.closed or (self.snapshot is not None and self.snapshot.tick > last_tick), timeout)
+            if self.closed or self.snapshot is None or self.snapshot.tick <= last_tick:
+                return None, None
+            self.deciding_tick = self.snapshot.tick
+            return self.snapshot, self.boundary_ts
+
+    def submit(self, tick, cmd, boundary_ts):
+        """Queue the command decided on the snapshot of a tick. Called by the decision thread."""
+        ready = (time.perf_counter() - boundary_ts) * 1000.0
+        with self.condition:
+            self.profiler.record("decision_ready", ready)
+            if len(self.commands) >= self.capacity:
+                dropped_tick, _ = self.commands.popleft()
+                self.profiler.dropped_commands += 1
+                self.dropped.append(dropped_tick)
+            else:
+                self.report_dropped()
+            self.commands.append((tick, cmd))
+            self.condition.notify_all()
+
+    def report_dropped(self):
+        if self.dropped:
+            self.log(f"Command queue full, dropped {len(self.dropped)} commands decided on ticks {self.dropped[0]} to "
+                     f"{self.dropped[-1]}")
+            self.dropped = []
+
+    def drain(self, tick):
+        """
+        Return the (tick, command) pairs to apply before updating the battlefield past tick, oldest first, and empty the
+        queue. Called by the main loop, it waits for the command decided on tick until the deadline, if the decision
+        thread is deciding on that tick rather than still busy with an earlier one.
+        """
+        with self.condition:
+            timeout = self.boundary_ts + self.deadline / 1000.0 - time.perf_counter()
+            if timeout > 0 and self.deciding_tick == tick:
+                self.condition.wait_for(lambda: self.closed or (self.commands and self.commands[-1][0] >= tick),
+                                        timeout)
+            commands = list(self.commands)
+            self.commands.clear()
+        if not commands or commands[-1][0] < tick:
+            self.profiler.missed_decisions += 1
+        self.profiler.late_decisions += sum(1 for decided_tick, _ in commands if decided_tick < tick)
+        return commands
+
+    def close(self):
+        """Wake up the decision thread, so it can see the engine has stopped."""
+        with self.condition:
+            self.closed = True
+            self.report_dropped()
+            self.condition.notify_all()
@@ -0,0 +1,58 @@
+from collections import namedtuple
+
+# Immutable records of the game state, with the same fields as the dictionaries passed to Strategy.decision()
+FighterState = namedtuple("FighterState", [
+    "x", "y", "heading", "turning", "turn_speed", "curr_speed", "top_speed", "min_speed",
+    "curr_ammo", "max_ammo", "ammo_regen_time", "ammo_fire_delay",
+])
+BulletState = namedtuple("BulletState", ["x", "y", "heading", "speed", "distance_traveled", "max_distance"])
+ObstacleState = namedtuple("ObstacleState", ["x", "y", "width", "height"])
+
+# Keys of the propfighter dictionary passed to Strategy.decision(). It has no ammo.
+PROPFIGHTER_KEYS = ("x", "y", "heading", "turning", "turn_speed", "curr_speed", "min_speed", "top_speed")
+
+
+class GameSnapshot:
+    """
+    Consistent, read-only view of the game state at the end of one tick. The engine captures one snapshot per tick
+    after updating the battlefield, and publishes it by swapping a single reference, so a strategy reading it from
+    another thread never sees fields from two different ticks.
+    """
+    __slots__ = ("tick", "jetfighter", "propfighter", "obstacle", "bullets")
+
+    def __init__(self, tick, jetfighter, propfighter, obstacle, bullets):
+        self.tick = tick  # engine tick the state was captured at
+        self.jetfighter = jetfighter  # FighterState
+        self.propfighter = propfighter  # FighterState
+        self.obstacle = obstacle  # ObstacleState
+        self.bullets = bullets  # tuple of BulletState
+
+    @staticmethod
+    def capture_fighter(fighter):
+        return FighterState(fighter.x, fighter.y, fighter.heading, fighter.turning, fighter.turn_speed,
+                            fighter.curr_speed, fighter.top_speed, fighter.min_speed, fighter.curr_ammo,
+                            fighter.max_ammo, fighter.ammo_regen_time, fighter.ammo_fire_delay)
+
+    @staticmethod
+    def capture(engine, obstacle=None):
+        """
+        Capture the current state of the engine.
+        :param obstacle: ObstacleState to reuse, as the obstacle never moves
+        """
+        if obstacle is None:
+            rect = engine.obstacle.rect
+            obstacle = ObstacleState(rect.x, rect.y, rect.width, rect.height)
+        bullets = tuple(BulletState(bullet.x, bullet.y, bullet.heading, bullet.speed, bullet.distance_traveled,
+                                    bullet.max_distance) for bullet in engine.bullets)
+        return GameSnapshot(engine.ticks, GameSnapshot.capture_fighter(engine.jetfighter),
+                            GameSnapshot.capture_fighter(engine.propfighter), obstacle, bullets)
+
+    def as_dicts(self):
+        """Return the state as the keyword arguments of Strategy.decision(), as fresh dictionaries."""
+        propfighter = self.propfighter._asdict()
+        return {
+            "jetfighter_info": self.jetfighter._asdict(),
+            "propfighter_info": {key: propfighter[key] for key in PROPFIGHTER_KEYS},
+            "obstacle_info": self.obstacle._asdict(),
+            "bullet_info": [bullet._asdict() for bullet in self.bullets],
+        }
@@ -2,18 +2,21 @@ import pygame
 import random
 import math
 
+import Engine.Assets as Assets
+
 class SnowFlake(pygame.sprite.Sprite):
     def __init__(self, engine):
         super().__init__()
         self.engine = engine
 
-        # Load the snowflake image
-        self.image = pygame.image.load("images/snow_flake.png").convert_alpha()
-        self.image.set_alpha(random.randint(80, 200))
+        # The snowflake image is shared by all snowflakes, so the alpha is set on the scaled copy
+        image = Assets.load_image("images/snow_flake.png")
+        alpha = random.randint(80, 200)
 
         # Randomly scale the image
-        scale_factor = random.randint(30, 150) / self.image.get_width()
-        self.image = pygame.transform.scale(self.image, (int(self.image.get_width() * scale_factor), int(self.image.get_height() * scale_factor)))
+        scale_factor = random.randint(30, 150) / image.get_width()
+        self.image = pygame.transform.scale(image, (int(image.get_width() * scale_factor), int(image.get_height() * scale_factor)))
+        self.image.set_alpha(alpha)
         self.wind_direction = 0  # change wind direction every 1000 ticks
         self.speed_x = 0.0
         self.speed_y = 0.5
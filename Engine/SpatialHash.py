@@ -0,0 +1,77 @@
+class SpatialHash:
+    """
+    Uniform grid over the screen, mapping cells to the sprites whose rect overlaps them, so collision checks only look
+    at the sprites near a given rect instead of the whole group.
+    Cells wrap around the screen edges, so a rect sticking out of one edge also lands in the cells on the opposite
+    edge. This is exact when the cell size divides the screen size.
+    The grid is maintained incrementally: update() only touches the grid when a sprite moves into other cells.
+    """
+
+    def __init__(self, screen_width, screen_height, cell_size=100, few=8):
+        """
+        :param few: with at most this many sprites, query() returns all of them, as the collision checks reject the
+                    far ones faster than the cells of the rect are looked up
+        """
+        self.cell_size = cell_size
+        self.few = few
+        self.cols = max(1, screen_width // cell_size)
+        self.rows = max(1, screen_height // cell_size)
+        self.cells = {}  # map from (col, row) to an insertion-ordered dict of the sprites in the cell
+        self.sprite_cells = {}  # map from sprite to the cells it occupies
+        self.sprite_bounds = {}  # map from sprite to the get_bounds() of its rect, when it was last placed
+
+    def __len__(self):
+        return len(self.sprite_cells)
+
+    def __contains__(self, sprite):
+        return sprite in self.sprite_cells
+
+    def get_bounds(self, rect):
+        # First and last column and row the rect overlaps, before wrapping around
+        cell_size = self.cell_size
+        return (rect.left // cell_size, (rect.right - 1) // cell_size,
+                rect.top // cell_size, (rect.bottom - 1) // cell_size)
+
+    def get_cells(self, bounds):
+        first_col, last_col, first_row, last_row = bounds
+        col_range = range(first_col, last_col + 1)
+        row_range = range(first_row, last_row + 1)
+        if len(col_range) >= self.cols:
+            col_range = range(self.cols)
+        if len(row_range) >= self.rows:
+            row_range = range(self.rows)
+        return tuple((col % self.cols, row % self.rows) for col in col_range for row in row_range)
+
+    def update(self, sprite):
+        """Add the sprite, or move it to the cells its rect currently overlaps."""
+        bounds = self.get_bounds(sprite.rect)
+        # Most sprites stay in the same cells from one tick to the next, so that is checked before building any cell
+        if self.sprite_bounds.get(sprite) == bounds:
+            return
+        self.remove(sprite)
+        cells = self.get_cells(bounds)
+        for cell in cells:
+            self.cells.setdefault(cell, {})[sprite] = None
+        self.sprite_cells[sprite] = cells
+        self.sprite_bounds[sprite] = bounds
+
+    def remove(self, sprite):
+        old_cells = self.sprite_cells.pop(sprite, None)
+        self.sprite_bounds.pop(sprite, None)
+        if old_cells is not None:
+            for cell in old_cells:
+                del self.cells[cell][sprite]
+
+    def query(self, rect):
+        """
+        Return the sprites sharing at least one cell with the rect, without duplicates, or all of them when there are
+        only a few.
+        """
+        if len(self.sprite_cells) <= self.few:
+            return list(self.sprite_cells)
+        found = {}
+        for cell in self.get_cells(self.get_bounds(rect)):
+            sprites = self.cells.get(cell)
+            if sprites:
+                found.update(sprites)
+        return list(found)
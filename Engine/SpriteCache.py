@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class RotationCache:
+    """
+    Rotated images and their collision masks at quantized headings, so sprites look them up instead of calling
+    pygame.transform.rotate() and pygame.mask.from_surface() every tick.
+    Entries are built lazily. By default every quantized heading is kept, so a fighter circling forever never rotates
+    an image twice; with an explicit max_size, the least recently used ones are evicted once max_size entries are held.
+    """
+    caches = {}  # map from (image key, resolution, max_size) to RotationCache, shared by all engines in the process
+
+    def __init__(self, image, resolution, max_size=None):
+        """
+        :param image: the unrotated image
+        :param resolution: angular resolution in degrees. 0 disables quantization, and every heading is rotated exactly
+        :param max_size: maximum number of cached headings, None for all the round(360 / resolution) of them
+        """
+        self.image = image
+        self.resolution = resolution
+        self.max_size = max_size if max_size is not None else (round(360 / resolution) if resolution else 0)
+        self.entries = OrderedDict()  # map from quantized heading index to (rotated image, mask)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_cache(key, image, resolution, max_size=None):
+        """Return the cache shared by all sprites using the same image and settings."""
+        cache_key = (key, resolution, max_size)
+        if cache_key not in RotationCache.caches:
+            RotationCache.caches[cache_key] = RotationCache(image, resolution, max_size)
+        return RotationCache.caches[cache_key]
+
+    def get(self, heading):
+        """Return (rotated image, mask) for the heading, in degrees clockwise from the y-axis."""
+        if not self.resolution:
+            image_rotated = pygame.transform.rotate(self.image, -heading)
+            return image_rotated, pygame.mask.from_surface(image_rotated)
+
+        index = round(heading / self.resolution) % round(360 / self.resolution)
+        entry = self.entries.get(index)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(index)
+            return entry
+
+        self.misses += 1
+        image_rotated = pygame.transform.rotate(self.image, -index * self.resolution)
+        entry = (image_rotated, pygame.mask.from_surface(image_rotated))
+        self.entries[index] = entry
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return entry
+
+    def prewarm(self):
+        """Build every entry up front, e.g. at startup, up to max_size of them."""
+        if not self.resolution:
+            return
+        for index in range(min(round(360 / self.resolution), self.max_size)):
+            self.get(index * self.resolution)
@@ -4,20 +4,50 @@ import pygame
 import math
 import time
 
+import Engine.Assets as Assets
+from Engine.TextCache import TextCache
+
 class StatsBoard:
+    LAYER_SIZE = (600, 400)  # size of the board, centered on the screen
+
     def __init__(self, engine):
         self.engine = engine
-        self.up_arrow = pygame.image.load("images/up_arrow.png")
-        self.up_arrow = pygame.transform.scale(self.up_arrow, (70, 70))
-        self.left_arrow = pygame.image.load("images/left_turn.png")
-        self.left_arrow = pygame.transform.scale(self.left_arrow, (70, 70))
-        self.right_arrow = pygame.image.load("images/right_turn.png")
-        self.right_arrow = pygame.transform.scale(self.right_arrow, (70, 70))
+        self.up_arrow = Assets.load_image("images/up_arrow.png", (70, 70))
+        self.left_arrow = Assets.load_image("images/left_turn.png", (70, 70))
+        self.right_arrow = Assets.load_image("images/right_turn.png", (70, 70))
         self.font = engine.fonts["chakra-28-regular"]
         self.font_small = engine.fonts["chakra-22-regular"]
         self.label_font = engine.fonts["chakra-16-regular"]
+        self.text_cache = TextCache()  # rendered values, so a frame only renders the ones that changed
+        self.static_layer = None  # rendered on the first draw
 
-    def draw(self):
+    def get_rect(self):
+        screen_width, screen_height = self.engine.screen.get_size()
+        return pygame.Rect(screen_width // 2 - self.LAYER_SIZE[0] // 2, screen_height // 2 - 200, *self.LAYER_SIZE)
+
+    def draw_static(self, area=None, surface=None):
+        """
+        Draw the labels, speedometer dials and divider, which never change, so they are rendered once into a layer.
+        :param area: optional screen rect to limit the drawing to
+        :param surface: surface to draw on, the screen by default
+        :return: the rect drawn
+        """
+        if surface is None:
+            surface = self.engine.screen
+        rect = self.get_rect()
+        if self.static_layer is None:
+            center_x = rect.centerx
+            self.static_layer = self.render_static_layer(center_x, rect.top, center_x - 150, center_x + 150)
+        if area is None:
+            return surface.blit(self.static_layer, rect)
+        area = area.clip(rect)
+        return surface.blit(self.static_layer, area, area.move(-rect.left, -rect.top))
+
+    def draw(self, static=True):
+        """
+        Draw the board. The static parts can be left out when they are already on the screen.
+        :return: the rects drawn
+        """
         # Get screen dimensions and calculate the center area
         screen_width, screen_height = self.engine.screen.get_size()
         center_x = screen_width // 2
@@ -27,49 +57,68 @@ class StatsBoard:
         left_center_x = center_x - 150
         right_center_x = center_x + 150
 
-        # Draw labels for jetfighter and propfighter
-        jetfighter_label_surface = self.font.render("Jet-fighter", True, (255, 255, 255))
-        propfighter_label_surface = self.font.render("Prop-fighter", True, (255, 255, 255))
-
-        # Position labels
-        self.engine.screen.blit(jetfighter_label_surface, (left_center_x - jetfighter_label_surface.get_width() // 2, top_y + 20))
-        self.engine.screen.blit(propfighter_label_surface, (right_center_x - propfighter_label_surface.get_width() // 2, top_y + 20))
+        rects = []
+        if static:
+            rects.append(self.draw_static())
 
         # Draw left column widgets (jetfighter)
-        self.draw_speedometer(left_center_x - 50, top_y + 80, self.engine.jetfighter)  # Adjusted for label height
-        self.draw_heading(left_center_x, top_y + 200, self.engine.jetfighter)
-        self.draw_operation_state(left_center_x, top_y + 250, self.engine.jetfighter)
-        self.draw_ammo(left_center_x, top_y + 340, self.engine.jetfighter)
-
-        # Draw divider
-        pygame.draw.rect(self.engine.screen, (255, 255, 255), (center_x - 1, top_y, 3, 400))
+        rects += self.draw_speedometer(left_center_x - 50, top_y + 80, self.engine.jetfighter)  # Adjusted for label height
+        rects.append(self.draw_heading(left_center_x, top_y + 200, self.engine.jetfighter))
+        rects.append(self.draw_operation_state(left_center_x, top_y + 250, self.engine.jetfighter))
+        rects.append(self.draw_ammo(left_center_x, top_y + 340, self.engine.jetfighter))
 
         # Draw right column widgets (propfighter)
-        self.draw_speedometer(right_center_x - 50, top_y + 80, self.engine.propfighter)  # Adjusted for label height
-        self.draw_heading(right_center_x, top_y + 200, self.engine.propfighter)
-        self.draw_operation_state(right_center_x, top_y + 250, self.engine.propfighter)
-        self.draw_timer(right_center_x, top_y + 340)
+        rects += self.draw_speedometer(right_center_x - 50, top_y + 80, self.engine.propfighter)  # Adjusted for label height
+        rects.append(self.draw_heading(right_center_x, top_y + 200, self.engine.propfighter))
+        rects.append(self.draw_operation_state(right_center_x, top_y + 250, self.engine.propfighter))
+        rects.append(self.draw_timer(right_center_x, top_y + 340))
+        return rects
+
+    def render_static_layer(self, center_x, top_y, left_center_x, right_center_x):
+        # Transparent white, so the antialiased edges of the white text blend like on the screen
+        layer = pygame.Surface(self.LAYER_SIZE, pygame.SRCALPHA)
+        layer.fill((255, 255, 255, 0))
+        origin_x = center_x - self.LAYER_SIZE[0] // 2
+
+        # Labels for jetfighter and propfighter
+        jetfighter_label_surface = self.font.render("Jet-fighter", True, (255, 255, 255))
+        propfighter_label_surface = self.font.render("Prop-fighter", True, (255, 255, 255))
+        layer.blit(jetfighter_label_surface, (left_center_x - jetfighter_label_surface.get_width() // 2 - origin_x, 20))
+        layer.blit(propfighter_label_surface, (right_center_x - propfighter_label_surface.get_width() // 2 - origin_x, 20))
+
+        # Speedometer dials
+        self.draw_speedometer_dial(layer, left_center_x - 50 - origin_x, 80, self.engine.jetfighter)
+        self.draw_speedometer_dial(layer, right_center_x - 50 - origin_x, 80, self.engine.propfighter)
+
+        # Divider
+        pygame.draw.rect(layer, (255, 255, 255), (center_x - 1 - origin_x, 0, 3, 400))
+        layer = Assets.convert(layer)
+        # The layer is mostly transparent, which run-length encoding skips over when blitting
+        layer.set_alpha(255, pygame.RLEACCEL)
+        return layer
+
+    def draw_speedometer_dial(self, surface, x, y, fighter):
+        # Static part of the speedometer: the outer circle and the min and max speed labels
+        radius = 50
+        center = (x + radius, y + radius)
+        pygame.draw.circle(surface, (255, 255, 255), center, radius, 2)
+
+        min_label_surface = self.label_font.render(f"{int(fighter.min_speed)}", True, (255, 255, 255))
+        max_label_surface = self.label_font.render(f"{int(fighter.top_speed)}", True, (255, 255, 255))
+        surface.blit(min_label_surface, (center[0] - radius - min_label_surface.get_width() // 2, center[1] - min_label_surface.get_height() // 2))
+        surface.blit(max_label_surface, (center[0] + radius - max_label_surface.get_width() // 2, center[1] - max_label_surface.get_height() // 2))
 
     def draw_speedometer(self, x, y, fighter):
-        # Speedometer parameters
+        # Speedometer parameters. The dial is on the static layer.
         radius = 50
         center = (x + radius, y + radius)
         min_speed = fighter.min_speed
         max_speed = fighter.top_speed
         curr_speed = fighter.curr_speed
 
-        # Draw the outer circle
-        pygame.draw.circle(self.engine.screen, (255, 255, 255), center, radius, 2)
-
-        # Draw min and max speed labels
-        min_label_surface = self.label_font.render(f"{int(min_speed)}", True, (255, 255, 255))
-        max_label_surface = self.label_font.render(f"{int(max_speed)}", True, (255, 255, 255))
-        current_label_surface = self.label_font.render(f"{int(curr_speed)}", True, (255, 255, 255))
-
-        # Position labels
-        self.engine.screen.blit(min_label_surface, (center[0] - radius - min_label_surface.get_width() // 2, center[1] - min_label_surface.get_height() // 2))
-        self.engine.screen.blit(max_label_surface, (center[0] + radius - max_label_surface.get_width() // 2, center[1] - max_label_surface.get_height() // 2))
-        self.engine.screen.blit(current_label_surface, (center[0] - current_label_surface.get_width() // 2, center[1] - current_label_surface.get_height() // 2))
+        # Draw the current speed label
+        current_label_surface = self.text_cache.render(self.label_font, f"{int(curr_speed)}", (255, 255, 255))
+        label_rect = self.engine.screen.blit(current_label_surface, (center[0] - current_label_surface.get_width() // 2, center[1] - current_label_surface.get_height() // 2))
 
         # Calculate the angle for the needle
         if max_speed > min_speed:
@@ -84,12 +133,13 @@ class StatsBoard:
         needle_rad = math.radians(needle_angle)
         needle_x = center[0] - (radius - 10) * math.cos(needle_rad)
         needle_y = center[1] - (radius - 10) * math.sin(needle_rad)
-        pygame.draw.line(self.engine.screen, (255, 0, 0), center, (needle_x, needle_y), 4)  # Red needle
+        needle_rect = pygame.draw.line(self.engine.screen, (255, 0, 0), center, (needle_x, needle_y), 4)  # Red needle
+        return [label_rect, needle_rect]
 
     def draw_heading(self, center_x, y, fighter):
         heading_text = f"Heading: {int(fighter.heading)}°"
-        text_surface = self.font_small.render(heading_text, True, (255, 255, 255))
-        self.engine.screen.blit(text_surface, (center_x - text_surface.get_width() // 2, y))
+        text_surface = self.text_cache.render(self.font_small, heading_text, (255, 255, 255))
+        return self.engine.screen.blit(text_surface, (center_x - text_surface.get_width() // 2, y))
 
     def draw_operation_state(self, center_x, y, fighter):
         image = self.up_arrow
@@ -99,28 +149,25 @@ class StatsBoard:
             image = self.left_arrow
         elif fighter.turning == 1:
             image = self.right_arrow
-        self.engine.screen.blit(image, (center_x - image.get_width() // 2, y))
+        return self.engine.screen.blit(image, (center_x - image.get_width() // 2, y))
 
     def draw_ammo(self, center_x, y, fighter):
         ammo_text = f"Ammo: {fighter.curr_ammo} / {fighter.max_ammo}"
         color = (255, 255, 255)
         if fighter.curr_ammo == 0:
             color = (255, 0, 0)
-        text_surface = self.font_small.render(ammo_text, True, color)
-        self.engine.screen.blit(text_surface, (center_x - text_surface.get_width() // 2, y))
+        text_surface = self.text_cache.render(self.font_small, ammo_text, color)
+        return self.engine.screen.blit(text_surface, (center_x - text_surface.get_width() // 2, y))
 
     def draw_timer(self, center_x, y):
         # Calculate elapsed time
-        if self.engine.end_ts > 0:
-            elapsed_time = self.engine.end_ts - self.engine.start_ts
-        else:
-            elapsed_time = time.time() - self.engine.start_ts
+        elapsed_time = self.engine.get_game_time()
         hours, remainder = divmod(int(elapsed_time), 3600)
         minutes, seconds = divmod(remainder, 60)
 
         # Format the timer as HH:MM:SS
         timer_text = f"{hours:02}:{minutes:02}:{seconds:02}"
-        timer_surface = self.font_small.render(timer_text, True, (255, 255, 255))
+        timer_surface = self.text_cache.render(self.font_small, timer_text, (255, 255, 255))
 
         # Position the timer
-        self.engine.screen.blit(timer_surface, (center_x - timer_surface.get_width() // 2, y))
+        return self.engine.screen.blit(timer_surface, (center_x - timer_surface.get_width() // 2, y))
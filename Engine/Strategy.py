@@ -7,9 +7,36 @@ class Strategy:
     GO_STRAIGHT = 5
     FIRE_AMMO = 6
 
+    # False when the strategy plays headless matches, where the engine waits for every decision instead of moving on
+    # every tick. Strategies limiting their work by the clock should limit it by a fixed amount of work then, so seeded
+    # matches are reproducible. Set by Engine.set_strategy_obj() and Engine.set_opponent_obj().
+    realtime = True
+
     def __init__(self):
         pass
 
+    def decide(self, snapshot):
+        """
+        Entry point called by the engine every tick with the immutable game state of the latest tick.
+
+        By default, this converts the snapshot into the dictionaries described in decision() and calls it. Strategies
+        can override this method instead of decision() to read the snapshot directly, which avoids building the
+        dictionaries every tick.
+
+        Args:
+            snapshot (GameSnapshot): The game state at the end of engine tick snapshot.tick. It has the attributes
+                                     jetfighter and propfighter (FighterState), obstacle (ObstacleState) and bullets
+                                     (tuple of BulletState), with the same fields as the dictionaries of decision().
+
+        Returns:
+            int: One of the command values described in decision().
+        """
+        return self.decision(seq=snapshot.tick, **snapshot.as_dicts())
+
+    def close(self):
+        """Called by the engine before the program exits, to release any resources held by the strategy."""
+        pass
+
     def decision(
             self,
             seq: int,
@@ -0,0 +1,306 @@
+"""
+Parameter sweeps for strategies. A configuration is a dictionary of keyword arguments of the strategy factory, and it
+is scored by playing headless matches with Tournament.run_match() over a process pool:
+
+    from Engine.Sweep import grid, random_configs, sweep, successive_halving, format_sweep
+
+    configs = grid({"fire_threshold": [0.3, 0.5, 0.7], "max_nodes": [320, 640, 1280]})
+    results = sweep(SearchStrategy, configs, games=200)
+    configs = random_configs({"fire_threshold": (0.2, 0.9), "macro_ticks": [4, 8, 12]}, 30, seed=1)
+    results = successive_halving(SearchStrategy, configs, min_games=16, max_games=256)
+    print(format_sweep(results))
+
+Every configuration plays the same seeds, seed to seed + games - 1, so they are compared on the same matches. Each
+match result is cached on disk, keyed by a hash of the strategy, the parameters, the match settings and the source
+code of the engine and the strategy, so an interrupted or extended sweep only plays the matches it has not played yet,
+and editing the code starts over. Configurations are scored by the jetfighter win rate, then by how fast the
+propfighter goes down.
+
+Both the comparison and the cache take a match to be a function of its seed, so the strategies must be deterministic
+in headless matches: a strategy limiting its work by the clock plays differently with the load of the pool, and its
+cached results only hold for the load they were played under. Strategies see Strategy.realtime cleared in headless
+matches, and should limit their work by a fixed amount then, like the max_nodes of SearchStrategy, whose time budget
+has no effect there.
+"""
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import Engine.Tournament as Tournament
+
+CACHE_DIR = os.path.join(".cache", "sweep")  # relative to the working directory, like the assets
+
+
+def grid(space):
+    """
+    Return every combination of the values of a parameter space, as a list of dictionaries.
+    :param space: map from parameter name to the list of its values
+    """
+    configs = [{}]
+    for name, values in space.items():
+        configs = [dict(config, **{name: value}) for config in configs for value in values]
+    return configs
+
+
+def random_configs(space, count, seed=None):
+    """
+    Draw configurations at random from a parameter space.
+    :param space: map from parameter name to a list of values to choose from, or to a (low, high) tuple to draw from
+                  uniformly, as integers if both ends are integers
+    :param count: number of configurations, duplicates are dropped
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(count):
+        config = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def get_name(factory):
+    return f"{factory.__module__}.{factory.__qualname__}" if factory is not None else ""
+
+
+def get_code_version(*factories):
+    """Hash of the source of the engine and of the modules defining the factories."""
+    paths = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "*.py")))
+    for factory in factories:
+        if factory is not None:
+            try:
+                paths.append(inspect.getsourcefile(factory))
+            except TypeError:
+                pass  # Built-in or dynamically created, only its name is part of the key
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """Match results on disk, one JSON file per configuration, mapping the seeds played to their results."""
+
+    def __init__(self, cache_dir, strategy_factory, opponent_factory, max_ticks):
+        self.cache_dir = cache_dir
+        self.prefix = {
+            "strategy": get_name(strategy_factory),
+            "opponent": get_name(opponent_factory),
+            "max_ticks": max_ticks,
+            "code_version": get_code_version(strategy_factory, opponent_factory),
+        }
+
+    def get_path(self, params):
+        key = json.dumps(dict(self.prefix, params=params), sort_keys=True, default=repr)
+        return os.path.join(self.cache_dir, f"{hashlib.sha1(key.encode()).hexdigest()[:20]}.json")
+
+    def load(self, params):
+        """Return the map from seed to match result of a configuration."""
+        if self.cache_dir is None:
+            return {}
+        try:
+            with open(self.get_path(params)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {int(seed): result for seed, result in data["results"].items()}
+
+    def save(self, params, results):
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(params)
+        # Write to a temporary file first, so an interrupted sweep never leaves half a file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(dict(self.prefix, params=params, results=results), file, default=repr)
+        os.replace(temp_path, path)
+
+
+def _run_config_match(task):
+    index, strategy_factory, params, opponent_factory, seed, max_ticks = task
+    return index, Tournament.run_match(functools.partial(strategy_factory, **params), opponent_factory, seed,
+                                       max_ticks)
+
+
+class Evaluator:
+    """Plays the matches of configurations that are not cached yet over a process pool, kept for the whole sweep."""
+    SAVE_INTERVAL = 10.0  # secs between saves of the results to the cache while matches are played
+
+    def __init__(self, strategy_factory, opponent_factory=None, workers=None, seed=0, max_ticks=None,
+                 cache_dir=CACHE_DIR):
+        self.strategy_factory = strategy_factory
+        self.opponent_factory = opponent_factory
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.cache = ResultCache(cache_dir, strategy_factory, opponent_factory, max_ticks)
+        self.results = {}  # map from the parameters as JSON to the map from seed to match result
+        self.pool = None
+        self.matches_played = 0
+        self.matches_reused = 0  # matches found in the cache or played in an earlier round
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.pool = multiprocessing.Pool(self.workers)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def evaluate(self, configs, games):
+        """
+        Return the results of the first games seeds of every configuration, as a list of lists of match dictionaries.
+        """
+        seeds = range(self.seed, self.seed + games)
+        results = []
+        for params in configs:
+            key = json.dumps(params, sort_keys=True, default=repr)
+            if key not in self.results:
+                self.results[key] = self.cache.load(params)
+            results.append(self.results[key])
+        tasks = [(i, self.strategy_factory, params, self.opponent_factory, seed, self.max_ticks)
+                 for i, params in enumerate(configs) for seed in seeds if seed not in results[i]]
+        self.matches_reused += len(configs) * games - len(tasks)
+        self.matches_played += len(tasks)
+
+        if tasks:
+            if self.pool is None:
+                done = map(_run_config_match, tasks)
+            else:
+                # Small chunks, as matches of different configurations can take very different times
+                chunksize = max(1, len(tasks) // (self.workers * 8))
+                done = self.pool.imap_unordered(_run_config_match, tasks, chunksize)
+            unsaved = set()
+            save_ts = time.perf_counter()
+            for i, result in done:
+                results[i][result["seed"]] = result
+                unsaved.add(i)
+                # Saved now and then, so an interrupted sweep keeps most of its matches
+                if time.perf_counter() - save_ts > self.SAVE_INTERVAL:
+                    self.save(configs, results, unsaved)
+                    save_ts = time.perf_counter()
+            self.save(configs, results, unsaved)
+        return [[results[i][seed] for seed in seeds] for i in range(len(configs))]
+
+    def save(self, configs, results, indices):
+        for i in indices:
+            self.cache.save(configs[i], {str(seed): result for seed, result in sorted(results[i].items())})
+        indices.clear()
+
+
+def score(summary):
+    """Sort key of a configuration's summary, higher is better."""
+    return summary["jetfighter_win_rate"], -summary["mean_survival_secs"]
+
+
+def make_entry(params, results, stopped):
+    summary = Tournament.summarize(results)
+    return {"params": params, "summary": summary, "games": len(results), "stopped": stopped}
+
+
+def sweep(strategy_factory, configs, games=100, rounds=4, early_stop=True, opponent_factory=None, workers=None,
+          seed=0, max_ticks=None, cache_dir=CACHE_DIR, verbose=True):
+    """
+    Evaluate configurations on games matches each, such as the ones of grid() or random_configs().
+    :param strategy_factory: picklable callable (usually a Strategy subclass) taking the parameters as keywords
+    :param rounds: the matches are played in this many rounds, so hopeless configurations can be stopped early
+    :param early_stop: after each round, stop the configurations whose 95% confidence interval of the win rate lies
+                       entirely below the one of the best configuration
+    :param cache_dir: directory of the result cache, or None to not cache
+    :return: one dictionary per configuration, best first, with its params, the Tournament.summarize() summary, the
+             number of games played and whether it was stopped early
+    """
+    entries = [None] * len(configs)
+    active = list(range(len(configs)))
+    with Evaluator(strategy_factory, opponent_factory, workers, seed, max_ticks, cache_dir) as evaluator:
+        for round_index in range(1, rounds + 1):
+            round_games = math.ceil(games * round_index / rounds)
+            start_ts = time.perf_counter()
+            results = evaluator.evaluate([configs[i] for i in active], round_games)
+            for i, config_results in zip(active, results):
+                entries[i] = make_entry(configs[i], config_results, False)
+            if round_index < rounds and early_stop:
+                best_low = max(entries[i]["summary"]["jetfighter_win_rate_ci"][0] for i in active)
+                hopeless = [i for i in active if entries[i]["summary"]["jetfighter_win_rate_ci"][1] < best_low]
+                for i in hopeless:
+                    entries[i]["stopped"] = True
+                active = [i for i in active if i not in hopeless]
+            if verbose:
+                print(f"Round {round_index}/{rounds}: {len(results)} configurations on {round_games} games in "
+                      f"{time.perf_counter() - start_ts:.1f} secs, {len(active)} still running")
+        if verbose:
+            print_match_stats(evaluator)
+    return sorted(entries, key=lambda entry: (not entry["stopped"], score(entry["summary"])), reverse=True)
+
+
+def successive_halving(strategy_factory, configs, min_games=16, max_games=256, eta=2, opponent_factory=None,
+                       workers=None, seed=0, max_ticks=None, cache_dir=CACHE_DIR, verbose=True):
+    """
+    Evaluate all configurations on min_games matches, keep the best 1/eta of them, multiply their games by eta, and so
+    on until one configuration is left or max_games is reached. The games of a round include the ones of the round
+    before, which are not played again.
+    :return: like sweep(), the configurations dropped along the way marked as stopped
+    """
+    entries = [None] * len(configs)
+    active = list(range(len(configs)))
+    games = min_games
+    with Evaluator(strategy_factory, opponent_factory, workers, seed, max_ticks, cache_dir) as evaluator:
+        while True:
+            start_ts = time.perf_counter()
+            results = evaluator.evaluate([configs[i] for i in active], games)
+            for i, config_results in zip(active, results):
+                entries[i] = make_entry(configs[i], config_results, False)
+            count = len(active)
+            if len(active) > 1 and games < max_games:
+                active.sort(key=lambda i: score(entries[i]["summary"]), reverse=True)
+                for i in active[max(1, len(active) // eta):]:
+                    entries[i]["stopped"] = True
+                active = active[:max(1, len(active) // eta)]
+            if verbose:
+                print(f"{count} configurations on {games} games in {time.perf_counter() - start_ts:.1f} secs, "
+                      f"{len(active)} kept")
+            if len(active) == 1 or games >= max_games:
+                break
+            games = min(games * eta, max_games)
+        if verbose:
+            print_match_stats(evaluator)
+    return sorted(entries, key=lambda entry: (not entry["stopped"], entry["games"], score(entry["summary"])),
+                  reverse=True)
+
+
+def print_match_stats(evaluator):
+    print(f"{evaluator.matches_played} matches played, {evaluator.matches_reused} reused")
+
+
+def format_sweep(entries, top=None):
+    """Return a table of the configurations, best first."""
+    lines = []
+    for entry in entries[:top]:
+        summary = entry["summary"]
+        low, high = summary["jetfighter_win_rate_ci"]
+        params = ", ".join(f"{name}={value:.4g}" if isinstance(value, float) else f"{name}={value}"
+                           for name, value in entry["params"].items())
+        lines.append(f"{summary['jetfighter_win_rate']:6.1%} ({low:.1%} - {high:.1%}) on {entry['games']:4d} games, "
+                     f"survival {summary['mean_survival_secs']:5.1f} secs{' (stopped)' if entry['stopped'] else ''}: "
+                     f"{params}")
+    return "\n".join(lines)
@@ -0,0 +1,33 @@
+import collections
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces, keyed by (font, text, color, antialias), so text that does not change between
+    frames is rendered once instead of every frame.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.surfaces = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def render(self, font, text, color, antialias=True):
+        """Same as font.render(text, antialias, color), from the cache when possible. Do not draw on the result."""
+        key = (font, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # least recently used
+        return surface
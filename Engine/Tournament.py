@@ -0,0 +1,120 @@
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from Engine.Engine import Engine
+
+CAUSES = ("bullet_hit", "jet_obstacle", "prop_obstacle", "collision", "timeout")
+
+
+def run_match(strategy_factory, opponent_factory=None, seed=0, max_ticks=None, record_dir=None):
+    """
+    Play one headless match and return its result as a dictionary.
+    :param strategy_factory: picklable callable (usually a Strategy subclass) creating the jetfighter strategy
+    :param opponent_factory: optional picklable callable creating the Strategy flying the propfighter
+    :param seed: seed for the random module, so matches with randomized strategies can be replayed
+    :param max_ticks: optional cap on the number of ticks to simulate
+    :param record_dir: optional directory to record the match to, as match-<seed>.rec
+    """
+    random.seed(seed)
+    engine = Engine(headless=True)
+    engine.verbose = False
+    if record_dir is not None:
+        engine.start_recording(get_recording_path(record_dir, seed), seed)
+    engine.set_strategy_obj(strategy_factory())
+    if opponent_factory is not None:
+        engine.set_opponent_obj(opponent_factory())
+    result = engine.run_headless(max_ticks)
+    return {
+        "seed": seed,
+        "result": result,  # 1 for jetfighter victory, -1 for propfighter victory, 0 if cut short by max_ticks
+        "winner": {1: "jetfighter", -1: "propfighter"}.get(result, ""),
+        "cause": engine.ending_cause,
+        "survival_ticks": engine.ticks,
+        "shots_fired": engine.shots_fired,
+    }
+
+
+def get_recording_path(record_dir, seed):
+    return os.path.join(record_dir, f"match-{seed}.rec")
+
+
+def _run_match_task(task):
+    return run_match(*task)
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Return the Wilson score interval of a binomial proportion, 95% by default."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def summarize(results, tick=25):
+    """Gather match results into win rates with 95% confidence intervals and per-cause counts."""
+    games = len(results)
+    jet_wins = sum(1 for r in results if r["result"] == 1)
+    prop_wins = sum(1 for r in results if r["result"] == -1)
+    return {
+        "games": games,
+        "jetfighter_wins": jet_wins,
+        "propfighter_wins": prop_wins,
+        "jetfighter_win_rate": jet_wins / games if games else 0.0,
+        "jetfighter_win_rate_ci": wilson_interval(jet_wins, games),
+        "propfighter_win_rate": prop_wins / games if games else 0.0,
+        "propfighter_win_rate_ci": wilson_interval(prop_wins, games),
+        "causes": {cause: sum(1 for r in results if r["cause"] == cause) for cause in CAUSES},
+        "mean_survival_secs": sum(r["survival_ticks"] for r in results) * tick / 1000.0 / games if games else 0.0,
+        "mean_shots_fired": sum(r["shots_fired"] for r in results) / games if games else 0.0,
+    }
+
+
+def run_tournament(strategy_factory, opponent_factory=None, games=100, workers=None, seed=0, max_ticks=None,
+                   record_dir=None):
+    """
+    Fan headless matches out over a process pool. Each worker builds its own Engine per match.
+    :param games: number of matches, played with seeds seed, seed + 1, ..., seed + games - 1
+    :param workers: number of worker processes, one per CPU core by default
+    :param record_dir: optional directory to record every match to, see run_match()
+    :return: (summary, results), where results are the per-match dictionaries sorted by seed
+    """
+    workers = workers or os.cpu_count() or 1
+    if record_dir is not None:
+        os.makedirs(record_dir, exist_ok=True)
+    tasks = [(strategy_factory, opponent_factory, seed + i, max_ticks, record_dir) for i in range(games)]
+    start_ts = time.perf_counter()
+    if workers == 1:
+        results = [_run_match_task(task) for task in tasks]
+    else:
+        # Large chunks keep the inter-process traffic low, several chunks per worker keep the load balanced
+        chunksize = max(1, games // (workers * 4))
+        with multiprocessing.Pool(workers) as pool:
+            results = list(pool.imap_unordered(_run_match_task, tasks, chunksize))
+    elapsed = time.perf_counter() - start_ts
+    results.sort(key=lambda r: r["seed"])
+
+    summary = summarize(results)
+    summary["workers"] = workers
+    summary["elapsed_secs"] = elapsed
+    summary["games_per_sec"] = games / elapsed if elapsed > 0 else 0.0
+    return summary, results
+
+
+def format_summary(summary):
+    jet_low, jet_high = summary["jetfighter_win_rate_ci"]
+    lines = [
+        f"Games played: {summary['games']} on {summary['workers']} worker(s) in {summary['elapsed_secs']:.1f} secs "
+        f"({summary['games_per_sec']:.1f} games/sec)",
+        f"Jet-fighter won {summary['jetfighter_wins']} ({summary['jetfighter_win_rate']:.1%}, "
+        f"95% CI {jet_low:.1%} - {jet_high:.1%})",
+        f"Prop-fighter won {summary['propfighter_wins']} ({summary['propfighter_win_rate']:.1%})",
+        f"Mean survival: {summary['mean_survival_secs']:.1f} secs, mean shots fired: {summary['mean_shots_fired']:.1f}",
+        "Endings: " + ", ".join(f"{cause}={count}" for cause, count in summary["causes"].items()),
+    ]
+    return "\n".join(lines)
@@ -1,3 +1,5 @@
+import math
+
 import pygame
 
 def check_collision(sprite1, sprite2):
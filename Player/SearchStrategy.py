@@ -0,0 +1,189 @@
+import time
+
+import numpy as np
+
+import Engine.FiringSolver as FiringSolver
+import Engine.Prediction as Prediction
+from Engine.Bullet import Bullet
+from Engine.Fighter import JetFighter, PropFighter
+from Engine.Strategy import Strategy
+
+
+class SearchStrategy(Strategy):
+    """
+    Reference jetfighter strategy: a beam search over sequences of maneuvers on the engine's forward model
+    (Engine.Prediction), plus Engine.FiringSolver to decide when to fire.
+
+    Each maneuver holds one steering command for macro_ticks ticks. The search deepens one maneuver at a time, keeping
+    the beam_width best sequences, and stops when the next level would not fit in the time budget, so it is anytime:
+    it always answers with the first command of the best sequence of the deepest level it finished. In headless
+    matches, where the engine waits for every decision, it stops at max_nodes nodes instead, so a seeded match plays
+    the same whatever the load of the machine. Sequences that
+    fly into the obstacle or into the propfighter are penalized, and sequences are rewarded for keeping the
+    propfighter in front of the jetfighter, within bullet range.
+    """
+    ACTIONS = (Strategy.TURN_LEFT, Strategy.TURN_RIGHT, Strategy.GO_STRAIGHT, Strategy.ACCELERATE, Strategy.DECELERATE)
+    CRASH_PENALTY = -1000.0
+    OBSTACLE_MARGIN = 40.0  # pixels around the obstacle counted as a crash, about half the rotated jetfighter
+    COLLISION_DISTANCE = 70.0  # distance between the fighters counted as a collision
+    BULLET_RANGE = 1100.0  # pixels, a bit less than Bullet.MAX_DISTANCE as the target keeps moving
+    DISCOUNT = 0.9  # per maneuver, so rewards that come sooner count more
+
+    def __init__(self, budget=8.0, max_nodes=640, macro_ticks=8, beam_width=24, max_depth=10, fire_threshold=0.5,
+                 verbose=True):
+        """
+        :param budget: msecs per decision. It is well below the 25 msecs tick, as the decision thread shares the
+                       interpreter with the main loop, which can hold it for several msecs in the middle of a search.
+                       Strategies run with ProcessStrategy have the interpreter to themselves and can use about 15.
+        :param max_nodes: nodes expanded per decision in headless matches, in place of the time budget. The default is
+                          about what 8 msecs expand on a desktop CPU. None searches every level up to max_depth.
+        :param macro_ticks: ticks each maneuver of a sequence lasts
+        :param beam_width: number of sequences kept at each depth
+        :param max_depth: maximum number of maneuvers per sequence
+        :param fire_threshold: hit probability from the firing solver above which the jetfighter fires
+        :param verbose: print the search statistics when the strategy is closed
+        """
+        super().__init__()
+        self.budget = budget
+        self.max_nodes = max_nodes
+        self.macro_ticks = macro_ticks
+        self.beam_width = beam_width
+        self.max_depth = max_depth
+        self.fire_threshold = fire_threshold
+        self.verbose = verbose
+        self.prev_fire_tick = None  # tick of the snapshot the last FIRE_AMMO was decided on
+        FiringSolver.get_shapes()  # built now, so the first decision is not late
+
+        # Throughput statistics, see get_stats()
+        self.decisions = 0
+        self.nodes_expanded = 0
+        self.search_secs = 0.0
+        self.total_depth = 0
+
+    def decide(self, snapshot):
+        start = time.perf_counter()
+        deadline = start + self.budget / 1000.0 if self.realtime else None
+
+        if self.can_fire(snapshot):
+            solution = FiringSolver.solve(snapshot, delays=0)
+            if solution.probability[0] >= self.fire_threshold:
+                self.prev_fire_tick = snapshot.tick
+                return Strategy.FIRE_AMMO
+
+        cmd = self.search(snapshot, deadline)
+        self.decisions += 1
+        self.search_secs += time.perf_counter() - start
+        return cmd
+
+    def can_fire(self, snapshot):
+        jet = snapshot.jetfighter
+        if jet.curr_ammo <= 0:
+            return False
+        if self.prev_fire_tick is None or snapshot.tick < self.prev_fire_tick:
+            return True
+        return (snapshot.tick - self.prev_fire_tick) * Prediction.TICK / 1000.0 >= jet.ammo_fire_delay
+
+    def search(self, snapshot, deadline):
+        jet = snapshot.jetfighter
+        prop = snapshot.propfighter
+        obstacle = snapshot.obstacle
+        actions = np.array(self.ACTIONS)
+        horizon = self.max_depth * self.macro_ticks
+
+        # The propfighter is assumed to hold its course, far enough ahead to lead it by a bullet's flight time
+        lead_ticks = int(self.BULLET_RANGE / Bullet.SPEED * 1000.0 / Prediction.TICK)
+        prop_x, prop_y, _ = FiringSolver.predict_constant_turn(
+            np.array([prop.x]), np.array([prop.y]), np.array([prop.heading]), np.array([prop.curr_speed]),
+            np.array([prop.turning]), PropFighter.SPECS["turn_speed"], horizon + lead_ticks)
+        prop_x, prop_y = prop_x[0], prop_y[0]
+
+        # Beam of sequences, as arrays of their end states
+        x, y = np.array([jet.x]), np.array([jet.y])
+        heading, speed = np.array([jet.heading]), np.array([float(jet.curr_speed)])
+        turning = np.array([jet.turning])
+        first_action = np.array([Strategy.NOOP])
+        score = np.zeros(1)
+        alive = np.ones(1, dtype=bool)
+
+        best = Strategy.NOOP
+        depth = 0
+        nodes = 0
+        level_secs = 0.0
+        while depth < self.max_depth:
+            count = len(x) * len(actions)
+            if deadline is None:
+                if self.max_nodes is not None and nodes + count > self.max_nodes:
+                    break
+            # A level is only started if it should finish in time, with a margin for the other threads taking the CPU
+            elif time.perf_counter() + 1.5 * level_secs >= deadline:
+                break
+            level_start = time.perf_counter()
+            nodes += count
+            commands = np.repeat(np.tile(actions, len(x))[:, None], self.macro_ticks, axis=1)
+            trajectory = Prediction.predict_fighters(np.repeat(x, len(actions)), np.repeat(y, len(actions)),
+                                                     np.repeat(heading, len(actions)), np.repeat(speed, len(actions)),
+                                                     np.repeat(turning, len(actions)), commands, JetFighter.SPECS)
+            self.nodes_expanded += count
+            first_action = np.tile(actions, len(x)) if depth == 0 else np.repeat(first_action, len(actions))
+            score = np.repeat(score, len(actions))
+            alive = np.repeat(alive, len(actions))
+
+            # Crashes into the obstacle or the propfighter anywhere along the maneuver
+            ticks = depth * self.macro_ticks + np.arange(self.macro_ticks)
+            crashed = ((trajectory.x > obstacle.x - self.OBSTACLE_MARGIN) &
+                       (trajectory.x < obstacle.x + obstacle.width + self.OBSTACLE_MARGIN) &
+                       (trajectory.y > obstacle.y - self.OBSTACLE_MARGIN) &
+                       (trajectory.y < obstacle.y + obstacle.height + self.OBSTACLE_MARGIN))
+            dx, dy = self.torus_offsets(prop_x[ticks] - trajectory.x, prop_y[ticks] - trajectory.y)
+            crashed |= dx * dx + dy * dy < self.COLLISION_DISTANCE ** 2
+            crashed = crashed.any(axis=1)
+            # Crashing later is less bad, so the search still prefers the longest escape when every sequence crashes
+            score += np.where(alive & crashed, self.CRASH_PENALTY * (1.0 - depth / self.max_depth), 0.0)
+            alive &= ~crashed
+
+            # Aim at where the propfighter will be when a bullet fired at the end of the maneuver gets there
+            end_x, end_y, end_heading = trajectory.x[:, -1], trajectory.y[:, -1], trajectory.heading[:, -1]
+            end_tick = ticks[-1]
+            dx, dy = self.torus_offsets(prop_x[end_tick] - end_x, prop_y[end_tick] - end_y)
+            lead = (np.hypot(dx, dy) / Bullet.SPEED * 1000.0 / Prediction.TICK).astype(np.int64)
+            target = end_tick + np.minimum(lead, lead_ticks)
+            dx, dy = self.torus_offsets(prop_x[target] - end_x, prop_y[target] - end_y)
+            distance = np.hypot(dx, dy)
+            bearing = np.degrees(np.arctan2(dx, -dy))  # clockwise from the y-axis, like the headings
+            aim = np.cos(np.radians(bearing - end_heading))
+            reward = np.where(distance < self.BULLET_RANGE, aim, 0.5 * aim)
+            score += np.where(alive, reward * self.DISCOUNT ** depth, 0.0)
+
+            # Keep the best sequences
+            keep = np.argsort(-score, kind="stable")[:self.beam_width]
+            x, y = trajectory.x[keep, -1], trajectory.y[keep, -1]
+            heading, speed = trajectory.heading[keep, -1], trajectory.speed[keep, -1]
+            turning = trajectory.turning[keep, -1]
+            first_action, score, alive = first_action[keep], score[keep], alive[keep]
+            best = int(first_action[0])
+            depth += 1
+            level_secs = time.perf_counter() - level_start
+
+        self.total_depth += depth
+        return best
+
+    @staticmethod
+    def torus_offsets(dx, dy):
+        # Shortest offsets over the wrap-around images
+        width, height = Prediction.SCREEN_WIDTH, Prediction.SCREEN_HEIGHT
+        return np.mod(dx + width / 2, width) - width / 2, np.mod(dy + height / 2, height) - height / 2
+
+    def get_stats(self):
+        """Return the search throughput: decisions made, nodes expanded, nodes per second and mean search depth."""
+        return {
+            "decisions": self.decisions,
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_per_sec": self.nodes_expanded / self.search_secs if self.search_secs > 0 else 0.0,
+            "mean_depth": self.total_depth / self.decisions if self.decisions else 0.0,
+        }
+
+    def close(self):
+        if self.verbose and self.decisions:
+            stats = self.get_stats()
+            print(f"Search: {stats['decisions']} decisions, {stats['nodes_expanded']} nodes expanded, "
+                  f"{stats['nodes_per_sec']:.0f} nodes/sec, mean depth {stats['mean_depth']:.1f}")
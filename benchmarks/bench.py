@@ -0,0 +1,336 @@
+"""
+Benchmarks of the engine's hot paths. Run from the repository root:
+
+    python -m benchmarks.bench --output results.json
+    python -m benchmarks.bench --output new.json --compare results.json --threshold 10
+
+Every benchmark reports the time of one call in microseconds, as the best and the median of several runs. With
+--compare, the best times are compared against an earlier results file, and the exit status is 1 if any benchmark got
+slower by more than the threshold percentage.
+"""
+import os
+
+# Benchmarks run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import functools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pygame
+
+import Engine.Env as Env
+import Engine.FiringSolver as FiringSolver
+import Engine.Prediction as Prediction
+import Engine.Utils as Utils
+from Engine.Bullet import Bullet
+from Engine.Engine import Engine
+from Engine.Strategy import Strategy
+
+benchmarks = {}  # map from benchmark name to a function building the callable to time
+
+
+def benchmark(name):
+    def register(setup):
+        benchmarks[name] = setup
+        return setup
+    return register
+
+
+_engine = None
+
+
+def get_engine():
+    # One windowed engine is shared by the benchmarks, each of them resets the state it uses
+    global _engine
+    if _engine is None:
+        _engine = Engine()
+        _engine.verbose = False
+    return _engine
+
+
+def add_bullets(engine, count, seed=0):
+    """Fill the engine with bullets spread over the screen, away from the obstacle and the fighters."""
+    rng = random.Random(seed)
+    for bullet in list(engine.bullets):
+        bullet.kill()
+    bullets = []
+    while len(bullets) < count:
+        x, y = rng.uniform(0, engine.screen_width), rng.uniform(0, engine.screen_height)
+        if engine.obstacle.rect.inflate(100, 100).collidepoint(x, y):
+            continue
+        bullet = Bullet(engine, x, y, rng.uniform(0, 360))
+        engine.bullets.add(bullet)
+        engine.bullet_hash.update(bullet)
+        bullets.append(bullet)
+    return bullets
+
+
+def reset_fighter(fighter, x, y, heading=45.0):
+    fighter.x, fighter.y, fighter.heading = x, y, heading
+    fighter.turning = 1
+    fighter.killed = False
+    fighter.update_image()
+
+
+@benchmark("fighter_update")
+def bench_fighter_update():
+    fighter = get_engine().jetfighter
+
+    def run():
+        reset_fighter(fighter, 300.0, 300.0)
+        fighter.update()
+    return run
+
+
+@benchmark("fighter_update_wrapped")
+def bench_fighter_update_wrapped():
+    engine = get_engine()
+    fighter = engine.jetfighter
+
+    def run():
+        # Straddling the top left corner, so the wrapped mask is built
+        reset_fighter(fighter, 10.0, 10.0)
+        fighter.update()
+    return run
+
+
+@benchmark("fighter_draw")
+def bench_fighter_draw():
+    fighter = get_engine().jetfighter
+    reset_fighter(fighter, 300.0, 300.0)
+    return fighter.draw
+
+
+@benchmark("fighter_draw_wrapped")
+def bench_fighter_draw_wrapped():
+    fighter = get_engine().jetfighter
+    reset_fighter(fighter, 10.0, 10.0)
+    return fighter.draw
+
+
+def bench_bullet_update(count):
+    engine = get_engine()
+    bullets = add_bullets(engine, count)
+    positions = [(bullet.x, bullet.y) for bullet in bullets]
+
+    def run():
+        # Every call moves the bullets by one tick from the same positions, so none of them reaches the obstacle or
+        # its maximum distance
+        for bullet, (x, y) in zip(bullets, positions):
+            bullet.x, bullet.y = x, y
+            bullet.distance_traveled = 0
+            bullet.update()
+    return run
+
+
+for count in (1, 10, 50, 500):
+    benchmark(f"bullet_update_{count}")(functools.partial(bench_bullet_update, count))
+
+
+@benchmark("check_collision_with_group_50")
+def bench_check_collision_with_group():
+    engine = get_engine()
+    add_bullets(engine, 50)
+    reset_fighter(engine.propfighter, 1300.0, 1000.0)
+    group = engine.bullets
+
+    def run():
+        Utils.check_collision_with_group(engine.propfighter, group)
+    return run
+
+
+def bench_check_victory(count):
+    engine = get_engine()
+    add_bullets(engine, count)
+    reset_fighter(engine.jetfighter, 300.0, 300.0)
+    reset_fighter(engine.propfighter, 1300.0, 1000.0)
+    engine.ticks = 0
+    return engine.check_victory
+
+
+benchmark("check_victory")(functools.partial(bench_check_victory, 10))
+benchmark("check_victory_500")(functools.partial(bench_check_victory, 500))
+
+
+@benchmark("stats_board_draw")
+def bench_stats_board_draw():
+    engine = get_engine()
+    return engine.stats_board.draw
+
+
+@benchmark("decision_state")
+def bench_decision_state():
+    # The per-tick state the decision thread hands to a strategy: snapshot capture and the decision() dictionaries
+    engine = get_engine()
+    add_bullets(engine, 10)
+
+    def run():
+        engine.publish_snapshot()
+        engine.snapshot.as_dicts()
+    return run
+
+
+@benchmark("predict_jetfighter_100x40")
+def bench_predict_jetfighter():
+    # 100 candidate command sequences of 40 ticks, as a search strategy would evaluate every tick
+    engine = get_engine()
+    engine.publish_snapshot()
+    commands = np.random.default_rng(0).integers(Strategy.NOOP, Strategy.GO_STRAIGHT + 1, (100, 40))
+    return functools.partial(Prediction.predict_jetfighter, engine.snapshot, commands)
+
+
+@benchmark("firing_solution_20")
+def bench_firing_solution():
+    # Firing now and at each of the next 20 ticks, with the propfighter within range
+    engine = get_engine()
+    reset_fighter(engine.jetfighter, 300.0, 300.0, 135.0)
+    reset_fighter(engine.propfighter, 600.0, 1000.0, 270.0)
+    engine.publish_snapshot()
+    return functools.partial(FiringSolver.solve, engine.snapshot, 20)
+
+
+@benchmark("vector_env_step_256")
+def bench_vector_env_step():
+    # One tick of 256 matches with random commands, matches that end starting over
+    envs = Env.VectorEnv(256)
+    envs.reset(seed=0)
+    rng = np.random.default_rng(0)
+    return lambda: envs.step(rng.integers(Strategy.NOOP, Strategy.FIRE_AMMO + 1, envs.n))
+
+
+@benchmark("headless_tick")
+def bench_headless_tick():
+    state = {}
+
+    def new_engine():
+        random.seed(0)
+        engine = Engine(headless=True)
+        engine.verbose = False
+        engine.set_strategy_obj(Strategy())
+        engine.publish_snapshot()
+        state["engine"] = engine
+
+    new_engine()
+
+    def run():
+        engine = state["engine"]
+        # Fire and turn now and then, so there are bullets in flight
+        engine.handle_player_cmd(Strategy.FIRE_AMMO if engine.ticks % 40 == 0 else Strategy.TURN_RIGHT)
+        engine.update_battlefield()
+        engine.publish_snapshot()
+        if engine.check_victory() != 0:
+            new_engine()
+    return run
+
+
+def time_callable(run, repeat, min_time):
+    """Return the per-call times of repeat runs, in usecs. Each run loops for at least min_time secs."""
+    run()  # warm up the caches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    times = [elapsed / number * 1e6]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return number, times
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(names, repeat=5, min_time=0.2):
+    results = {}
+    for name in names:
+        number, times = time_callable(benchmarks[name](), repeat, min_time)
+        results[name] = {
+            "best_usecs": min(times),
+            "median_usecs": statistics.median(times),
+            "calls_per_run": number,
+            "runs": repeat,
+        }
+        print(f"{name:<32}{min(times):>12.2f} usecs (median {statistics.median(times):.2f})")
+    return {
+        "meta": {
+            "commit": get_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare best times against a baseline results file.
+    :param threshold: percentage of slowdown above which a benchmark counts as a regression
+    :return: names of the regressed benchmarks
+    """
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]["best_usecs"]
+        change = (result["best_usecs"] - old) / old * 100.0 if old > 0 else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<32}{old:>12.2f} -> {result['best_usecs']:>10.2f} usecs {change:>+8.1f}%"
+              + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the engine's hot paths")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="results JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="slowdown in percent that counts as a regression (default: 10)")
+    parser.add_argument("--filter", default="", help="only run the benchmarks whose name contains this string")
+    parser.add_argument("--repeat", type=int, default=5, help="number of timed runs per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum secs per timed run")
+    args = parser.parse_args()
+
+    names = [name for name in benchmarks if args.filter in name]
+    results = run_benchmarks(names, args.repeat, args.min_time)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) slower by more than {args.threshold:g}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
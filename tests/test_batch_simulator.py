@@ -0,0 +1,80 @@
+"""
+BatchSimulator checked against headless Engine matches played with the same seeded random commands, so Env, VectorEnv
+and the sweeps built on the simulator stay tied to the real game.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from Engine.BatchSimulator import BatchSimulator
+from Engine.Engine import Engine
+from Engine.Strategy import Strategy
+
+MATCHES = 12
+# Past the one-minute time limit, so every match ends
+TICKS = 2500
+JET_COMMANDS = [Strategy.NOOP] * 4 + [Strategy.ACCELERATE, Strategy.DECELERATE, Strategy.TURN_LEFT,
+                                      Strategy.TURN_RIGHT, Strategy.GO_STRAIGHT] + [Strategy.FIRE_AMMO] * 2
+PROP_COMMANDS = [Strategy.NOOP] * 4 + [Strategy.ACCELERATE, Strategy.DECELERATE, Strategy.TURN_LEFT,
+                                       Strategy.TURN_RIGHT, Strategy.GO_STRAIGHT]
+
+
+class Scripted(Strategy):
+    """Plays a fixed command per tick."""
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def decide(self, snapshot):
+        return int(self.commands[snapshot.tick])
+
+
+def random_commands(rng, choices):
+    # Maneuvers held for a few ticks, so the fighters get around the battlefield instead of jittering in place
+    commands = []
+    while len(commands) < TICKS:
+        commands += [rng.choice(choices)] * rng.randint(1, 40)
+    return commands[:TICKS]
+
+
+def play_engine(jet_commands, prop_commands):
+    engine = Engine(headless=True)
+    engine.verbose = False
+    engine.set_strategy_obj(Scripted(jet_commands))
+    engine.set_opponent_obj(Scripted(prop_commands))
+    result = engine.run_headless()
+    return result, engine.ending_cause, engine.ticks, engine.shots_fired
+
+
+@pytest.fixture(scope="module")
+def commands():
+    rng = random.Random("batch")
+    jet = np.array([random_commands(rng, JET_COMMANDS) for _ in range(MATCHES)]).T
+    prop = np.array([random_commands(rng, PROP_COMMANDS) for _ in range(MATCHES)]).T
+    return jet, prop
+
+
+@pytest.fixture(scope="module")
+def simulator(commands):
+    jet, prop = commands
+    simulator = BatchSimulator(MATCHES)
+    for k in range(TICKS):
+        if not (simulator.result == 0).any():
+            break
+        simulator.step(jet[k], prop[k])
+    return simulator
+
+
+@pytest.mark.parametrize("match", range(MATCHES))
+def test_simulator_matches_engine(commands, simulator, match):
+    jet, prop = commands
+    expected = play_engine(jet[:, match], prop[:, match])
+    actual = (simulator.result[match], BatchSimulator.CAUSES[simulator.cause[match]], simulator.ticks[match],
+              simulator.shots_fired[match])
+    assert actual == expected, f"match {match}: simulator {actual}, engine {expected}"
+
+
+def test_matches_end_differently(simulator):
+    # The seeded matches cover more than one way of ending, or the comparison above proves little
+    assert len(set(simulator.cause)) > 2
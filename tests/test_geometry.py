@@ -0,0 +1,160 @@
+"""
+The polygon collision backend (Engine.Geometry) checked against the pixel masks of Utils.check_collision(), on seeded
+random poses of fighters, bullets and the obstacle, many of them straddling the screen edges and corners.
+"""
+import random
+
+import pygame
+import pytest
+
+import Engine.Geometry as Geometry
+import Engine.Utils as Utils
+from Engine.Bullet import Bullet
+from Engine.Engine import Engine
+
+# Pixels the backends may disagree by. A hitbox polygon can lie 1.5 pixels inside its mask, as it goes through the
+# centers of the outline pixels and is simplified by a pixel, so two of them can miss an overlap of 3 pixels.
+TOLERANCE = 3
+POSES = 400
+
+
+class MaskCopy(pygame.sprite.Sprite):
+    """A sprite's mask at its rect moved by an offset, for pygame.sprite.collide_mask()."""
+
+    def __init__(self, sprite, dx, dy):
+        super().__init__()
+        self.mask = sprite.mask
+        self.rect = sprite.rect.move(dx, dy)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    # The geometry engine keeps the plain masks of the fighters, the wrap-around is done by mask_collide() here
+    engine = Engine(headless=True, collision="geometry")
+    engine.verbose = False
+    return engine
+
+
+def shifts(engine):
+    return [(sx, sy) for sx in (0, -engine.screen_width, engine.screen_width)
+            for sy in (0, -engine.screen_height, engine.screen_height)]
+
+
+def mask_collide(engine, sprite1, sprite2, dx=0, dy=0):
+    """Pixel-mask collision on the wrapped-around screen, sprite2 moved by (dx, dy)."""
+    return any(Utils.check_collision(sprite1, MaskCopy(sprite2, sx + dx, sy + dy)) for sx, sy in shifts(engine))
+
+
+def near_boundary(engine, sprite1, sprite2, colliding):
+    # The pixel masks give the other answer when sprite2 is moved by a couple of pixels
+    return any(mask_collide(engine, sprite1, sprite2, dx, dy) != colliding
+               for dx in range(-TOLERANCE, TOLERANCE + 1) for dy in range(-TOLERANCE, TOLERANCE + 1))
+
+
+def outlines(mask):
+    # Full outline of every connected component of the mask, in mask pixel coordinates
+    return [component.outline() for component in mask.connected_components()]
+
+
+def inside(engine, sprite, point):
+    """
+    Whether the point lies within the outline of the sprite's mask, on any copy of the sprite, or within TOLERANCE of
+    one of its pixels. The hitboxes are solid within the outline, like the hollow wings of the propfighter image.
+    """
+    mask = sprite.mask
+    width, height = mask.get_size()
+    for sx, sy in shifts(engine):
+        x0 = point[0] + sx - sprite.rect.left
+        y0 = point[1] + sy - sprite.rect.top
+        if any(len(outline) > 2 and Geometry.point_in_polygon((x0, y0), outline) for outline in outlines(mask)):
+            return True
+        for x in range(int(x0) - TOLERANCE, int(x0) + TOLERANCE + 1):
+            for y in range(int(y0) - TOLERANCE, int(y0) + TOLERANCE + 1):
+                if 0 <= x < width and 0 <= y < height and mask.get_at((x, y)):
+                    return True
+    return False
+
+
+def random_position(engine, rng, straddle):
+    if not straddle:
+        return rng.uniform(0, engine.screen_width), rng.uniform(0, engine.screen_height)
+    # Within a fighter's half size of an edge, or of a corner
+    margin = 40
+    x = rng.choice([rng.uniform(0, margin), rng.uniform(engine.screen_width - margin, engine.screen_width),
+                    rng.uniform(0, engine.screen_width)])
+    y = rng.choice([rng.uniform(0, margin), rng.uniform(engine.screen_height - margin, engine.screen_height)])
+    if rng.random() < 0.5:
+        x, y = y * engine.screen_width / engine.screen_height, x * engine.screen_height / engine.screen_width
+    return x, y
+
+
+def place_fighter(engine, fighter, x, y, heading):
+    fighter.x, fighter.y, fighter.heading = x, y, heading
+    fighter.update_image()
+    return fighter
+
+
+def near(engine, rng, x, y, distance):
+    # A point around (x, y), wrapped back onto the screen
+    return (x + rng.uniform(-distance, distance)) % engine.screen_width, \
+           (y + rng.uniform(-distance, distance)) % engine.screen_height
+
+
+def make_pair(engine, rng, kind, straddle):
+    x, y = random_position(engine, rng, straddle)
+    if kind == "fighter-fighter":
+        sprite1 = place_fighter(engine, engine.jetfighter, x, y, rng.uniform(0, 360))
+        sprite2 = place_fighter(engine, engine.propfighter, *near(engine, rng, x, y, 90), rng.uniform(0, 360))
+    elif kind == "fighter-bullet":
+        fighter = rng.choice([engine.jetfighter, engine.propfighter])
+        sprite1 = place_fighter(engine, fighter, x, y, rng.uniform(0, 360))
+        sprite2 = Bullet(engine, *near(engine, rng, x, y, 50), rng.uniform(0, 360))
+    elif kind == "fighter-obstacle":
+        rect = engine.obstacle.rect
+        x, y = rng.choice([(rect.left, rng.uniform(rect.top, rect.bottom)),
+                           (rng.uniform(rect.left, rect.right), rect.bottom)])
+        fighter = rng.choice([engine.jetfighter, engine.propfighter])
+        sprite1 = place_fighter(engine, fighter, *near(engine, rng, x, y, 45), rng.uniform(0, 360))
+        sprite2 = engine.obstacle
+    else:
+        rect = engine.obstacle.rect
+        x, y = rng.choice([(rng.uniform(rect.left, rect.right), rect.top),
+                           (rect.right, rng.uniform(rect.top, rect.bottom))])
+        sprite1 = engine.obstacle
+        sprite2 = Bullet(engine, *near(engine, rng, x, y, 15), rng.uniform(0, 360))
+    return sprite1, sprite2
+
+
+# The obstacle is in the middle of the screen, so only the moving sprites straddle the edges
+@pytest.mark.parametrize("kind, straddle", [("fighter-fighter", False), ("fighter-fighter", True),
+                                            ("fighter-bullet", False), ("fighter-bullet", True),
+                                            ("fighter-obstacle", False), ("bullet-obstacle", False)])
+def test_collide_matches_masks(engine, kind, straddle):
+    rng = random.Random(f"{kind}-{straddle}")
+    hits = 0
+    for _ in range(POSES):
+        sprite1, sprite2 = make_pair(engine, rng, kind, straddle)
+        colliding = mask_collide(engine, sprite1, sprite2)
+        contact = Geometry.collide(sprite1, sprite2, engine.screen_width, engine.screen_height)
+        if (contact is not None) != colliding:
+            assert near_boundary(engine, sprite1, sprite2, colliding), \
+                f"{kind} at {sprite1.rect} and {sprite2.rect}: masks {colliding}, geometry {contact}"
+        if contact is not None:
+            hits += 1
+            assert 0 <= contact[0] < engine.screen_width and 0 <= contact[1] < engine.screen_height
+            assert inside(engine, sprite1, contact) and inside(engine, sprite2, contact), \
+                f"{kind} at {sprite1.rect} and {sprite2.rect}: contact {contact} outside the sprites"
+    # The poses are close enough to give both answers often
+    assert POSES // 10 < hits < POSES * 9 // 10
+
+
+def test_collide_with_group(engine):
+    rng = random.Random(0)
+    fighter = place_fighter(engine, engine.jetfighter, 500, 300, 90)
+    far = Bullet(engine, 900, 900, 0)
+    hit = Bullet(engine, 500, 300, rng.uniform(0, 360))
+    group = pygame.sprite.Group(far, hit, fighter)
+    other, contact = Geometry.collide_with_group(fighter, group, engine.screen_width, engine.screen_height)
+    assert other is hit and inside(engine, hit, contact)
+    assert Geometry.collide_with_group(fighter, pygame.sprite.Group(far), engine.screen_width,
+                                       engine.screen_height) == (None, None)
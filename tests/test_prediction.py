@@ -0,0 +1,108 @@
+"""
+The vectorized trajectories of Engine.Prediction checked against a headless Engine playing seeded random commands.
+The predictions replay the engine's arithmetic, so they must match it exactly, not within a tolerance.
+"""
+import random
+
+import pytest
+
+import Engine.Prediction as Prediction
+from Engine.Engine import Engine
+from Engine.Fighter import JetFighter
+from Engine.Strategy import Strategy
+
+WARMUP = 60
+TICKS = 300
+FIRES = 6
+MOVES = [Strategy.NOOP, Strategy.ACCELERATE, Strategy.DECELERATE, Strategy.TURN_LEFT, Strategy.TURN_RIGHT,
+         Strategy.GO_STRAIGHT]
+
+
+def make_engine():
+    engine = Engine(headless=True)
+    engine.verbose = False
+    engine.publish_snapshot()
+    return engine
+
+
+def fighter_state(fighter):
+    return fighter.x, fighter.y, fighter.heading, fighter.curr_speed, fighter.turning
+
+
+def trajectory_state(trajectory, k):
+    return (trajectory.x[k], trajectory.y[k], trajectory.heading[k], trajectory.speed[k],
+            trajectory.turning[k])
+
+
+def play(engine, jet_commands, prop_commands):
+    """Play the commands from the engine's current state, the fighter states after every tick until the game ends."""
+    jet_states, prop_states, bullets = [], [], []
+    for jet_cmd, prop_cmd in zip(jet_commands, prop_commands):
+        engine.handle_player_cmd(jet_cmd)
+        engine.handle_player_cmd(prop_cmd, engine.propfighter)
+        engine.update_battlefield()
+        engine.publish_snapshot()
+        jet_states.append(fighter_state(engine.jetfighter))
+        prop_states.append(fighter_state(engine.propfighter))
+        bullets.append({bullet: (bullet.x, bullet.y, bullet.distance_traveled) for bullet in engine.bullets})
+        if engine.check_victory():
+            break
+    return jet_states, prop_states, bullets
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_predict_fighters_matches_engine(seed):
+    rng = random.Random(f"fighters-{seed}")
+    engine = make_engine()
+    play(engine, [rng.choice(MOVES) for _ in range(WARMUP)], [rng.choice(MOVES) for _ in range(WARMUP)])
+    start = engine.snapshot
+    jet_commands = [rng.choice(MOVES) for _ in range(TICKS)]
+    prop_commands = [rng.choice(MOVES) for _ in range(TICKS)]
+    jet_states, prop_states, _ = play(engine, jet_commands, prop_commands)
+
+    jet = Prediction.predict_jetfighter(start, jet_commands)
+    prop = Prediction.predict_propfighter(start, prop_commands)
+    for k, (jet_state, prop_state) in enumerate(zip(jet_states, prop_states)):
+        assert trajectory_state(jet, k) == jet_state, f"seed {seed}: jetfighter differs after {k + 1} ticks"
+        assert trajectory_state(prop, k) == prop_state, f"seed {seed}: propfighter differs after {k + 1} ticks"
+
+
+def test_predict_fighters_batch_matches_single():
+    rng = random.Random("batch")
+    commands = [[rng.choice(MOVES) for _ in range(50)] for _ in range(8)]
+    x = [rng.uniform(0, Prediction.SCREEN_WIDTH) for _ in commands]
+    y = [rng.uniform(0, Prediction.SCREEN_HEIGHT) for _ in commands]
+    heading = [rng.uniform(0, 360) for _ in commands]
+    batch = Prediction.predict_fighters(x, y, heading, JetFighter.SPECS["curr_speed"], 0, commands, JetFighter.SPECS)
+    for i in range(len(commands)):
+        single = Prediction.predict_fighters(x[i], y[i], heading[i], JetFighter.SPECS["curr_speed"], 0, commands[i],
+                                             JetFighter.SPECS)
+        assert all((values[i] == value).all() for values, value in zip(batch, single))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_predict_bullets_matches_engine(seed):
+    rng = random.Random(f"bullets-{seed}")
+    engine = make_engine()
+    # The jetfighter fires a few bullets that are still in flight when the prediction starts
+    fires = set(rng.sample(range(WARMUP), FIRES))
+    play(engine, [Strategy.FIRE_AMMO if k in fires else rng.choice(MOVES) for k in range(WARMUP)],
+         [rng.choice(MOVES) for _ in range(WARMUP)])
+    start = engine.snapshot
+    in_flight = list(engine.bullets)
+    assert in_flight, f"seed {seed}: no bullets in flight"
+    _, _, bullets = play(engine, [rng.choice(MOVES) for _ in range(TICKS)],
+                         [rng.choice(MOVES) for _ in range(TICKS)])
+
+    # The snapshot lists the bullets in the order of the engine's group
+    trajectory = Prediction.predict_snapshot_bullets(start, len(bullets))
+    for j, bullet in enumerate(in_flight):
+        for k, flying in enumerate(bullets):
+            if bullet in flying:
+                assert trajectory.alive[j, k], f"seed {seed}: bullet {j} predicted gone after {k + 1} ticks"
+                predicted = trajectory.x[j, k], trajectory.y[j, k], trajectory.distance_traveled[j, k]
+                assert predicted == flying[bullet], f"seed {seed}: bullet {j} differs after {k + 1} ticks"
+            else:
+                # A bullet hitting a fighter ends the game after the tick is recorded, so gone is gone by the obstacle
+                # or the distance, which the prediction covers
+                assert not trajectory.alive[j, k], f"seed {seed}: bullet {j} predicted in flight after {k + 1} ticks"
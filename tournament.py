@@ -1,11 +1,130 @@
+import argparse
+import importlib
+import os
+import time
+
 import Engine.Engine as Engine
+import Engine.Opponents as Opponents
+import Engine.ProcessStrategy as ProcessStrategy
+import Engine.ReplayViewer as ReplayViewer
+import Engine.Sweep as Sweep
+import Engine.Tournament as Tournament
 import Player.PlayerStrategy as PlayerStrategy
 
+
+def load_class(path):
+    # "package.module.ClassName" -> class object
+    module_name, class_name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def load_opponent(name):
+    # Built-in controller name, or "package.module.ClassName"
+    return Opponents.OPPONENTS[name] if name in Opponents.OPPONENTS else load_class(name)
+
+
+def parse_value(text):
+    # "3" -> 3, "0.5" -> 0.5, "true" -> True, anything else stays a string
+    if text.lower() in ("true", "false"):
+        return text.lower() == "true"
+    for parse in (int, float):
+        try:
+            return parse(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_space(params):
+    # ["name=1,2,3", "other=0.1:0.9"] -> {"name": [1, 2, 3], "other": (0.1, 0.9)}
+    space = {}
+    for param in params:
+        name, values = param.split("=", 1)
+        if ":" in values:
+            space[name] = tuple(parse_value(value) for value in values.split(":", 1))
+        else:
+            space[name] = [parse_value(value) for value in values.split(",")]
+    return space
+
+
+def run_sweep(args, opponent):
+    strategy = load_class(args.strategy)
+    space = parse_space(args.param)
+    games = args.games or 100
+    if args.sweep == "grid":
+        configs = Sweep.grid(space)
+    else:
+        configs = Sweep.random_configs(space, args.samples, args.seed)
+    if args.sweep == "halving":
+        entries = Sweep.successive_halving(strategy, configs, min_games=max(1, games // 8), max_games=games,
+                                           opponent_factory=opponent, workers=args.workers, seed=args.seed)
+    else:
+        entries = Sweep.sweep(strategy, configs, games=games, opponent_factory=opponent, workers=args.workers,
+                              seed=args.seed)
+    print(Sweep.format_sweep(entries, top=20))
+
+
 # main tournament program
 def main():
-    engine = Engine.Engine()
-    engine.set_strategy_obj(PlayerStrategy.PlayerStrategy())
+    parser = argparse.ArgumentParser(description="Su Family Hackathon 2024 Winter Special Edition")
+    parser.add_argument("--games", type=int, default=0,
+                        help="play this many headless matches over a process pool instead of an interactive game")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first headless match")
+    parser.add_argument("--strategy", default="Player.PlayerStrategy.PlayerStrategy",
+                        help="jetfighter strategy class for headless matches")
+    parser.add_argument("--opponent", default=None,
+                        help="controller flying the propfighter instead of the arrow keys: one of "
+                             f"{', '.join(Opponents.OPPONENTS)}, or a Strategy class")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="record every headless match to DIR/match-<seed>.rec, or the interactive game to "
+                             "DIR/live-<date>-<time>.rec")
+    parser.add_argument("--replay", default=None, metavar="FILE", help="play a recorded match back")
+    parser.add_argument("--profile", default=None, metavar="FILE",
+                        help="write per-phase frame timings of the interactive game to FILE (.json or .csv)")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="only redraw and update the regions of the screen that changed, for slow machines")
+    parser.add_argument("--process", action="store_true",
+                        help="run the player strategy in a separate process with a per-tick deadline")
+    parser.add_argument("--sweep", choices=("grid", "random", "halving"), default=None,
+                        help="tune the parameters of --strategy over headless matches: every combination of the "
+                             "--param values, or --samples random ones, evaluated on --games matches each or by "
+                             "successive halving")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUES",
+                        help="keyword argument of the strategy to sweep, as a list of values (beam_width=8,16,24) or "
+                             "a range to draw from at random (fire_threshold=0.2:0.9); repeat for more parameters")
+    parser.add_argument("--samples", type=int, default=20, help="number of random configurations of --sweep random "
+                                                                "and halving")
+    args = parser.parse_args()
+
+    opponent = load_opponent(args.opponent) if args.opponent else None
+    if args.sweep:
+        run_sweep(args, opponent)
+        return
+    if args.games > 0:
+        summary, _ = Tournament.run_tournament(load_class(args.strategy), opponent, games=args.games,
+                                               workers=args.workers, seed=args.seed, record_dir=args.record)
+        print(Tournament.format_summary(summary))
+        return
+
+    engine = Engine.Engine(dirty_rendering=args.dirty_rects)
+    if args.replay:
+        ReplayViewer.ReplayViewer(engine, args.replay).run()
+        return
+
+    engine.profile_path = args.profile
+    if args.record:
+        os.makedirs(args.record, exist_ok=True)
+        engine.start_recording(os.path.join(args.record, time.strftime("live-%Y%m%d-%H%M%S.rec")))
+    if args.process:
+        engine.set_strategy_obj(ProcessStrategy.ProcessStrategy(PlayerStrategy.PlayerStrategy))
+    else:
+        engine.set_strategy_obj(PlayerStrategy.PlayerStrategy())
+    if args.opponent:
+        engine.set_opponent_obj(load_opponent(args.opponent)())
     engine.display_banner()
     engine.run()
 
-main()
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()